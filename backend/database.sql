@@ -147,10 +147,14 @@ CREATE TABLE IF NOT EXISTS AnalyticsResults (
     curso_id INT NULL,
     tipo VARCHAR(50) NOT NULL,
     payload JSON NOT NULL,
+    periodo_dia DATE NULL,
+    fingerprint CHAR(64) NULL,
     criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX (tipo),
     INDEX (instituicao_id),
-    INDEX (curso_id)
+    INDEX (curso_id),
+    INDEX idx_analytics_partials (tipo, instituicao_id, curso_id, periodo_dia),
+    UNIQUE INDEX idx_analytics_fingerprint (tipo, fingerprint)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Consents
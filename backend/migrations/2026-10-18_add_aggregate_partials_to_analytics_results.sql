@@ -0,0 +1,8 @@
+-- Migração: suporte aos agregados parciais por instituição/curso/dia em AnalyticsResults
+-- (tipo = 'daily_aggregate') e ao checkpoint da agregação incremental (tipo = 'aggregate_checkpoint').
+ALTER TABLE AnalyticsResults
+ADD COLUMN periodo_dia DATE NULL;
+
+-- Índice para buscar os parciais de um intervalo de datas de uma instituição/curso
+ALTER TABLE AnalyticsResults
+ADD INDEX idx_analytics_partials (tipo, instituicao_id, curso_id, periodo_dia);
@@ -0,0 +1,13 @@
+-- Migração: cache de resumos do LLM em AnalyticsResults (tipo = 'gemini_summary') indexado pela
+-- impressão digital do prompt, com uma linha por impressão digital.
+
+-- As linhas antigas do cache guardavam a impressão digital só no payload (e podiam se repetir);
+-- como são apenas cache, são descartadas.
+DELETE FROM AnalyticsResults WHERE tipo = 'gemini_summary';
+
+ALTER TABLE AnalyticsResults
+ADD COLUMN fingerprint CHAR(64) NULL;
+
+-- Índice único para a busca e o upsert (INSERT ... ON DUPLICATE KEY UPDATE) do cache
+ALTER TABLE AnalyticsResults
+ADD UNIQUE INDEX idx_analytics_fingerprint (tipo, fingerprint);
@@ -1,15 +1,27 @@
 import sys
 import json
+import base64
+import importlib.util
 import os
+import random
+import re
+import time
+import threading
 import pandas as pd
-from collections import Counter
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np # Adicionado numpy para np.nan
-
-# Palavras-chave para análise de sentimento simples
-NEGATIVE_KEYWORDS = ['ruim', 'péssimo', 'lento', 'antigo', 'quebrado', 'difícil', 'desorganizado', 'insatisfeito', 'problema', 'falta', 'demora', 'ineficiente', 'inseguro', 'precisa melhorar']
-POSITIVE_KEYWORDS = ['bom', 'ótimo', 'excelente', 'rápido', 'novo', 'funciona', 'fácil', 'organizado', 'satisfeito', 'eficiente', 'seguro', 'acessível']
-STOPWORDS = set(['de', 'a', 'o', 'que', 'e', 'do', 'da', 'em', 'um', 'para', 'é', 'com', 'não', 'uma', 'os', 'no', 'se', 'na', 'por', 'mais', 'as', 'dos', 'como', 'mas', 'foi', 'ao', 'ele', 'ela', 'nós', 'isso', 'este', 'esta'])
+from keyword_matcher import get_matcher
+from llm_summary import PROMPT_COMMENTS, build_prompt, generate_summary, lookup_cached_summary, submit_summary_job, wait_for_jobs
+from summary_cache import get_summary_cache
+from streaming_aggregates import PeriodAggregate
+from suggestion_rules import get_rule_set
+from columnar_payload import decode as decode_columnar, is_columnar
+from instrumentation import StageTimer, null_timer, profiled
+from group_breakdowns import compute_breakdowns
+from period_split import PERIOD_NAMES, split_periods
+from comment_index import select_comment_sample
+from score_statistics import (MEDIA_FINAL_EDGES, MEDIA_FINAL_POINTS, Moments, bimodality_coefficient, column_moments,
+                              describe, media_final_histogram, polarization_index)
 
 # Categorias com nomes mais descritivos
 CATEGORIES = {
@@ -26,148 +38,114 @@ CATEGORIES = {
     "disponibilidade_professores": "Disponibilidade e Suporte dos Professores",
 }
 
-def get_detailed_analysis(analysis_by_question, average_media_final, all_comments):
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        return "Chave da API do Gemini não configurada. Defina a variável de ambiente GEMINI_API_KEY."
-
-    try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-pro-latest')
-
-        # Formatar os dados de entrada para o prompt
-        input_data_str = f"Média geral final: {average_media_final:.2f}\n\n"
-        input_data_str += "Médias por categoria:\n"
-        for key, item in analysis_by_question.items():
-            input_data_str += f"- {item['name']}: {item['average_score']['value']:.2f}\n"
-        
-        input_data_str += "\nComentários dos Alunos (amostra):\n"
-        for category, comments in all_comments.items():
-            if comments:
-                input_data_str += f"- {category}:\n"
-                for comment in comments[:5]: # Limita a 5 comentários por categoria para não exceder o limite do prompt
-                    input_data_str += f"  - \"{comment}\"\n"
-
-
-        prompt_content = f"""
-        Assuma a posição de um Analista de Dados Educacionais Sênior. Com base nos dados quantitativos (médias) e qualitativos (comentários) a seguir, sua tarefa é gerar um relatório de análise aprofundado e um plano de ação.
-
-        **Dados Brutos:**
-        {input_data_str}
-
-        **Sua resposta DEVE começar EXATAMENTE com a seguinte estrutura e seguir o formato definido:**
-
-        ### Análise Detalhada
-
-        **1. A Hipótese do "Platô de Desempenho":**
-        Analise se os dados sugerem que a instituição atingiu um "platô de bom desempenho", onde a maioria dos resultados são "bons", mas não "excelentes". Discuta as implicações positivas (processos maduros) e negativas (falta de inovação, estagnação).
-
-        **2. O Risco da Média Agregada:**
-        Discuta os diferentes cenários que podem levar à média de {average_media_final:.2f}. O cenário é de consistência mediana (maioria das notas em torno de 4.0) ou de polarização oculta (notas excelentes sendo anuladas por notas problemáticas)? Use os dados das categorias para suportar sua análise.
-
-        **3. Análise por Categoria (Integrando Comentários):**
-        Com base nas médias de cada categoria e nos comentários fornecidos, identifique os pontos fortes e os pontos de atenção. Use os comentários para dar cor e contexto aos números. Por exemplo, se a nota de 'Localização e Acesso' é baixa, os comentários podem explicar se o problema é transporte, segurança ou estacionamento. Responda às perguntas: Onde somos excelentes? Onde precisamos melhorar urgentemente?
-
-        ### Recomendações Estratégicas
-
-        Com base na sua análise, proponha um plano de ação concreto.
-
-        **Fase 1: Diagnóstico Aprofundado (Ações Imediatas)**
-        1.  **Segmentação dos Dados:** Recomende a desagregação da média geral por outros eixos (unidade acadêmica, curso, docente, etc.).
-        2.  **Análise da Distribuição de Frequência:** Recomende a construção de um histograma para visualizar a distribuição das notas e confirmar o cenário de consistência ou polarização.
-        3.  **Análise Qualitativa:** Enfatize a importância de continuar a análise de sentimentos e tópicos dos comentários para dar contexto aos números, como você acabou de fazer.
-
-        **Fase 2: Ações Táticas (Médio Prazo)**
-        4.  **Criar o Programa "Faróis de Excelência":** Sugira a criação de um programa para identificar e disseminar as boas práticas das áreas com melhor desempenho.
-        5.  **Plano de Desenvolvimento Focado:** Sugira um plano de ação individualizado para as áreas com pior desempenho, usando os insights dos comentários.
-        6.  **Revisão de Metas e KPIs:** Recomende a redefinição de metas de sucesso, usando métricas multidimensionais em vez de uma única média.
-
-        **Fase 3: Cultura de Dados (Longo Prazo)**
-        7.  **Implementação de Dashboards Interativos:** Sugira a substituição de relatórios estáticos por dashboards interativos.
-        8.  **Estabelecer Rituais de Análise de Dados:** Recomende a criação de um ciclo semestral de "Análise e Ação".
-
-        Conclua com um parágrafo final que reforce a importância de uma gestão proativa e orientada por dados.
-        """
-
-        response = model.generate_content(prompt_content)
-        return response.text.strip()
-    except Exception as e:
-        return f"Erro ao contatar a API do Gemini: {e}"
+def get_detailed_analysis(analysis_by_question, average_media_final, all_comments, force_regenerate=False):
+    prompt_content = build_prompt(analysis_by_question, average_media_final, all_comments)
+    text, _ = generate_summary(prompt_content, force_regenerate=force_regenerate)
+    return text
 
 def analyze_sentiment(comment):
-    if not isinstance(comment, str): return 0
-    comment_lower = comment.lower()
-    neg_count = sum(1 for word in NEGATIVE_KEYWORDS if word in comment_lower)
-    pos_count = sum(1 for word in POSITIVE_KEYWORDS if word in comment_lower)
-    return pos_count - neg_count
+    return get_matcher().sentiment(comment)
 
 def get_top_keywords(comments, n=3):
-    words = []
-    for text in comments:
-        if not isinstance(text, str): continue
-        cleaned_text = text.lower().replace(',', '').replace('.', '').replace('!', '').replace('?', '')
-        words.extend([word for word in cleaned_text.split() if word not in STOPWORDS and len(word) > 2])
-    
-    if not words:
-        return []
-    
-    return [word for word, count in Counter(words).most_common(n)]
-
-def generate_suggestion_object(avg_score, sentiment_score, score_distribution, comments):
-    keywords = get_top_keywords(comments)
-    
-    polarization_text = ""
-    if score_distribution:
-        total_votes = sum(score_distribution.values())
-        extremos = score_distribution.get(1, 0) + score_distribution.get(5, 0)
-        if total_votes > 10 and (extremos / total_votes) > 0.4:
-            polarization_text = " Nota-se uma alta polarização nas respostas (muitas notas 1 e 5), indicando uma experiência de 'ame ou odeie'."
-
-    if avg_score < 2.5 and sentiment_score < -0.5:
-        return {
-            "type": "Ponto Crítico",
-            "description": f"A média é alarmantemente baixa, com um sentimento geral muito negativo.{polarization_text}",
-            "recommendation": "Ação imediata é necessária. Investigue as causas raiz, focando nos pontos levantados pelos alunos."
-        }
-    elif avg_score < 3.5 and sentiment_score < 0:
-        return {
-            "type": "Ponto de Atenção",
-            "description": f"O desempenho está abaixo do esperado, com sentimento negativo nos comentários.{polarization_text}",
-            "recommendation": "Recomenda-se analisar os temas recorrentes para planejar melhorias."
-        }
-    elif avg_score > 4.0 and sentiment_score > 0.5:
-        return {
-            "type": "Ponto Forte",
-            "description": "Esta área é um destaque, com uma excelente média e feedback muito positivo.",
-            "recommendation": "Excelente trabalho! Continue a promover as boas práticas desta área. Considere usar este sucesso como modelo."
-        }
-    elif avg_score > 3.5 and sentiment_score >= 0:
-        return {
-            "type": "Ponto Positivo",
-            "description": "A área apresenta um bom desempenho, com média satisfatória e sentimento geral positivo.",
-            "recommendation": "Bom trabalho. Continue monitorando para manter a qualidade."
-        }
-    return None
+    return get_matcher().top_keywords(comments, n)
+
+def suggestion_metrics(keys, averages, sentiments, histograms):
+    """Monta a tabela de métricas (uma linha por categoria) avaliada pelas regras de sugestão."""
+    histograms = np.asarray(histograms, dtype=float).reshape(len(keys), len(SCORE_LEVELS))
+    total_votes = histograms.sum(axis=1)
+    extreme_share = np.divide(histograms[:, 0] + histograms[:, -1], total_votes, out=np.zeros(len(keys)), where=total_votes > 0)
+    return pd.DataFrame({
+        "average_score": np.asarray(averages, dtype=float),
+        "sentiment_score": np.asarray(sentiments, dtype=float),
+        "total_votes": total_votes,
+        "extreme_share": extreme_share,
+        # Índices de score_statistics.py, disponíveis para as condições das regras.
+        "polarization": polarization_index(histograms),
+        "bimodality_coefficient": bimodality_coefficient(histograms),
+    }, index=list(keys))
+
+def generate_suggestions(metrics):
+    """Aplica as regras de sugestão (suggestion_rules.json, conjunto "analysis") a todas as linhas de uma vez."""
+    return get_rule_set('analysis').apply(metrics)
+
+def generate_suggestion_object(avg_score, sentiment_score, score_distribution):
+    histogram = [score_distribution.get(int(level), 0) for level in SCORE_LEVELS]
+    return generate_suggestions(suggestion_metrics(['_'], [avg_score], [sentiment_score], [histogram]))['_']
 
 def create_dataframe(evaluations_list):
     if not evaluations_list:
         return None
-    df = pd.DataFrame(evaluations_list)
-    for col in CATEGORIES.keys():
-        nota_col = f'nota_{col}'
-        if nota_col in df.columns:
-            df[nota_col] = pd.to_numeric(df[nota_col], errors='coerce')
-    
-    if 'media_final' in df.columns:
-        df['media_final'] = pd.to_numeric(df['media_final'], errors='coerce')
+    return prepare_dataframe(pd.DataFrame(evaluations_list))
+
+def compact_scores(scores):
+    """Guarda uma coluna de notas como Int8 (nulos na máscara) ou, se houver notas fracionárias, float32 com NaN."""
+    if isinstance(scores.dtype, pd.Int8Dtype):
+        return scores
+    values = scores.to_numpy(dtype=np.float64, na_value=np.nan)
+    present = ~np.isnan(values)
+    if np.array_equal(values[present], np.trunc(values[present])) and np.all(np.abs(values[present]) <= 127):
+        data = np.where(present, values, 0).astype(np.int8)
+        return pd.Series(pd.arrays.IntegerArray(data, ~present), index=scores.index, name=scores.name)
+    return scores.astype(np.float32)
+
+# Comentários ficam como category só quando se repetem: com mais que esta fração de textos
+# distintos (estimada em uma amostra de COMMENT_CARDINALITY_SAMPLE comentários), cada texto vira
+# uma categoria e a conversão só acrescenta a fatoração. Nesse caso, com o pyarrow instalado, a
+# coluna vira string Arrow (texto contíguo em um buffer); sem ele, continua como está.
+COMMENT_CATEGORY_MAX_DISTINCT = 0.5
+COMMENT_CARDINALITY_SAMPLE = 5000
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+def distinct_ratio(values, sample_size=COMMENT_CARDINALITY_SAMPLE):
+    """Fração de valores distintos entre os não nulos, estimada em uma amostra espaçada da coluna."""
+    present = np.flatnonzero(pd.notna(values))
+    if not len(present):
+        return 0.0
+    sample = values[present[::max(1, len(present) // sample_size)][:sample_size]]
+    return len(set(sample)) / len(sample)
+
+def compact_comments(comments):
+    if isinstance(comments.dtype, pd.CategoricalDtype):
+        return comments
+    if distinct_ratio(comments.to_numpy(dtype=object)) <= COMMENT_CATEGORY_MAX_DISTINCT:
+        return comments.astype('category')
+    if HAS_PYARROW:
+        return comments.astype(pd.StringDtype('pyarrow'))
+    return comments
+
+def prepare_dataframe(df, coerce=True):
+    # coerce=False para colunas que já chegam numéricas (payload colunar, columnar_payload.py).
+    # Notas ficam em dtypes compactos (compact_scores) e comentários repetidos como category
+    # (compact_comments); os nulos
+    # continuam como NaN/NA e só viram None na serialização (ver json_records).
+    if coerce:
+        for col in CATEGORIES.keys():
+            nota_col = f'nota_{col}'
+            if nota_col in df.columns:
+                df[nota_col] = pd.to_numeric(df[nota_col], errors='coerce')
+
+        if 'media_final' in df.columns:
+            df['media_final'] = pd.to_numeric(df['media_final'], errors='coerce')
     
     nota_cols = [f'nota_{key}' for key in CATEGORIES.keys() if f'nota_{key}' in df.columns]
     if not nota_cols:
         return None
-        
+
     df.dropna(subset=nota_cols, how='all', inplace=True)
-    df.replace({np.nan: None}, inplace=True) # Replace NaN with None for JSON serialization
-    return df if not df.empty else None
+    if df.empty:
+        return None
+    for nota_col in nota_cols:
+        df[nota_col] = compact_scores(df[nota_col])
+    for key in CATEGORIES.keys():
+        comentario_col = f'comentario_{key}'
+        if comentario_col in df.columns:
+            df[comentario_col] = compact_comments(df[comentario_col])
+    return df
+
+def json_records(df):
+    """Converte linhas em dicts serializáveis em JSON, com None no lugar de NaN/NA."""
+    records = df.astype(object)
+    return records.where(df.notna(), None).to_dict(orient='records')
 
 def get_previous_metrics(df_previous):
     if df_previous is None:
@@ -182,87 +160,162 @@ def get_previous_metrics(df_previous):
                 previous_metrics[name] = valid_scores.mean()
     return previous_metrics
 
-def run_analysis(df):
+SCORE_LEVELS = np.arange(1, 6)
+
+def build_score_matrix(df):
+    """Monta o bloco nota_* como uma matriz float32 (linhas x categorias), com NaN para notas ausentes.
+
+    A matriz é guardada por coluna (ordem Fortran): as reduções por categoria percorrem memória contígua.
+    """
+    keys = [key for key in CATEGORIES.keys() if f'nota_{key}' in df.columns]
+    scores = np.empty((len(df), len(keys)), dtype=np.float32, order='F')
+    for index, key in enumerate(keys):
+        scores[:, index] = df[f'nota_{key}'].to_numpy(dtype=np.float32, na_value=np.nan)
+    return keys, scores
+
+def score_matrix_stats(scores):
+    """Calcula contagens, somas e histogramas 1-5 de todas as categorias em uma única passada."""
+    valid = ~np.isnan(scores)
+    counts = np.count_nonzero(valid, axis=0)
+    sums = np.where(valid, scores, 0).sum(axis=0, dtype=np.float64)
+
+    # Faixa de cada nível: notas em [nível, nível + 1), e o 5 só com nota 5. A contagem de notas
+    # >= nível (até 5) de cada nível, menos a do nível seguinte, dá o histograma.
+    up_to_max = scores <= SCORE_LEVELS[-1]
+    at_least = np.array([np.count_nonzero((scores >= level) & up_to_max, axis=0) for level in SCORE_LEVELS])
+    histograms = (at_least - np.vstack([at_least[1:], np.zeros(scores.shape[1], dtype=at_least.dtype)])).T
+    return counts, sums, histograms
+
+def comment_scores(df, keys):
+    """Pontua os comentários de cada categoria: {categoria: (código por linha, pontuação de cada comentário distinto)}.
+
+    Os textos distintos de todas as colunas em category (que costumam se repetir entre categorias)
+    são pontuados juntos, uma única vez; nas demais colunas (comentários quase todos distintos, ver
+    compact_comments), cada comentário recebe o seu próprio código, sem fatorar a coluna. Linhas
+    sem comentário têm código -1.
+    """
+    matcher = get_matcher()
+    scores, categorical = {}, {}
+    for key in keys:
+        comentario_col = f'comentario_{key}'
+        if comentario_col not in df.columns: continue
+        comments = df[comentario_col]
+        if isinstance(comments.dtype, pd.CategoricalDtype):
+            categorical[key] = (comments.cat.codes.to_numpy(), comments.cat.categories.to_numpy(dtype=object))
+        else:
+            present = comments.notna().to_numpy()
+            codes = np.where(present, np.cumsum(present) - 1, -1)
+            scores[key] = (codes, matcher.sentiment_series(comments[present].to_numpy(dtype=object)).to_numpy(dtype=float))
+    if categorical:
+        distinct = pd.Index(pd.unique(np.concatenate([texts for _, texts in categorical.values()])))
+        distinct_scores = matcher.sentiment_series(distinct.to_numpy(dtype=object)).to_numpy(dtype=float)
+        for key, (codes, texts) in categorical.items():
+            scores[key] = (codes, distinct_scores[distinct.get_indexer(texts)])
+    return {key: scores[key] for key in keys if key in scores}
+
+def comment_list(comments):
+    """Comentários não nulos de uma coluna, na ordem das linhas (em category, lidos pelos códigos)."""
+    if isinstance(comments.dtype, pd.CategoricalDtype):
+        codes = comments.cat.codes.to_numpy()
+        return comments.cat.categories.to_numpy(dtype=object)[codes[codes >= 0]].tolist()
+    return comments.dropna().tolist()
+
+def sentiment_means(scores_by_key):
+    means = {}
+    for key, (codes, category_scores) in scores_by_key.items():
+        # Quantas linhas usam cada comentário distinto (o código -1, sem comentário, cai na posição 0
+        # e é descartado); a média é o produto escalar com as pontuações.
+        uses = np.bincount(codes + 1, minlength=len(category_scores) + 1)[1:]
+        if uses.sum():
+            means[key] = float(uses @ category_scores / uses.sum())
+    return means
+
+def comment_sentiment_means(df, keys):
+    """Calcula o sentimento médio por categoria pontuando todos os comentários de uma vez."""
+    return sentiment_means(comment_scores(df, keys))
+
+def run_analysis(df, group_by=None, group_limit=None):
+    """Analisa as linhas; com group_by, inclui "breakdowns" por grupo (ver group_breakdowns.py)."""
     if df is None:
-        return {"analysis_by_question": {}, "score_distribution": {}, "averages_by_question": {}}
+        result = {"analysis_by_question": {}, "score_distribution": {}, "averages_by_question": {}}
+        if group_by:
+            result["breakdowns"] = []
+        return result
+
+    keys, scores = build_score_matrix(df)
+    counts, sums, histograms = score_matrix_stats(scores)
+    m2s = column_moments(scores, counts, sums)
+    scores_by_key = comment_scores(df, keys)
+    category_sentiments = sentiment_means(scores_by_key)
 
     analysis_by_question = {}
     averages_by_question = {}
-    aggregated_score_distribution = Counter()
-
-    for key, name in CATEGORIES.items():
-        nota_col = f'nota_{key}'
+    present = counts > 0
+    present_keys = [key for key, has_scores in zip(keys, present) if has_scores]
+    averages = sums[present] / counts[present]
+    sentiments = [category_sentiments.get(key, 0) for key in present_keys]
+    suggestions = generate_suggestions(suggestion_metrics(present_keys, averages, sentiments, histograms[present]))
+
+    for index, key in enumerate(keys):
+        if counts[index] == 0: continue
+        name = CATEGORIES[key]
         comentario_col = f'comentario_{key}'
 
-        if nota_col not in df.columns: continue
-
-        valid_scores = df[nota_col].dropna()
-        if valid_scores.empty: continue
-
-        avg_score = valid_scores.mean()
+        avg_score = float(sums[index] / counts[index])
         averages_by_question[name] = {"value": round(avg_score, 2), "delta": None}
-        score_distribution = valid_scores.value_counts().to_dict()
-        aggregated_score_distribution.update(score_distribution)
-        
-        comments = df[comentario_col].dropna().tolist() if comentario_col in df.columns else []
-        
-        sentiment_score = 0
-        if comments:
-            sentiment_score = df[comentario_col].dropna().apply(analyze_sentiment).mean()
+        score_distribution = {int(level): int(count) for level, count in zip(SCORE_LEVELS, histograms[index]) if count}
 
-        suggestion_obj = generate_suggestion_object(avg_score, sentiment_score, score_distribution, comments)
+        comments = comment_list(df[comentario_col]) if comentario_col in df.columns else []
+        sentiment_score = category_sentiments.get(key, 0) if comments else 0
 
         analysis_by_question[key] = {
             "name": name,
             "average_score": {"value": round(avg_score, 2), "delta": None},
-            "score_distribution": {int(k): int(v) for k, v in score_distribution.items()},
+            "score_distribution": score_distribution,
             "comments": comments,
             "sentiment_score": {"value": round(sentiment_score, 2), "delta": None},
-            "suggestion": suggestion_obj
+            "suggestion": suggestions[key],
+            "statistics": describe(Moments.from_totals(counts[index], sums[index], m2s[index]), histograms[index]),
         }
-    
-    return {
+
+    aggregated = histograms.sum(axis=0)
+    result = {
         "analysis_by_question": analysis_by_question,
-        "score_distribution": {int(k): int(v) for k, v in aggregated_score_distribution.items()},
+        "score_distribution": {int(level): int(count) for level, count in zip(SCORE_LEVELS, aggregated) if count},
         "averages_by_question": averages_by_question
     }
-
-def main():
-    sys.stdin.reconfigure(encoding='utf-8')
-    sys.stdout.reconfigure(encoding='utf-8')
-
-    raw_data = sys.stdin.read()
-    
-    try:
-        data_periods = json.loads(raw_data)
-        current_evaluations = data_periods.get("current", [])
-        previous_evaluations = data_periods.get("previous", [])
-    except json.JSONDecodeError:
-        print(json.dumps({"error": "Invalid JSON input"}), file=sys.stderr)
-        sys.exit(1)
-
-    df_current = create_dataframe(current_evaluations)
-    df_previous = create_dataframe(previous_evaluations)
-
-    result = run_analysis(df_current)
-
-    current_total = len(df_current) if df_current is not None else 0
-    current_avg_final = df_current['media_final'].mean() if df_current is not None and not df_current.empty and 'media_final' in df_current.columns else 0
-
-    previous_total = len(df_previous) if df_previous is not None else 0
-    previous_avg_final = df_previous['media_final'].mean() if df_previous is not None and not df_previous.empty and 'media_final' in df_previous.columns else 0
+    if 'media_final' in df.columns:
+        media_final = df['media_final'].to_numpy(dtype=np.float64, na_value=np.nan)
+        result["media_final_statistics"] = describe(
+            Moments.from_values(media_final), media_final_histogram(media_final), MEDIA_FINAL_EDGES, MEDIA_FINAL_POINTS
+        )
+    if group_by:
+        result["breakdowns"] = compute_breakdowns(df, group_by, keys, scores, scores_by_key, group_limit)
+    return result
+
+def apply_period_comparison(result, current_total, current_avg_final, previous, options=None, on_summary=None):
+    """Preenche totais, média final e deltas em relação ao período anterior.
+
+    previous é None (sem período anterior) ou uma tupla (total, média final, médias por categoria).
+    Com options["skip_summary"] o LLM não é chamado (detailed_analysis None, status "skipped").
+    Com options["force_summary_regen"] o resumo do LLM é gerado novamente, ignorando o cache.
+    Com options["async_summary"] e um callback on_summary(job_id, texto), o resultado volta sem
+    esperar o LLM: detailed_analysis fica None, detailed_analysis_status "pending" e summary_job_id
+    identifica o resumo, entregue depois pelo callback (on_summary(job_id, None, error=...) se o LLM falhar).
+    """
+    options = options or {}
+    previous_total, previous_avg_final, previous_metrics = previous if previous is not None else (0, 0, {})
 
     result['total_evaluations'] = {
         "value": current_total,
-        "delta": current_total - previous_total if df_previous is not None else None
+        "delta": current_total - previous_total if previous is not None else None
     }
     result['average_media_final'] = {
         "value": round(current_avg_final, 2),
-        "delta": round(current_avg_final - previous_avg_final, 2) if df_previous is not None else None
+        "delta": round(current_avg_final - previous_avg_final, 2) if previous is not None else None
     }
     
-    if df_previous is not None:
-        previous_metrics = get_previous_metrics(df_previous)
+    if previous is not None:
         for name, metrics in result["averages_by_question"].items():
             if name in previous_metrics:
                 delta = metrics["value"] - previous_metrics[name]
@@ -274,16 +327,508 @@ def main():
                 delta = analysis["average_score"]["value"] - previous_metrics[name]
                 analysis["average_score"]["delta"] = round(delta, 2)
 
-    all_comments = {item['name']: item['comments'] for item in result["analysis_by_question"].values() if item['comments']}
-    result["detailed_analysis"] = get_detailed_analysis(result["analysis_by_question"], result["average_media_final"]["value"], all_comments)
-    
-    # Adicionando raw_data ao resultado final
-    if df_current is not None:
-        result['raw_data'] = df_current.to_dict(orient='records')
-    else:
-        result['raw_data'] = []
+    if options.get("skip_summary"):
+        result["detailed_analysis"] = None
+        result["detailed_analysis_status"] = "skipped"
+        return result
+
+    # Amostra diversa (termos e sentimentos variados) dos comentários de cada categoria, em vez dos primeiros.
+    all_comments = {item['name']: select_comment_sample(item['comments'], PROMPT_COMMENTS) for item in result["analysis_by_question"].values() if item['comments']}
+    force_regenerate = bool(options.get("force_summary_regen"))
+    if options.get("async_summary") and on_summary is not None:
+        prompt_content = build_prompt(result["analysis_by_question"], result["average_media_final"]["value"], all_comments)
+        cached = None if force_regenerate else lookup_cached_summary(prompt_content)
+        if cached is not None:
+            result["detailed_analysis"] = cached
+            result["detailed_analysis_status"] = "ready"
+        else:
+            metadata = {"instituicao_id": options.get("instituicao_id"), "curso_id": options.get("curso_id")}
+            result["detailed_analysis"] = None
+            result["detailed_analysis_status"] = "pending"
+            result["summary_job_id"] = submit_summary_job(prompt_content, on_summary, force_regenerate=force_regenerate, metadata=metadata, cache_checked=True)
+        return result
+
+    result["detailed_analysis"] = get_detailed_analysis(result["analysis_by_question"], result["average_media_final"]["value"], all_comments, force_regenerate=force_regenerate)
+    return result
+
+# --- Opções de saída ---
+# O payload pode trazer "options" para reduzir o tamanho da resposta:
+#   include_raw_data (padrão true), raw_data_offset, raw_data_limit: linhas brutas devolvidas em raw_data;
+#   comments_limit, comments_offset, comments_sample ("head" ou "random"), comments_seed: comentários por categoria
+#         (com "random", as páginas seguem uma ordem embaralhada fixa pela semente);
+#   skip_summary: não gera o resumo do LLM (usado na análise em lote, batch_analysis.py);
+#   force_summary_regen: gera o resumo do LLM novamente, ignorando o cache (summary_cache.py);
+#   async_summary: devolve os resultados numéricos sem esperar o LLM (ver apply_period_comparison);
+#   instituicao_id, curso_id: identificam o resumo gravado em AnalyticsResults no modo assíncrono;
+#   group_by, group_limit: recortes por curso, instituição e/ou mês em "breakdowns" (ver group_breakdowns.py);
+#   comment_topics: {"start": ..., "end": ..., "limit": 10, "samples": 5} devolve em "comment_topics" os termos,
+#         bigramas e comentários representativos de cada categoria no período, com o que já está indexado
+#         (a atualização do índice roda em segundo plano; ver comment_index.py);
+#   page: {"type": "comments", "category": "didatica", "offset": 0, "limit": 50} ou
+#         {"type": "raw_data", "offset": 0, "limit": 50} devolve apenas a página pedida, sem rodar a análise.
+
+def select_comments(comments, options):
+    limit = options.get("comments_limit")
+    offset = int(options.get("comments_offset", 0) or 0)
+    if limit is None and not offset:
+        return comments
+    end = None if limit is None else offset + int(limit)
+    if options.get("comments_sample") == "random" and limit is not None and (offset or len(comments) > int(limit)):
+        # Embaralha a lista inteira com a semente (comments_seed) e pagina sobre essa ordem: com a
+        # mesma semente, páginas seguidas não repetem comentários.
+        return random.Random(options.get("comments_seed", 0)).sample(comments, len(comments))[offset:end]
+    return comments[offset:end]
+
+def build_raw_data(df, options):
+    if df is None or not options.get("include_raw_data", True):
+        return []
+    offset = int(options.get("raw_data_offset", 0) or 0)
+    limit = options.get("raw_data_limit")
+    rows = df.iloc[offset:] if limit is None else df.iloc[offset:offset + int(limit)]
+    return json_records(rows)
+
+def apply_output_options(result, options):
+    for analysis in result["analysis_by_question"].values():
+        analysis.setdefault("comments_total", len(analysis["comments"]))
+        analysis["comments"] = select_comments(analysis["comments"], options)
+    return result
+
+def attach_comment_topics(result, options, timer=None):
+    timer = timer or null_timer()
+    request = options.get("comment_topics")
+    if not request:
+        return result
+    if options.get("instituicao_id") is None:
+        raise ValueError("comment_topics exige options.instituicao_id")
+    from comment_index import topics_for_period
+
+    request = request if isinstance(request, dict) else {}
+    with timer.stage("comment_topics"):
+        result["comment_topics"] = topics_for_period(
+            options["instituicao_id"], list(result["analysis_by_question"]), options.get("curso_id"),
+            request.get("start"), request.get("end"), int(request.get("limit", 10)), int(request.get("samples", 5))
+        )
+    return result
+
+def build_page(df, page):
+    page_type = page.get("type")
+    offset = int(page.get("offset", 0) or 0)
+    limit = int(page.get("limit", 50))
+    if page_type == "comments":
+        category = page.get("category")
+        comentario_col = f'comentario_{category}'
+        comments = comment_list(df[comentario_col]) if df is not None and comentario_col in df.columns else []
+        return {"type": "comments", "category": category, "offset": offset, "limit": limit, "total": len(comments), "items": comments[offset:offset + limit]}
+    if page_type == "raw_data":
+        total = len(df) if df is not None else 0
+        items = build_raw_data(df, {"raw_data_offset": offset, "raw_data_limit": limit})
+        return {"type": "raw_data", "offset": offset, "limit": limit, "total": total, "items": items}
+    raise ValueError(f"Tipo de página inválido: {page_type}")
+
+def frame_rows(*frames):
+    return sum(len(df) for df in frames if df is not None)
+
+def payload_periods(options):
+    # As páginas de comentários e de linhas brutas só usam o período atual.
+    return ("current",) if options.get("page") else PERIOD_NAMES
+
+def split_rows(df, period_bounds, options, timer=None):
+    """Separa as linhas de "rows" nos períodos (ver period_split.py)."""
+    timer = timer or null_timer()
+    with timer.stage("split_periods", rows=frame_rows(df)) as stage:
+        frames = split_periods(df, period_bounds, payload_periods(options))
+        stage["rows"] = frame_rows(*frames.values())
+    return frames
+
+def empty_analysis():
+    # Mesmo resultado que o backend devolve quando a consulta não traz avaliações do período atual.
+    return {
+        "suggestions": [],
+        "averages_by_question": {},
+        "analysis_by_question": {},
+        "total_evaluations": {"value": 0, "delta": None},
+        "average_media_final": {"value": 0, "delta": None},
+        "score_distribution": {},
+        "executive_summary": "Não há dados de avaliação para o período selecionado.",
+        "raw_data": [],
+    }
+
+def analyze_split_frames(frames, options, on_summary=None, timer=None, coerce=True):
+    timer = timer or null_timer()
+    with timer.stage("create_dataframe") as stage:
+        df_current = prepare_dataframe(frames["current"], coerce) if frames.get("current") is not None else None
+        if options.get("page"):
+            return build_page(df_current, options["page"])
+        if df_current is None:
+            return empty_analysis()
+        df_previous = prepare_dataframe(frames["previous"], coerce) if frames.get("previous") is not None else None
+        stage["rows"] = frame_rows(df_current, df_previous)
+    return analyze_frames(df_current, df_previous, options, on_summary, timer)
+
+def analyze_payload(data_periods, on_summary=None, timer=None):
+    timer = timer or null_timer()
+    if isinstance(data_periods, list):
+        data_periods = {"current": data_periods}
+    if data_periods.get("source") == "partials":
+        return analyze_partials(data_periods, on_summary, timer)
+    options = data_periods.get("options") or {}
+    timer.configure(options)
+
+    if "rows" in data_periods:
+        rows = data_periods["rows"]
+        frames = split_rows(pd.DataFrame(rows) if rows else None, data_periods.get("periods"), options, timer)
+        return analyze_split_frames(frames, options, on_summary, timer)
+
+    current_evaluations = data_periods.get("current", [])
+    previous_evaluations = data_periods.get("previous", [])
+    if options.get("page"):
+        with timer.stage("create_dataframe", rows=len(current_evaluations)):
+            df_current = create_dataframe(current_evaluations)
+        return build_page(df_current, options["page"])
+    with timer.stage("create_dataframe") as stage:
+        df_current, df_previous = create_dataframe(current_evaluations), create_dataframe(previous_evaluations)
+        stage["rows"] = frame_rows(df_current, df_previous)
+    return analyze_frames(df_current, df_previous, options, on_summary, timer)
+
+def analyze_columnar(buffer, on_summary=None, timer=None):
+    """Como analyze_payload, mas para o payload binário colunar (ver columnar_payload.py)."""
+    timer = timer or null_timer()
+    with timer.stage("parse") as stage:
+        frames, options, period_bounds = decode_columnar(buffer)
+        stage["rows"] = frame_rows(*frames.values())
+    timer.configure(options)
+    if "rows" in frames:
+        frames = split_rows(frames["rows"], period_bounds, options, timer)
+    return analyze_split_frames(frames, options, on_summary, timer, coerce=False)
+
+def analyze_frames(df_current, df_previous, options, on_summary=None, timer=None):
+    timer = timer or null_timer()
+    with timer.stage("run_analysis", rows=frame_rows(df_current)):
+        result = run_analysis(df_current, options.get("group_by"), options.get("group_limit"))
+    attach_comment_topics(result, options, timer)
+
+    current_total = len(df_current) if df_current is not None else 0
+    current_avg_final = df_current['media_final'].mean() if df_current is not None and not df_current.empty and 'media_final' in df_current.columns else 0
+
+    previous = None
+    if df_previous is not None:
+        previous_avg_final = df_previous['media_final'].mean() if not df_previous.empty and 'media_final' in df_previous.columns else 0
+        previous = (len(df_previous), previous_avg_final, get_previous_metrics(df_previous))
+
+    # Inclui os deltas, mas o custo é o do resumo do LLM (ou da consulta ao cache de resumos).
+    with timer.stage("llm_summary"):
+        apply_period_comparison(result, current_total, current_avg_final, previous, options, on_summary)
+
+    with timer.stage("output_options") as stage:
+        apply_output_options(result, options)
+        # Adicionando raw_data ao resultado final (apenas as linhas pedidas nas opções)
+        result['raw_data'] = build_raw_data(df_current, options)
+        stage["rows"] = len(result['raw_data'])
+
+    return result
+
+# --- Entrada em streaming (NDJSON) ---
+# Cada linha é uma avaliação com o campo "period" ("current" ou "previous"; padrão "current").
+# Uma linha {"options": {...}} define as opções de saída (ver acima).
+# As linhas são acumuladas em blocos de STREAM_CHUNK_ROWS e incorporadas a agregados parciais,
+# então a memória não cresce com o número de avaliações. Neste modo raw_data sai vazio e a
+# lista de comentários de cada categoria é uma amostra (streaming_aggregates.DEFAULT_MAX_COMMENTS).
+
+STREAM_CHUNK_ROWS = int(os.getenv("ANALYSIS_STREAM_CHUNK_ROWS", "5000"))
+
+def aggregate_frame(df, aggregate):
+    """Incorpora as linhas de um DataFrame (vindo de create_dataframe) a um PeriodAggregate."""
+    if df is None:
+        return aggregate
+
+    aggregate.rows += len(df)
+    if 'media_final' in df.columns:
+        media_final = df['media_final'].to_numpy(dtype=np.float64, na_value=np.nan)
+        moments = Moments.from_values(media_final)
+        aggregate.add_media_final(moments.count, float(np.nansum(media_final)), moments.m2, media_final_histogram(media_final))
+
+    keys, scores = build_score_matrix(df)
+    counts, sums, histograms = score_matrix_stats(scores)
+    sums_sq = np.nansum(np.square(scores, dtype=np.float64), axis=0)
+    m2s = column_moments(scores, counts, sums)
+    matcher = get_matcher()
+
+    for index, key in enumerate(keys):
+        category = aggregate.category(key)
+        category.add_scores(counts[index], sums[index], sums_sq[index], histograms[index], m2s[index])
+
+        comentario_col = f'comentario_{key}'
+        if comentario_col not in df.columns: continue
+        comments = df[comentario_col].dropna()
+        if comments.empty: continue
+        category.add_comments(comments.tolist(), matcher.sentiment_series(comments).sum())
+    return aggregate
+
+def run_analysis_from_aggregate(aggregate):
+    analysis_by_question = {}
+    averages_by_question = {}
+    aggregated = np.zeros(len(SCORE_LEVELS), dtype=np.int64)
+
+    present = {key: category for key, category in aggregate.categories.items() if key in CATEGORIES and category.count}
+    suggestions = generate_suggestions(suggestion_metrics(
+        list(present), [category.mean for category in present.values()],
+        [category.sentiment_mean for category in present.values()], [category.histogram for category in present.values()]
+    ))
+
+    for key, name in CATEGORIES.items():
+        category = present.get(key)
+        if category is None: continue
+
+        avg_score = category.mean
+        averages_by_question[name] = {"value": round(avg_score, 2), "delta": None}
+        score_distribution = {int(level): int(count) for level, count in zip(SCORE_LEVELS, category.histogram) if count}
+        aggregated += np.asarray(category.histogram, dtype=np.int64)
+
+        sentiment_score = category.sentiment_mean
+        suggestion_obj = suggestions[key]
+
+        analysis_by_question[key] = {
+            "name": name,
+            "average_score": {"value": round(avg_score, 2), "delta": None},
+            "score_distribution": score_distribution,
+            "comments": list(category.comments),
+            "comments_total": category.comment_count,
+            "sentiment_score": {"value": round(sentiment_score, 2), "delta": None},
+            "suggestion": suggestion_obj,
+            "statistics": describe(category.moments, category.histogram),
+        }
+
+    result = {
+        "analysis_by_question": analysis_by_question,
+        "score_distribution": {int(level): int(count) for level, count in zip(SCORE_LEVELS, aggregated) if count},
+        "averages_by_question": averages_by_question
+    }
+    media_final_moments = aggregate.media_final_moments
+    if media_final_moments is not None and media_final_moments.count:
+        result["media_final_statistics"] = describe(
+            media_final_moments, aggregate.media_final_histogram, MEDIA_FINAL_EDGES, MEDIA_FINAL_POINTS
+        )
+    return result
+
+def get_previous_metrics_from_aggregate(aggregate):
+    return {CATEGORIES[key]: category.mean for key, category in aggregate.categories.items() if key in CATEGORIES and category.count}
+
+def analyze_ndjson(lines, on_summary=None, timer=None):
+    timer = timer or null_timer()
+    aggregates = {"current": PeriodAggregate(), "previous": PeriodAggregate()}
+    buffers = {"current": [], "previous": []}
+    options = {}
+
+    def flush(period):
+        if buffers[period]:
+            aggregate_frame(create_dataframe(buffers[period]), aggregates[period])
+            buffers[period] = []
+
+    # Leitura, parse e agregação se intercalam bloco a bloco, então são medidos como uma etapa só.
+    with timer.stage("stream_aggregate") as stage:
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "options" in record and "period" not in record:
+                options = record["options"] or {}
+                continue
+            period = record.pop("period", "current")
+            if period not in buffers:
+                raise ValueError(f"Período inválido: {period}")
+            buffers[period].append(record)
+            if len(buffers[period]) >= STREAM_CHUNK_ROWS:
+                flush(period)
+        for period in buffers:
+            flush(period)
+        stage["rows"] = aggregates["current"].rows + aggregates["previous"].rows
+    timer.configure(options)
+
+    return analyze_aggregates(aggregates["current"], aggregates["previous"], options, on_summary, timer)
+
+def analyze_aggregates(current, previous_aggregate, options, on_summary=None, timer=None):
+    timer = timer or null_timer()
+    with timer.stage("run_analysis", rows=current.rows):
+        result = run_analysis_from_aggregate(current)
+
+    previous = None
+    if previous_aggregate.rows:
+        previous = (previous_aggregate.rows, previous_aggregate.media_final_mean, get_previous_metrics_from_aggregate(previous_aggregate))
+
+    attach_comment_topics(result, options, timer)
+    with timer.stage("llm_summary"):
+        apply_period_comparison(result, current.rows, current.media_final_mean, previous, options, on_summary)
+    apply_output_options(result, options)
+    result['raw_data'] = []
+    return result
+
+# --- Agregados parciais (AnalyticsResults) ---
+# Payload {"source": "partials", "instituicao_id": ..., "curso_id": ..., "periods": {"current": [início, fim],
+# "previous": [início, fim]}, "options": {...}}: em vez de receber as linhas, a análise combina os
+# agregados diários guardados por incremental_aggregates.py. A requisição só lê os parciais; a atualização
+# da instituição é agendada em segundo plano, então as avaliações mais recentes entram nas requisições seguintes.
+
+def analyze_partials(request, on_summary=None, timer=None):
+    timer = timer or null_timer()
+    from incremental_aggregates import aggregates_for_periods, schedule_refresh
+
+    periods = request.get("periods") or {}
+    if not periods.get("current"):
+        raise ValueError("periods.current é obrigatório com source = partials")
+    options = request.get("options") or {}
+    timer.configure(options)
+    with timer.stage("load_partials"):
+        aggregates = aggregates_for_periods(request.get("instituicao_id"), request.get("curso_id"), periods)
+    if request.get("instituicao_id") is not None:
+        schedule_refresh(request.get("instituicao_id"))
+    return analyze_aggregates(aggregates["current"], aggregates.get("previous", PeriodAggregate()), options, on_summary, timer)
+
+# --- Modo worker (processo persistente) ---
+# Protocolo: cada linha do stdin é um JSON {"id": ..., "payload": {...}} (ou {"id": ..., "columnar": "<base64>"}
+# com o payload binário colunar de columnar_payload.py) e cada
+# resposta é uma linha JSON {"id": ..., "ok": bool, "result"|"error": ..., "latency_ms": ...}.
+# As requisições são processadas em paralelo; a ordem das respostas não é garantida.
+# Com options.async_summary, o resumo do LLM chega depois em uma segunda linha
+# {"id": ..., "type": "detailed_analysis", "job_id": ..., "detailed_analysis": ..., "latency_ms": ...}.
+# Com medição por etapa (instrumentation.py, modo "result"), a resposta traz também um bloco "timings".
+
+WORKER_THREADS = int(os.getenv("ANALYSIS_WORKER_THREADS", "4"))
+
+REQUEST_ID_PATTERN = re.compile(r'^\s*\{\s*"id"\s*:\s*(-?\d+)')
+
+def recover_request_id(line):
+    # O backend escreve o id como primeira chave; assim uma linha que não é JSON válido ainda
+    # recebe uma resposta de erro com o id certo, em vez de esperar o tempo limite.
+    match = REQUEST_ID_PATTERN.match(line)
+    return int(match.group(1)) if match else None
+
+def summary_message_fields(text, error=None):
+    # Campos da mensagem do resumo assíncrono: status "ready" com o texto ou "failed" com o erro.
+    if error is not None:
+        return {"status": "failed", "detailed_analysis": None, "error": error}
+    return {"status": "ready", "detailed_analysis": text}
+
+def handle_worker_request(line, emit):
+    started = time.perf_counter()
+    request_id = None
+    response_sent = threading.Event()
+    timer = StageTimer()
+
+    def on_summary(job_id, text, error=None):
+        # O resumo é sempre emitido depois da resposta principal da mesma requisição.
+        response_sent.wait()
+        emit({"id": request_id, "type": "detailed_analysis", "job_id": job_id, **summary_message_fields(text, error),
+              "latency_ms": round((time.perf_counter() - started) * 1000, 2)})
+
+    try:
+        with timer.stage("read_request"):
+            request = json.loads(line)
+            request_id = request.get("id")
+            columnar = base64.b64decode(request["columnar"]) if "columnar" in request else None
+        with profiled(f"{os.getpid()}_{request_id}"):
+            if columnar is not None:
+                result = analyze_columnar(columnar, on_summary=on_summary, timer=timer)
+            else:
+                result = analyze_payload(request.get("payload", {}), on_summary=on_summary, timer=timer)
+        response = {"id": request_id, "ok": True, "result": result}
+    except Exception as e:
+        request_id = request_id if request_id is not None else recover_request_id(line)
+        response = {"id": request_id, "ok": False, "error": str(e)}
+    response["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    response["summary_cache"] = get_summary_cache().stats()
+    emit(response, timer)
+    timer.log(id=request_id)
+    response_sent.set()
+
+def run_worker():
+    output_lock = threading.Lock()
+
+    def emit(message, timer=None):
+        timer = timer or null_timer()
+        text = timer.dumps(message)
+        with output_lock:
+            sys.stdout.write(text + "\n")
+            sys.stdout.flush()
+        status = message.get("type", f"ok={message.get('ok')}")
+        print(f"[analysis-worker] id={message['id']} {status} latency_ms={message['latency_ms']}", file=sys.stderr)
+
+    with ThreadPoolExecutor(max_workers=WORKER_THREADS) as executor:
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            executor.submit(handle_worker_request, line, emit)
+    wait_for_jobs()
+
+_output_lock = threading.Lock()
+_result_printed = threading.Event()
+
+def print_result(result, timer=None):
+    timer = timer or null_timer()
+    text = timer.dumps(result)
+    with _output_lock:
+        print(text, flush=True)
+    _result_printed.set()
+    timer.log()
+
+def print_summary_message(job_id, text, error=None):
+    # No modo de execução única com async_summary, o resumo sai como uma segunda linha JSON,
+    # sempre depois do resultado principal.
+    _result_printed.wait()
+    with _output_lock:
+        print(json.dumps({"type": "detailed_analysis", "job_id": job_id, **summary_message_fields(text, error)}, ensure_ascii=False), flush=True)
+
+def run_once():
+    timer = StageTimer()
+
+    if '--ndjson' in sys.argv[1:]:
+        try:
+            result = analyze_ndjson(sys.stdin, on_summary=print_summary_message, timer=timer)
+        except (json.JSONDecodeError, ValueError) as e:
+            print(json.dumps({"error": f"Invalid NDJSON input: {e}"}), file=sys.stderr)
+            sys.exit(1)
+        print_result(result, timer)
+        wait_for_jobs()
+        return
+
+    with timer.stage("read_input") as stage:
+        raw_data = sys.stdin.buffer.read()
+        stage["bytes"] = len(raw_data)
+
+    # Payload binário colunar (columnar_payload.py) ou JSON.
+    if is_columnar(raw_data):
+        try:
+            result = analyze_columnar(raw_data, on_summary=print_summary_message, timer=timer)
+        except (ValueError, KeyError) as e:
+            print(json.dumps({"error": f"Invalid columnar input: {e}"}), file=sys.stderr)
+            sys.exit(1)
+        print_result(result, timer)
+        wait_for_jobs()
+        return
+
+    try:
+        with timer.stage("parse"):
+            data_periods = json.loads(raw_data)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        print(json.dumps({"error": "Invalid JSON input"}), file=sys.stderr)
+        sys.exit(1)
+
+    result = analyze_payload(data_periods, on_summary=print_summary_message, timer=timer)
+
+    print_result(result, timer)
+    wait_for_jobs()
+
+def main():
+    sys.stdin.reconfigure(encoding='utf-8')
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    if '--worker' in sys.argv[1:]:
+        run_worker()
+        return
 
-    print(json.dumps(result, ensure_ascii=False))
+    with profiled(os.getpid()):
+        run_once()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    # Registra este módulo com o próprio nome para que incremental_aggregates reutilize esta instância.
+    sys.modules.setdefault('analyze_evaluations', sys.modules['__main__'])
+    main()
@@ -0,0 +1,50 @@
+"""Atualizações incrementais (índice de comentários, agregados parciais) fora do caminho das requisições.
+
+Um BackgroundRefresher roda a função de atualização em uma única thread de fundo, que é a única a
+gravar no destino dentro do processo, com uma conexão própria ao MySQL. Uma chave (a instituição)
+só é agendada se não houver outra atualização dela na fila e a última tiver terminado há mais de
+interval segundos; as requisições leem o que já está gravado.
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+class BackgroundRefresher:
+    def __init__(self, name, refresh, interval_env, default_interval=60):
+        # refresh(connection, key) faz a atualização; interval_env sobrepõe default_interval (segundos).
+        self.name = name
+        self.refresh = refresh
+        self.interval_env = interval_env
+        self.default_interval = default_interval
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._last_finished = {}
+
+    def schedule(self, key):
+        """Agenda a atualização de key; retorna False se já há uma pendente ou se a última é recente."""
+        interval = float(os.getenv(self.interval_env, self.default_interval))
+        with self._lock:
+            last = self._last_finished.get(key)
+            if key in self._pending or (last is not None and time.monotonic() - last < interval):
+                return False
+            self._pending.add(key)
+        self._executor.submit(self._run, key)
+        return True
+
+    def _run(self, key):
+        try:
+            from db_connection import get_connection
+            connection = get_connection()
+            try:
+                self.refresh(connection, key)
+            finally:
+                connection.close()
+        except Exception as e:
+            print(f"[{self.name}] falha ao atualizar {key}: {e}", file=sys.stderr)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+                self._last_finished[key] = time.monotonic()
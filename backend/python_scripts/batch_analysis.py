@@ -0,0 +1,186 @@
+"""Análise em lote de todas as instituições e cursos em um único processo.
+
+As avaliações são lidas uma única vez (só as colunas usadas), filtradas para a avaliação mais
+recente de cada usuário em cada grupo (como faz o backend) e agrupadas por instituição e/ou por
+instituição e curso. Cada grupo é analisado com run_analysis em um pool de processos, e o
+resultado é gravado em um arquivo JSON por grupo ou como uma linha de AnalyticsResults
+(tipo = 'batch_analysis').
+
+Uso:
+    python batch_analysis.py --output-dir ../reports/batch [--level both] [--workers 8]
+    python batch_analysis.py --store analytics_results [--start 2026-01-01 --end 2026-06-30]
+    python batch_analysis.py --input avaliacoes.json --output-dir /tmp/batch   (sem banco)
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from analyze_evaluations import CATEGORIES, apply_period_comparison, prepare_dataframe, run_analysis
+
+TIPO_BATCH = 'batch_analysis'
+LEVELS = ('institution', 'course', 'both')
+
+BATCH_COLUMNS = (
+    ['id', 'usuario_id', 'instituicao_id', 'curso_id', 'criado_em', 'media_final']
+    + [f'nota_{key}' for key in CATEGORIES.keys()]
+    + [f'comentario_{key}' for key in CATEGORIES.keys()]
+)
+
+def load_evaluations(connection, start=None, end=None):
+    query = f"SELECT {', '.join(BATCH_COLUMNS)} FROM Avaliacoes"
+    conditions, params = [], []
+    if start:
+        conditions.append("criado_em >= %s")
+        params.append(start)
+    if end:
+        conditions.append("criado_em <= %s")
+        params.append(end)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    cursor = connection.cursor()
+    cursor.execute(query, params)
+    return pd.DataFrame.from_records(cursor.fetchall(), columns=cursor.column_names)
+
+def latest_per_user(df, group_columns):
+    """Posições (em df) da avaliação mais recente de cada usuário dentro de cada grupo, em ordem de criado_em."""
+    positions = np.arange(len(df))
+    if 'usuario_id' not in df.columns or 'criado_em' not in df.columns:
+        return positions
+    keys = df[group_columns + ['usuario_id', 'criado_em']].set_axis(positions)
+    ordered = keys.sort_values('criado_em', kind='stable')
+    # Em empates no criado_em fica a primeira linha, como em period_split.latest_per_user.
+    ordered = ordered.drop_duplicates(subset=group_columns + ['usuario_id', 'criado_em'], keep='first')
+    return ordered.drop_duplicates(subset=group_columns + ['usuario_id'], keep='last').index.to_numpy()
+
+def group_positions(df, group_columns):
+    """Gera (valores do grupo, posições em df) sem copiar as linhas; só as colunas de agrupamento são lidas."""
+    kept = latest_per_user(df, group_columns)
+    keys = df[group_columns].take(kept)
+    by = group_columns[0] if len(group_columns) == 1 else group_columns
+    for values, indices in keys.groupby(by, sort=False).indices.items():
+        yield values, kept[indices]
+
+def iter_groups(df, level):
+    """Gera (chave, posições das linhas em df) para cada grupo; a chave é {"instituicao_id": ..., "curso_id": ...}."""
+    if level in ('institution', 'both'):
+        for institution_id, positions in group_positions(df, ['instituicao_id']):
+            yield {"instituicao_id": int(institution_id), "curso_id": None}, positions
+    if level in ('course', 'both'):
+        for (institution_id, course_id), positions in group_positions(df, ['instituicao_id', 'curso_id']):
+            yield {"instituicao_id": int(institution_id), "curso_id": int(course_id)}, positions
+
+# DataFrame com todas as avaliações, entregue a cada processo do pool uma única vez (herdado no
+# fork ou enviado no initializer); as tarefas carregam só as posições das linhas do grupo.
+_batch_frame = None
+
+def _init_worker(df):
+    global _batch_frame
+    _batch_frame = df
+
+def analyze_group(task):
+    """Executado nos processos do pool: analisa as linhas de um grupo."""
+    key, positions = task
+    df = prepare_dataframe(_batch_frame.take(positions).reset_index(drop=True))
+    result = run_analysis(df)
+    total = len(df) if df is not None else 0
+    average_final = df['media_final'].astype(float).mean() if df is not None and 'media_final' in df.columns else 0
+    apply_period_comparison(result, total, 0 if pd.isna(average_final) else average_final, None, {"skip_summary": True})
+    return key, result
+
+def group_filename(key):
+    name = f"instituicao_{key['instituicao_id']}"
+    if key['curso_id'] is not None:
+        name += f"_curso_{key['curso_id']}"
+    return name + ".json"
+
+def write_result_file(output_dir, key, result):
+    with open(os.path.join(output_dir, group_filename(key)), 'w', encoding='utf-8') as output_file:
+        json.dump(result, output_file, ensure_ascii=False, default=str)
+
+def store_result(cursor, key, result):
+    cursor.execute(
+        "INSERT INTO AnalyticsResults (instituicao_id, curso_id, tipo, payload) VALUES (%s, %s, %s, %s)",
+        (key['instituicao_id'], key['curso_id'], TIPO_BATCH, json.dumps(result, ensure_ascii=False, default=str))
+    )
+
+def run_batch(df, level='both', workers=None, on_result=None):
+    """Analisa todos os grupos em um pool de processos e chama on_result(chave, resultado) para cada um.
+
+    Os grupos maiores são enviados primeiro, para que nenhum processo fique com o grupo mais
+    pesado no fim da fila. As tarefas são submetidas aos poucos (no máximo duas por processo em
+    andamento) e os resultados entregues na ordem em que terminam. Retorna o número de grupos analisados.
+    """
+    tasks = sorted(iter_groups(df, level), key=lambda task: len(task[1]), reverse=True)
+    if not tasks:
+        return 0
+    workers = workers or os.cpu_count() or 1
+    pending = iter(tasks)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(df,)) as executor:
+        running = {executor.submit(analyze_group, task) for task in itertools.islice(pending, 2 * workers)}
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, result = future.result()
+                if on_result is not None:
+                    on_result(key, result)
+            running |= {executor.submit(analyze_group, task) for task in itertools.islice(pending, len(done))}
+    return len(tasks)
+
+def main():
+    parser = argparse.ArgumentParser(description="Análise em lote de todas as instituições e cursos.")
+    parser.add_argument('--level', choices=LEVELS, default='both', help="agrupar por instituição, por curso ou ambos")
+    parser.add_argument('--workers', type=int, default=None, help="processos no pool (padrão: número de núcleos)")
+    parser.add_argument('--start', help="data inicial (criado_em >= start)")
+    parser.add_argument('--end', help="data final (criado_em <= end)")
+    parser.add_argument('--input', help="arquivo JSON com a lista de avaliações, em vez do banco")
+    parser.add_argument('--output-dir', help="grava um arquivo JSON por grupo neste diretório")
+    parser.add_argument('--store', choices=['analytics_results'], help="grava os resultados em AnalyticsResults")
+    args = parser.parse_args()
+
+    if not args.output_dir and not args.store:
+        parser.error("informe --output-dir e/ou --store")
+
+    started = time.perf_counter()
+    connection = None
+    if args.input:
+        with open(args.input, encoding='utf-8') as input_file:
+            df = pd.DataFrame(json.load(input_file))
+    else:
+        from db_connection import get_connection
+        connection = get_connection()
+        df = load_evaluations(connection, args.start, args.end)
+    loaded = time.perf_counter()
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    if args.store and connection is None:
+        from db_connection import get_connection
+        connection = get_connection()
+    cursor = connection.cursor() if args.store else None
+
+    def on_result(key, result):
+        if args.output_dir:
+            write_result_file(args.output_dir, key, result)
+        if cursor is not None:
+            store_result(cursor, key, result)
+
+    try:
+        groups = run_batch(df, args.level, args.workers, on_result)
+        if connection is not None and args.store:
+            connection.commit()
+    finally:
+        if connection is not None:
+            connection.close()
+
+    finished = time.perf_counter()
+    print(f"{len(df)} avaliações, {groups} grupos analisados (leitura {loaded - started:.1f}s, análise {finished - loaded:.1f}s).", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Compara memória e tempo da representação compacta de prepare_dataframe com a representação antiga.
+
+A representação antiga mantém as notas em float64 e troca NaN por None em todo o DataFrame
+(df.replace({np.nan: None})), o que deixa todas as colunas como object. A compacta guarda as
+notas em Int8 e os comentários repetidos como category (ver compact_comments). Cada modo roda em
+um processo separado para que o pico de RSS (ru_maxrss) seja medido isoladamente.
+
+Os comentários do gerador sintético saem de um conjunto pequeno de frases; com --comments unique
+cada comentário recebe um sufixo próprio, como em texto livre real, em que quase todos são distintos
+(category não economiza nada e a coluna fica como texto).
+
+Uso: python benchmarks/bench_dataframe_memory.py [--rows 1000000] [--mode both|legacy|compact] [--comments pool|unique]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyze_evaluations import CATEGORIES, distinct_ratio, prepare_dataframe, run_analysis
+from synthetic_data import generate_frame
+
+def legacy_prepare_dataframe(df):
+    # Representação anterior de create_dataframe, mantida aqui só para comparação.
+    nota_cols = [f'nota_{key}' for key in CATEGORIES.keys() if f'nota_{key}' in df.columns]
+    for nota_col in nota_cols:
+        df[nota_col] = pd.to_numeric(df[nota_col], errors='coerce')
+    df['media_final'] = pd.to_numeric(df['media_final'], errors='coerce')
+    df.dropna(subset=nota_cols, how='all', inplace=True)
+    df.replace({np.nan: None}, inplace=True)
+    return df
+
+def make_comments_unique(frame):
+    for key in CATEGORIES.keys():
+        column = f'comentario_{key}'
+        present = frame[column].notna()
+        frame.loc[present, column] = frame.loc[present, column] + ' (avaliação ' + frame.loc[present, 'id'].astype(str) + ')'
+    return frame
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_mode(mode, rows, comments='pool'):
+    frame = generate_frame(rows)
+    if comments == 'unique':
+        frame = make_comments_unique(frame)
+    ratio = distinct_ratio(frame[f'comentario_{next(iter(CATEGORIES))}'].to_numpy(dtype=object))
+    baseline_rss = peak_rss_mb()
+    prepare = legacy_prepare_dataframe if mode == 'legacy' else prepare_dataframe
+
+    started = time.perf_counter()
+    df = prepare(frame)
+    prepared = time.perf_counter()
+    run_analysis(df)
+    analyzed = time.perf_counter()
+
+    return {
+        'mode': mode,
+        'rows': len(df),
+        'comments_distinct_ratio': round(ratio, 3),
+        'comment_dtype': str(df[f'comentario_{next(iter(CATEGORIES))}'].dtype),
+        'dataframe_mb': round(df.memory_usage(deep=True).sum() / 2 ** 20, 1),
+        'prepare_ms': round((prepared - started) * 1000, 1),
+        'run_analysis_ms': round((analyzed - prepared) * 1000, 1),
+        'rows_per_second': round(len(df) / (analyzed - started)),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'peak_rss_after_input_mb': round(baseline_rss, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--mode', choices=['both', 'legacy', 'compact'], default='both')
+    parser.add_argument('--comments', choices=['pool', 'unique'], default='pool')
+    args = parser.parse_args()
+
+    if args.mode != 'both':
+        print(json.dumps(run_mode(args.mode, args.rows, args.comments)))
+        return
+
+    results = []
+    for mode in ('legacy', 'compact'):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--rows', str(args.rows), '--mode', mode, '--comments', args.comments],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output))
+
+    print(f"linhas: {results[0]['rows']}, comentários distintos (amostra): {results[0]['comments_distinct_ratio']:.1%}")
+    for result in results:
+        print(
+            f"{result['mode']:>8}: comentários {result['comment_dtype']}, DataFrame {result['dataframe_mb']} MB, pico RSS {result['peak_rss_mb']} MB "
+            f"(entrada {result['peak_rss_after_input_mb']} MB), preparo {result['prepare_ms']} ms, "
+            f"run_analysis {result['run_analysis_ms']} ms, {result['rows_per_second']} linhas/s"
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Compara run_analysis (vetorizado) com a implementação original categoria a categoria.
+
+Uso: python benchmarks/bench_run_analysis.py [--rows 200000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyze_evaluations import CATEGORIES, analyze_sentiment, create_dataframe, generate_suggestion_object, run_analysis
+from synthetic_data import generate_frame, to_records
+
+# Implementação original de run_analysis, categoria a categoria, usada como referência de tempo e
+# para validar que a versão vetorizada produz o mesmo resultado.
+def run_analysis_by_category(df):
+    if df is None:
+        return {"analysis_by_question": {}, "score_distribution": {}, "averages_by_question": {}}
+
+    analysis_by_question = {}
+    averages_by_question = {}
+    aggregated_score_distribution = Counter()
+
+    for key, name in CATEGORIES.items():
+        nota_col = f'nota_{key}'
+        comentario_col = f'comentario_{key}'
+
+        if nota_col not in df.columns: continue
+
+        valid_scores = df[nota_col].dropna()
+        if valid_scores.empty: continue
+
+        avg_score = valid_scores.mean()
+        averages_by_question[name] = {"value": round(avg_score, 2), "delta": None}
+        score_distribution = valid_scores.value_counts().to_dict()
+        aggregated_score_distribution.update(score_distribution)
+        
+        comments = df[comentario_col].dropna().tolist() if comentario_col in df.columns else []
+        
+        sentiment_score = 0
+        if comments:
+            sentiment_score = df[comentario_col].dropna().apply(analyze_sentiment).mean()
+
+        suggestion_obj = generate_suggestion_object(avg_score, sentiment_score, score_distribution)
+
+        analysis_by_question[key] = {
+            "name": name,
+            "average_score": {"value": round(avg_score, 2), "delta": None},
+            "score_distribution": {int(k): int(v) for k, v in score_distribution.items()},
+            "comments": comments,
+            "sentiment_score": {"value": round(sentiment_score, 2), "delta": None},
+            "suggestion": suggestion_obj
+        }
+    
+    return {
+        "analysis_by_question": analysis_by_question,
+        "score_distribution": {int(k): int(v) for k, v in aggregated_score_distribution.items()},
+        "averages_by_question": averages_by_question
+    }
+
+def time_call(func, df, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(df)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+def check_equivalent(expected, actual):
+    assert expected['averages_by_question'] == actual['averages_by_question'], 'averages_by_question diverge'
+    assert expected['score_distribution'] == actual['score_distribution'], 'score_distribution diverge'
+    for key, item in expected['analysis_by_question'].items():
+        other = actual['analysis_by_question'][key]
+        assert item['score_distribution'] == other['score_distribution'], f'histograma diverge em {key}'
+        assert item['sentiment_score'] == other['sentiment_score'], f'sentimento diverge em {key}'
+        assert item['suggestion'] == other['suggestion'], f'sugestão diverge em {key}'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = create_dataframe(to_records(generate_frame(args.rows)))
+
+    legacy_time, legacy_result = time_call(run_analysis_by_category, df, args.repeat)
+    vectorized_time, vectorized_result = time_call(run_analysis, df, args.repeat)
+    check_equivalent(legacy_result, vectorized_result)
+
+    print(f'linhas: {len(df)}')
+    print(f'run_analysis_by_category: {legacy_time * 1000:.1f} ms')
+    print(f'run_analysis (vetorizado): {vectorized_time * 1000:.1f} ms')
+    print(f'speedup: {legacy_time / vectorized_time:.2f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""Benchmark por etapa do pipeline de análise, com resultados em JSON comparáveis entre commits.
+
+Para cada tamanho pedido, gera avaliações sintéticas (synthetic_data.py, períodos atual e anterior)
+e mede separadamente:
+
+    split_periods       separação dos períodos e da avaliação mais recente de cada aluno a partir das
+                        linhas dos dois períodos juntas, como o backend envia (period_split.py)
+    create_dataframe    create_dataframe dos dois períodos a partir da lista de dicts (acima de
+                        --records-limit linhas, prepare_dataframe sobre o DataFrame já montado)
+    run_analysis        run_analysis do período atual
+    analyze_sentiment   sentimento dos comentários de todas as categorias (comment_sentiment_means)
+    period_comparison   deltas e resumo do LLM (modelo falso, ANALYSIS_LLM=fake, sem cache)
+    serialize           opções de saída, raw_data (até --raw-data-limit linhas) e json.dumps
+    generate_pdf        renderização do PDF em memória (pdf_rendering.render_report) com os apêndices,
+                        cujas listas de comentários crescem com o tamanho (até --pdf-comments-limit
+                        por categoria)
+
+Cada etapa roda --repeat vezes; o JSON guarda tempo de parede (mínimo e mediana), tempo de CPU e
+linhas por segundo. O --compare compara os tempos mínimos e sai com código 1 se alguma etapa ficou
+mais lenta do que o limite (--threshold).
+
+Uso:
+    python benchmarks/run_benchmarks.py --rows 1k,100k,1M --output resultados.json
+    python benchmarks/run_benchmarks.py --compare base.json novo.json [--threshold 0.15]
+"""
+import argparse
+import copy
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+# O LLM é sempre o modelo falso: o benchmark não depende de rede nem de chave do Gemini.
+os.environ['ANALYSIS_LLM'] = 'fake'
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyze_evaluations import (apply_output_options, apply_period_comparison, build_raw_data, build_score_matrix,
+                                 comment_sentiment_means, create_dataframe, get_previous_metrics, prepare_dataframe,
+                                 run_analysis)
+from pdf_rendering import render_report
+from period_split import split_periods
+from synthetic_data import CURRENT_START, generate_periods, parse_rows, to_records
+
+RESULTS_VERSION = 1
+DEFAULT_RECORDS_LIMIT = 1_000_000
+DEFAULT_RAW_DATA_LIMIT = 10_000
+# Cerca de 0,2 ms por comentário no apêndice: com 11 categorias, o limite padrão dá uns 10 s por PDF.
+DEFAULT_PDF_COMMENTS_LIMIT = 5_000
+
+def measure(func, repeat, setup=None):
+    """Executa func(setup()) repeat vezes; setup roda fora da medição. Retorna (tempos, último resultado)."""
+    wall, cpu = [], []
+    result = None
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        started_wall, started_cpu = time.perf_counter(), time.process_time()
+        result = func(argument)
+        wall.append(time.perf_counter() - started_wall)
+        cpu.append(time.process_time() - started_cpu)
+    return {"wall": wall, "cpu": cpu}, result
+
+def stage_summary(timings, rows):
+    wall_median = statistics.median(timings["wall"])
+    return {
+        "rows": rows,
+        "wall_min_s": round(min(timings["wall"]), 6),
+        "wall_median_s": round(wall_median, 6),
+        "cpu_median_s": round(statistics.median(timings["cpu"]), 6),
+        "rows_per_second": round(rows / wall_median) if wall_median else None,
+    }
+
+def benchmark_size(rows, repeat, seed, records_limit, raw_data_limit, pdf_comments_limit=DEFAULT_PDF_COMMENTS_LIMIT):
+    periods = generate_periods(rows, seed=seed)
+    current_rows, previous_rows = len(periods["current"]), len(periods["previous"])
+    stages = {}
+
+    rows_frame = pd.concat([periods["previous"], periods["current"]], ignore_index=True)
+    bounds = {
+        "current": [str(CURRENT_START), str(periods["current"]['criado_em'].iloc[-1])],
+        "previous": [str(periods["previous"]['criado_em'].iloc[0]), str(CURRENT_START - np.timedelta64(1, 's'))],
+    }
+    timings, _ = measure(lambda _: split_periods(rows_frame, bounds), repeat)
+    stages["split_periods"] = stage_summary(timings, len(rows_frame))
+    del rows_frame
+
+    if current_rows + previous_rows <= records_limit:
+        records = {period: to_records(df) for period, df in periods.items()}
+        def build(_):
+            return create_dataframe(records["current"]), create_dataframe(records["previous"])
+        input_kind = "records"
+    else:
+        def build(frames):
+            return prepare_dataframe(frames["current"]), prepare_dataframe(frames["previous"])
+        input_kind = "frame"
+    timings, (df_current, df_previous) = measure(
+        build, repeat, setup=lambda: {period: df.copy() for period, df in periods.items()}
+    )
+    stages["create_dataframe"] = {**stage_summary(timings, current_rows + previous_rows), "input": input_kind}
+    del periods
+
+    timings, result = measure(lambda _: run_analysis(df_current), repeat)
+    stages["run_analysis"] = stage_summary(timings, current_rows)
+
+    keys, _ = build_score_matrix(df_current)
+    timings, _ = measure(lambda _: comment_sentiment_means(df_current, keys), repeat)
+    stages["analyze_sentiment"] = stage_summary(timings, current_rows)
+
+    average_final = float(df_current['media_final'].mean())
+    previous = (len(df_previous), float(df_previous['media_final'].mean()), get_previous_metrics(df_previous))
+    options = {"force_summary_regen": True, "raw_data_limit": raw_data_limit}
+    timings, compared = measure(
+        lambda fresh: apply_period_comparison(fresh, current_rows, average_final, previous, options),
+        repeat, setup=lambda: copy.deepcopy(result),
+    )
+    stages["period_comparison"] = stage_summary(timings, current_rows)
+
+    def serialize(fresh):
+        apply_output_options(fresh, options)
+        fresh["raw_data"] = build_raw_data(df_current, options)
+        return json.dumps(fresh, ensure_ascii=False)
+    timings, payload = measure(serialize, repeat, setup=lambda: copy.deepcopy(compared))
+    stages["serialize"] = {**stage_summary(timings, current_rows), "bytes": len(payload.encode('utf-8'))}
+
+    report = json.loads(payload)
+    report["pdf_options"] = {"include_appendices": True}
+    for analysis in report["analysis_by_question"].values():
+        analysis["comments"] = analysis["comments"][:pdf_comments_limit]
+    comments = sum(len(analysis["comments"]) for analysis in report["analysis_by_question"].values())
+    timings, _ = measure(lambda _: render_report(report, io.BytesIO()), repeat)
+    stages["generate_pdf"] = {**stage_summary(timings, current_rows), "comments": comments}
+
+    return {"rows": current_rows, "previous_rows": previous_rows, "stages": stages}
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    sizes = [parse_rows(value) for value in args.rows.split(',')]
+    results = {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "raw_data_limit": args.raw_data_limit,
+            "pdf_comments_limit": args.pdf_comments_limit,
+        },
+        "results": [],
+    }
+    for rows in sizes:
+        size_result = benchmark_size(rows, args.repeat, args.seed, args.records_limit, args.raw_data_limit, args.pdf_comments_limit)
+        results["results"].append(size_result)
+        for stage, summary in size_result["stages"].items():
+            print(f"{rows:>9} linhas  {stage:<18} {summary['wall_median_s'] * 1000:10.1f} ms", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+def compare(base_path, new_path, threshold):
+    """Compara os tempos mínimos de dois arquivos de resultado; retorna o número de regressões acima de threshold.
+
+    O mínimo é menos sensível a ruído (outros processos, GC) do que a mediana.
+    """
+    with open(base_path, encoding='utf-8') as base_file, open(new_path, encoding='utf-8') as new_file:
+        base, new = json.load(base_file), json.load(new_file)
+    base_by_rows = {result["rows"]: result["stages"] for result in base["results"]}
+
+    print(f"base: {base['meta'].get('commit')}  novo: {new['meta'].get('commit')}")
+    regressions = 0
+    for result in new["results"]:
+        base_stages = base_by_rows.get(result["rows"])
+        if base_stages is None: continue
+        for stage, summary in result["stages"].items():
+            if stage not in base_stages: continue
+            # PDFs com outro número de comentários no apêndice (ou sem apêndice, em resultados antigos) não são comparáveis.
+            if summary.get("comments") != base_stages[stage].get("comments"): continue
+            before, after = base_stages[stage]["wall_min_s"], summary["wall_min_s"]
+            ratio = after / before if before else float('inf')
+            flag = ''
+            if ratio > 1 + threshold:
+                flag = 'REGRESSÃO'
+                regressions += 1
+            elif ratio < 1 - threshold:
+                flag = 'melhora'
+            print(f"{result['rows']:>9} linhas  {stage:<18} {before * 1000:10.1f} ms -> {after * 1000:10.1f} ms  {ratio:6.2f}x  {flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark por etapa do pipeline de análise.")
+    parser.add_argument('--rows', default='1k,100k', help="tamanhos do período atual separados por vírgula (ex.: 1k,100k,1M,5M)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--records-limit', type=int, default=DEFAULT_RECORDS_LIMIT,
+                        help="acima deste total de linhas, create_dataframe é medido sobre o DataFrame em vez da lista de dicts")
+    parser.add_argument('--raw-data-limit', type=int, default=DEFAULT_RAW_DATA_LIMIT, help="linhas de raw_data serializadas")
+    parser.add_argument('--pdf-comments-limit', type=int, default=DEFAULT_PDF_COMMENTS_LIMIT,
+                        help="comentários por categoria no apêndice do PDF medido")
+    parser.add_argument('--output', help="arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NOVO'), help="compara dois arquivos de resultado")
+    parser.add_argument('--threshold', type=float, default=0.15, help="variação relativa considerada regressão no --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare, args.threshold)
+        sys.exit(1 if regressions else 0)
+    run(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Gerador determinístico de linhas sintéticas de Avaliacoes para benchmarks.
+
+As linhas têm as mesmas colunas da tabela (id, usuario_id, instituicao_id, curso_id, criado_em,
+media_final, nota_* e comentario_*). As notas partem de uma satisfação por instituição e por aluno,
+com ~5% de notas ausentes; os comentários, em português, são montados a partir de trechos com as
+palavras-chave de sentimento de keyword_matcher.py e acompanham a nota (notas baixas geram
+comentários negativos). A mesma seed gera sempre os mesmos dados.
+
+Uso como script: python benchmarks/synthetic_data.py --rows 10k --output avaliacoes.json
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyze_evaluations import CATEGORIES
+
+MISSING_SCORE_RATE = 0.05
+# Probabilidade de comentário por nota (1 a 5): alunos insatisfeitos comentam mais.
+COMMENT_RATE = np.array([0.55, 0.45, 0.25, 0.2, 0.3])
+PERIOD_DAYS = 180
+CURRENT_START = np.datetime64('2026-01-01T00:00:00')
+
+SUBJECTS = {
+    "infraestrutura": ['a estrutura do campus', 'os banheiros', 'as salas de aula', 'a cantina'],
+    "coordenacao": ['a coordenação', 'o coordenador do curso', 'o atendimento da coordenação'],
+    "direcao": ['a direção', 'a gestão da instituição', 'a comunicação da direção'],
+    "localizacao": ['a localização', 'o acesso ao campus', 'o transporte até a faculdade'],
+    "acessibilidade": ['a acessibilidade', 'as rampas e elevadores', 'o apoio a alunos com deficiência'],
+    "equipamentos": ['os laboratórios', 'os computadores', 'os equipamentos das aulas práticas'],
+    "biblioteca": ['a biblioteca', 'o acervo', 'a biblioteca digital'],
+    "didatica": ['a didática dos professores', 'as aulas', 'a metodologia'],
+    "conteudo": ['o conteúdo do curso', 'a grade curricular', 'as disciplinas'],
+    "dinamica_professores": ['os professores', 'a dinâmica das aulas', 'o engajamento dos docentes'],
+    "disponibilidade_professores": ['os professores', 'o suporte fora de aula', 'a monitoria'],
+}
+PREDICATES = {
+    'negative': ['é ruim', 'está péssimo', 'é lento', 'está antigo e quebrado', 'é desorganizado',
+                 'tem muita demora', 'é ineficiente', 'precisa melhorar', 'tem falta de recursos'],
+    'neutral': ['é razoável', 'poderia ser melhor', 'atende o básico', 'funciona às vezes, mas tem problema',
+                'é bom em parte', 'não mudou muito'],
+    'positive': ['é ótimo', 'é excelente', 'é rápido e eficiente', 'é novo e funciona bem', 'é organizado',
+                 'é acessível e fácil', 'me deixa satisfeito', 'é seguro e bom'],
+}
+OPENERS = ['', 'Na minha opinião, ', 'Sinceramente, ', 'No geral, ', 'Neste semestre ']
+CLOSERS = ['.', '!', '. Espero que continue assim.', '. Já comentei com outros colegas.', '. Nada a acrescentar.']
+POLARITY_BY_SCORE = ['negative', 'negative', 'neutral', 'positive', 'positive']
+
+def parse_rows(value):
+    """Converte "1k", "250k", "5M" ou "1000" em número de linhas."""
+    value = value.strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(value[-1:], 1)
+    return int(float(value[:-1] if multiplier > 1 else value) * multiplier)
+
+def comment_pool(key, polarity):
+    texts = [
+        f"{opener}{subject} {predicate}{closer}"
+        for opener in OPENERS for subject in SUBJECTS[key] for predicate in PREDICATES[polarity] for closer in CLOSERS
+    ]
+    return np.array([text[0].upper() + text[1:] for text in texts], dtype=object)
+
+def generate_frame(rows, seed=42, start=CURRENT_START, days=PERIOD_DAYS, institutions=10, courses_per_institution=8, first_id=1):
+    """Gera `rows` avaliações com criado_em em [start, start + days), ordenadas por criado_em.
+
+    As notas saem como float64 com NaN e os comentários como object, os tipos que o pandas infere do
+    JSON enviado pelo backend.
+    """
+    rng = np.random.default_rng(seed)
+    institution_weights = 1 / np.arange(1, institutions + 1)
+    institution_ids = rng.choice(np.arange(1, institutions + 1), size=rows, p=institution_weights / institution_weights.sum())
+    course_ids = (institution_ids - 1) * courses_per_institution + rng.integers(1, courses_per_institution + 1, size=rows)
+    seconds = np.sort(rng.integers(0, days * 86400, size=rows))
+
+    data = {
+        'id': np.arange(first_id, first_id + rows),
+        # ~15% dos alunos avaliam mais de uma vez no período.
+        'usuario_id': rng.integers(1, max(2, int(rows * 0.85)), size=rows),
+        'instituicao_id': institution_ids,
+        'curso_id': course_ids,
+        'criado_em': np.datetime_as_string(start + seconds.astype('timedelta64[s]'), unit='ms').astype(object) + 'Z',
+    }
+
+    satisfaction = rng.normal(3.6, 0.4, size=institutions + 1)[institution_ids] + rng.normal(0, 0.8, size=rows)
+    score_columns = []
+    for key in CATEGORIES.keys():
+        scores = np.clip(np.rint(satisfaction + rng.normal(rng.normal(0, 0.3), 0.7, size=rows)), 1, 5)
+        levels = scores.astype(np.int64) - 1
+        has_comment = rng.random(rows) < COMMENT_RATE[levels]
+        comments = np.full(rows, None, dtype=object)
+        for polarity in ('negative', 'neutral', 'positive'):
+            rows_with_polarity = has_comment & np.isin(levels, [i for i, p in enumerate(POLARITY_BY_SCORE) if p == polarity])
+            pool = comment_pool(key, polarity)
+            comments[rows_with_polarity] = pool[rng.integers(0, len(pool), size=int(rows_with_polarity.sum()))]
+        scores[rng.random(rows) < MISSING_SCORE_RATE] = np.nan
+        data[f'nota_{key}'] = scores
+        data[f'comentario_{key}'] = comments
+        score_columns.append(scores)
+
+    all_scores = np.column_stack(score_columns)
+    counts = (~np.isnan(all_scores)).sum(axis=1)
+    data['media_final'] = np.round(np.nansum(all_scores, axis=1) / np.maximum(counts, 1), 2)
+    return pd.DataFrame(data)
+
+def generate_periods(rows, previous_rows=None, seed=42, days=PERIOD_DAYS):
+    """Gera {"current": DataFrame, "previous": DataFrame}; o período anterior termina onde o atual começa."""
+    previous_rows = int(rows * 0.8) if previous_rows is None else previous_rows
+    return {
+        "current": generate_frame(rows, seed=seed, days=days, first_id=previous_rows + 1),
+        "previous": generate_frame(previous_rows, seed=seed + 1, start=CURRENT_START - np.timedelta64(days, 'D'), days=days),
+    }
+
+def to_records(df):
+    """Linhas como a lista de dicts que o backend envia em JSON (None no lugar de NaN)."""
+    df = df.astype({column: 'Int64' for column in df.columns if column.startswith('nota_')})
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera avaliações sintéticas em JSON ({current, previous}).")
+    parser.add_argument('--rows', default='10k', help="linhas do período atual (ex.: 1k, 250k, 5M)")
+    parser.add_argument('--previous-rows', default=None, help="linhas do período anterior (padrão: 80%% do atual)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', required=True)
+    args = parser.parse_args()
+
+    previous_rows = parse_rows(args.previous_rows) if args.previous_rows else None
+    periods = generate_periods(parse_rows(args.rows), previous_rows, seed=args.seed)
+    with open(args.output, 'w', encoding='utf-8') as output_file:
+        json.dump({period: to_records(df) for period, df in periods.items()}, output_file, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
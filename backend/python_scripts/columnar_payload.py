@@ -0,0 +1,162 @@
+"""Formato binário colunar para o payload de analyze_evaluations.py (gerado em src/services/columnarPayload.ts).
+
+Layout (little-endian):
+
+    magic        4 bytes  b"AVC1"
+    header_len   uint32
+    header       header_len bytes de JSON UTF-8, completado com espaços até um múltiplo de 8 bytes
+    dados        blocos referenciados pelo header (offsets a partir do início dos dados, alinhados a 8 bytes)
+
+O header é {"periods": {"current": {"rows": N, "columns": [...]}, "previous": {...}}, "options": {...},
+"strings": {"offsets": [o, n], "data": [o, n]}}. Com as linhas dos dois períodos juntas, "periods" tem
+uma única tabela "rows" e "period_bounds" traz os limites de cada período (ver period_split.py). Cada coluna é {"name", "type", "offset", "length"}:
+
+    int8     notas; -1 = nulo
+    int32    ids; -2147483648 = nulo
+    float64  media_final; NaN = nulo
+    string   int32 com o índice na tabela de strings; -1 = nulo
+
+A tabela de strings é compartilhada por todas as colunas: "offsets" é um bloco uint32 com n + 1
+posições e "data" os bytes UTF-8 concatenados. As colunas numéricas são lidas com np.frombuffer,
+sem cópia; só as strings usadas são decodificadas.
+"""
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"AVC1"
+INT8_NULL = -1
+INT32_NULL = np.iinfo(np.int32).min
+STRING_NULL = -1
+ALIGNMENT = 8
+
+DTYPES = {"int8": np.int8, "int32": np.int32, "float64": np.float64, "string": np.int32}
+
+def is_columnar(data):
+    return data[:len(MAGIC)] == MAGIC
+
+def _column_type(name, values):
+    if name.startswith('nota_'):
+        return "int8"
+    if name == 'media_final':
+        return "float64"
+    if all(value is None or (isinstance(value, int) and not isinstance(value, bool)) for value in values):
+        return "int32"
+    return "string"
+
+class _Writer:
+    def __init__(self):
+        self.blocks = []
+        self.size = 0
+
+    def add(self, data):
+        padding = -self.size % ALIGNMENT
+        if padding:
+            self.blocks.append(b"\0" * padding)
+            self.size += padding
+        offset = self.size
+        self.blocks.append(data)
+        self.size += len(data)
+        return {"offset": offset, "length": len(data)}
+
+def encode(periods, options=None, period_bounds=None):
+    """Codifica {"current": [avaliações], "previous": [...]} no formato colunar (usado em testes e benchmarks)."""
+    writer = _Writer()
+    strings, string_index = [], {}
+    header = {"periods": {}, "options": options or {}}
+    if period_bounds is not None:
+        header["period_bounds"] = period_bounds
+
+    def intern(value):
+        if value is None:
+            return STRING_NULL
+        value = str(value)
+        if value not in string_index:
+            string_index[value] = len(strings)
+            strings.append(value)
+        return string_index[value]
+
+    for period, rows in periods.items():
+        names = list(dict.fromkeys(name for row in rows for name in row))
+        columns = []
+        for name in names:
+            values = [row.get(name) for row in rows]
+            column_type = _column_type(name, values)
+            if column_type == "int8":
+                array = np.array([INT8_NULL if value is None else int(value) for value in values], dtype=np.int8)
+            elif column_type == "int32":
+                array = np.array([INT32_NULL if value is None else value for value in values], dtype=np.int32)
+            elif column_type == "float64":
+                array = np.array([np.nan if value is None else float(value) for value in values], dtype=np.float64)
+            else:
+                array = np.array([intern(value) for value in values], dtype=np.int32)
+            columns.append({"name": name, "type": column_type, **writer.add(array.astype(array.dtype.newbyteorder('<')).tobytes())})
+        header["periods"][period] = {"rows": len(rows), "columns": columns}
+
+    encoded = [value.encode('utf-8') for value in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u4')
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    header["strings"] = {"offsets": writer.add(offsets.tobytes()), "data": writer.add(b"".join(encoded))}
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b" " * (-(len(MAGIC) + 4 + len(header_bytes)) % ALIGNMENT)
+    return MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes + b"".join(writer.blocks)
+
+def _block(buffer, base, spec, dtype):
+    count = spec["length"] // np.dtype(dtype).itemsize
+    return np.frombuffer(buffer, dtype=np.dtype(dtype).newbyteorder('<'), count=count, offset=base + spec["offset"])
+
+def _string_table(buffer, base, spec):
+    offsets = _block(buffer, base, spec["offsets"], np.uint32)
+    data = memoryview(buffer)[base + spec["data"]["offset"]: base + spec["data"]["offset"] + spec["data"]["length"]]
+    return offsets, data
+
+def _decode_strings(indices, offsets, data, categorical=False):
+    # Decodifica apenas as strings referenciadas pela coluna, uma vez cada. Com categorical=True
+    # (comentários) as strings distintas viram as categorias e os índices, os códigos.
+    present = indices != STRING_NULL
+    unique, inverse = np.unique(indices[present], return_inverse=True)
+    decoded = np.array([bytes(data[offsets[i]:offsets[i + 1]]).decode('utf-8') for i in unique], dtype=object)
+    if categorical:
+        codes = np.full(len(indices), -1, dtype=np.int32)
+        codes[present] = inverse
+        return pd.Categorical.from_codes(codes, categories=pd.Index(decoded, dtype=object))
+    values = np.full(len(indices), None, dtype=object)
+    values[present] = decoded[inverse]
+    return values
+
+def decode(buffer):
+    """Decodifica o payload e retorna ({"current": DataFrame ou None, "previous": ...}, options, period_bounds).
+
+    Notas saem como Int8 e comentários como category, a representação de prepare_dataframe; ids
+    saem como int64 (ou float64 com NaN se houver nulos), como o pandas infere a partir do JSON.
+    """
+    if not is_columnar(buffer):
+        raise ValueError("Payload colunar inválido (magic ausente)")
+    header_len, = struct.unpack_from('<I', buffer, len(MAGIC))
+    header_start = len(MAGIC) + 4
+    header = json.loads(bytes(buffer[header_start:header_start + header_len]).decode('utf-8'))
+    base = header_start + header_len
+    offsets, data = _string_table(buffer, base, header["strings"])
+
+    frames = {}
+    for period, spec in header["periods"].items():
+        if not spec["rows"]:
+            frames[period] = None
+            continue
+        columns = {}
+        for column in spec["columns"]:
+            values = _block(buffer, base, column, DTYPES[column["type"]])
+            if column["type"] == "int8":
+                columns[column["name"]] = pd.arrays.IntegerArray(values.copy(), values == INT8_NULL)
+            elif column["type"] == "int32":
+                missing = values == INT32_NULL
+                columns[column["name"]] = np.where(missing, np.nan, values) if missing.any() else values.astype(np.int64)
+            elif column["type"] == "float64":
+                columns[column["name"]] = values
+            else:
+                columns[column["name"]] = _decode_strings(values, offsets, data, column["name"].startswith('comentario_'))
+        frames[period] = pd.DataFrame(columns)
+    return frames, header.get("options") or {}, header.get("period_bounds")
@@ -0,0 +1,438 @@
+"""Índice invertido persistente dos comentários das avaliações (colunas comentario_*), em SQLite.
+
+Cada comentário é quebrado em termos com o KeywordMatcher (minúsculas, sem acentos, sem stopwords
+e palavras curtas) e guardado com a instituição, o curso, a categoria, o dia, a nota e o sentimento.
+O índice mantém:
+
+    comments      o texto de cada comentário, chave (avaliacao_id, categoria)
+    postings      termo -> comentários, por instituição, categoria e dia
+    term_counts   contagens diárias de cada termo e bigrama (pares de termos vizinhos) por
+                  instituição, curso e categoria
+
+Os termos e bigramas mais frequentes de um período saem da soma das contagens diárias, sem reler
+os textos, e os comentários representativos, dos postings dos termos principais. Um checkpoint por
+instituição guarda o maior Avaliacoes.id já indexado, então cada atualização lê só as avaliações
+novas; indexar de novo uma avaliação já indexada não altera as contagens.
+
+As consultas das requisições (topics_for_period) só leem o índice: a atualização da instituição é
+agendada em uma única thread de fundo, que é a única a gravar no SQLite do processo, e uma nova só é
+agendada se não houver outra pendente e a última tiver terminado há mais de
+COMMENT_INDEX_REFRESH_SECONDS (padrão 60). Por isso uma requisição pode não ver as avaliações mais
+recentes; a carga inicial deve ser feita com --refresh (ou agendada, ex.: cron).
+
+O arquivo fica em COMMENT_INDEX_PATH (padrão: .comment_index/comments.sqlite ao lado deste script).
+Ids ausentes (instituição ou curso NULL) são guardados como 0.
+
+Uso:
+    python comment_index.py --refresh [--institution ID]
+    python comment_index.py --institution ID --category didatica [--course ID] [--start 2026-01-01] [--end 2026-06-30] [--top 10]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from background_refresh import BackgroundRefresher
+from keyword_matcher import TOKEN_PATTERN, get_matcher
+
+COMMENT_INDEX_PATH_ENV = "COMMENT_INDEX_PATH"
+REFRESH_INTERVAL_ENV = "COMMENT_INDEX_REFRESH_SECONDS"
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.comment_index', 'comments.sqlite')
+NULL_ID = 0
+GLOBAL_CHECKPOINT = -1
+REFRESH_CHUNK_ROWS = 5000
+
+TERM, BIGRAM = 1, 2
+# Termos principais usados para buscar os comentários representativos e candidatos lidos por termo.
+REPRESENTATIVE_TERMS = 15
+CANDIDATES_PER_TERM = 100
+# Cada termo já coberto por um comentário escolhido vale REPEAT_DISCOUNT vezes menos no próximo, e
+# cada comentário de uma nota (ou sentimento) já representada, LEVEL_DISCOUNT vezes menos.
+REPEAT_DISCOUNT = 0.5
+LEVEL_DISCOUNT = 0.7
+# Amostra de comentários lida por select_comment_sample quando não há índice.
+SAMPLE_CANDIDATES = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS comments (
+    avaliacao_id INTEGER NOT NULL,
+    categoria TEXT NOT NULL,
+    instituicao_id INTEGER NOT NULL,
+    curso_id INTEGER NOT NULL,
+    dia TEXT NOT NULL,
+    nota REAL,
+    sentimento INTEGER NOT NULL,
+    texto TEXT NOT NULL,
+    PRIMARY KEY (avaliacao_id, categoria)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+    instituicao_id INTEGER NOT NULL,
+    categoria TEXT NOT NULL,
+    term TEXT NOT NULL,
+    dia TEXT NOT NULL,
+    avaliacao_id INTEGER NOT NULL,
+    curso_id INTEGER NOT NULL,
+    PRIMARY KEY (instituicao_id, categoria, term, dia, avaliacao_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS term_counts (
+    instituicao_id INTEGER NOT NULL,
+    categoria TEXT NOT NULL,
+    kind INTEGER NOT NULL,
+    dia TEXT NOT NULL,
+    curso_id INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    occurrences INTEGER NOT NULL,
+    comments INTEGER NOT NULL,
+    PRIMARY KEY (instituicao_id, categoria, kind, dia, curso_id, term)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS term_display (
+    term TEXT PRIMARY KEY,
+    display TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS checkpoints (
+    instituicao_id INTEGER PRIMARY KEY,
+    ultimo_id INTEGER NOT NULL
+);
+"""
+
+def _id(value):
+    return NULL_ID if value is None or pd.isna(value) else int(value)
+
+def _day(value):
+    return pd.Timestamp(value).date().isoformat() if value is not None and not pd.isna(value) else '0000-00-00'
+
+def _bigrams(terms):
+    return [f"{first} {second}" for first, second in zip(terms, terms[1:])]
+
+def _days(values):
+    # "AAAA-MM-DD" (UTC) de cada criado_em; datas ausentes ou inválidas viram '0000-00-00'.
+    dates = pd.to_datetime(pd.Series(values), utc=True, format='ISO8601', errors='coerce')
+    return dates.dt.strftime('%Y-%m-%d').fillna('0000-00-00').tolist()
+
+class _TextAnalyzer:
+    """Termos, contagens e sentimento de cada texto distinto, calculados uma vez por bloco."""
+
+    def __init__(self, matcher):
+        self.matcher = matcher
+        self.cache = {}
+        self.surfaces = set()
+        self.display = {}
+
+    def __call__(self, text):
+        cached = self.cache.get(text)
+        if cached is None:
+            terms = self.matcher.terms(text)
+            # Grafia em minúsculas (com acentos) de cada termo normalizado, para exibição.
+            for surface in set(TOKEN_PATTERN.findall(text.lower())) - self.surfaces:
+                self.surfaces.add(surface)
+                for key in self.matcher.terms(surface):
+                    self.display.setdefault(key, surface)
+            counted = ((TERM, Counter(terms)), (BIGRAM, Counter(_bigrams(terms))))
+            cached = self.cache[text] = (counted, self.matcher.sentiment(text))
+        return cached
+
+def diverse_selection(candidates, weights, k):
+    """Escolhe k candidatos (chave, termos, nível) cobrindo os termos de maior peso sem repeti-los.
+
+    O ganho de um candidato é a soma dos pesos dos seus termos, descontada pelos termos e níveis
+    (nota ou sentimento) já cobertos pelos escolhidos; empates ficam com o primeiro da lista.
+    """
+    remaining = list(candidates)
+    chosen, covered, levels = [], Counter(), Counter()
+    while remaining and len(chosen) < k:
+        gains = [
+            sum(weights.get(term, 0) * REPEAT_DISCOUNT ** covered[term] for term in terms) * LEVEL_DISCOUNT ** levels[level]
+            for _, terms, level in remaining
+        ]
+        key, terms, level = remaining.pop(max(range(len(gains)), key=gains.__getitem__))
+        chosen.append(key)
+        covered.update(terms)
+        levels[level] += 1
+    return chosen
+
+def select_comment_sample(comments, k, max_candidates=SAMPLE_CANDIDATES, seed=0):
+    """Amostra diversa de k comentários de uma lista (ex.: para o prompt do LLM), sem usar o índice.
+
+    Considera até max_candidates comentários distintos (amostrados com semente fixa), pondera cada
+    termo pelo número de comentários em que aparece e usa o sinal do sentimento como nível.
+    """
+    distinct = list(dict.fromkeys(comment for comment in comments if isinstance(comment, str) and comment.strip()))
+    if len(distinct) <= k:
+        return distinct
+    if len(distinct) > max_candidates:
+        distinct = random.Random(seed).sample(distinct, max_candidates)
+    matcher = get_matcher()
+    candidates = []
+    for comment in distinct:
+        sentiment = matcher.sentiment(comment)
+        candidates.append((comment, set(matcher.terms(comment)), (sentiment > 0) - (sentiment < 0)))
+    weights = Counter(term for _, terms, _ in candidates for term in terms)
+    return diverse_selection(candidates, weights, k)
+
+class CommentIndex:
+    def __init__(self, path=None):
+        self.path = path or os.getenv(COMMENT_INDEX_PATH_ENV) or DEFAULT_INDEX_PATH
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self._readers = threading.local()
+
+    def close(self):
+        self.connection.close()
+
+    def _reader(self):
+        # Conexão de leitura por thread: no modo WAL as consultas não esperam a gravação em
+        # andamento e não veem as suas linhas antes do commit. Em memória, só há uma conexão.
+        if self.path == ':memory:':
+            return self.connection
+        reader = getattr(self._readers, 'connection', None)
+        if reader is None:
+            reader = self._readers.connection = sqlite3.connect(self.path, check_same_thread=False)
+        return reader
+
+    # --- Atualização ---
+
+    def add_frame(self, df):
+        """Indexa os comentários das linhas de Avaliacoes (id, instituicao_id, curso_id, criado_em, nota_*, comentario_*).
+
+        Comentários de avaliações já indexadas são ignorados. Retorna o número de comentários novos.
+        """
+        if df is None or df.empty:
+            return 0
+        matcher = get_matcher()
+        categories = [column[len('comentario_'):] for column in df.columns if column.startswith('comentario_')]
+        with self.lock, self.connection:
+            existing = set(self.connection.execute(
+                "SELECT avaliacao_id, categoria FROM comments WHERE avaliacao_id BETWEEN ? AND ?", (int(df['id'].min()), int(df['id'].max()))
+            ).fetchall())
+
+            ids = df['id'].astype('int64').tolist()
+            institutions = [_id(value) for value in df['instituicao_id']] if 'instituicao_id' in df.columns else [NULL_ID] * len(df)
+            courses = [_id(value) for value in df['curso_id']] if 'curso_id' in df.columns else [NULL_ID] * len(df)
+            days = _days(df['criado_em']) if 'criado_em' in df.columns else ['0000-00-00'] * len(df)
+
+            analyze = _TextAnalyzer(matcher)
+            comment_rows, posting_rows, counts = [], [], {}
+            for category in categories:
+                texts = df[f'comentario_{category}'].tolist()
+                scores = df[f'nota_{category}'].to_numpy(dtype=np.float64, na_value=np.nan) if f'nota_{category}' in df.columns else np.full(len(df), np.nan)
+                for position, text in enumerate(texts):
+                    if not isinstance(text, str) or not text.strip() or (ids[position], category) in existing:
+                        continue
+                    evaluation_id, institution_id, course_id, day = ids[position], institutions[position], courses[position], days[position]
+                    counted, sentiment = analyze(text)
+                    score = scores[position]
+                    comment_rows.append((evaluation_id, category, institution_id, course_id, day,
+                                         None if np.isnan(score) else float(score), sentiment, text))
+                    for kind, values in counted:
+                        for term, occurrences in values.items():
+                            key = (institution_id, category, kind, day, course_id, term)
+                            total = counts.get(key)
+                            if total is None:
+                                counts[key] = [occurrences, 1]
+                            else:
+                                total[0] += occurrences
+                                total[1] += 1
+                    posting_rows.extend((institution_id, category, term, day, evaluation_id, course_id) for term in counted[0][1])
+
+            self.connection.executemany("INSERT OR IGNORE INTO comments VALUES (?, ?, ?, ?, ?, ?, ?, ?)", comment_rows)
+            self.connection.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?, ?, ?, ?, ?)", posting_rows)
+            self.connection.executemany(
+                "INSERT INTO term_counts VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT DO UPDATE SET "
+                "occurrences = occurrences + excluded.occurrences, comments = comments + excluded.comments",
+                [(*key, occurrences, comments) for key, (occurrences, comments) in counts.items()]
+            )
+            self.connection.executemany("INSERT OR IGNORE INTO term_display VALUES (?, ?)", analyze.display.items())
+        return len(comment_rows)
+
+    def checkpoint(self, institution_id=None):
+        row = self.connection.execute(
+            "SELECT ultimo_id FROM checkpoints WHERE instituicao_id = ?", (GLOBAL_CHECKPOINT if institution_id is None else institution_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def refresh(self, connection, institution_id=None):
+        """Indexa as avaliações do MySQL com id maior que o checkpoint. Retorna o número de linhas lidas.
+
+        Sem institution_id, o checkpoint é global e cobre todas as instituições.
+        """
+        last_id = self.checkpoint(institution_id)
+        query = "SELECT * FROM Avaliacoes WHERE id > %s"
+        params = [last_id]
+        if institution_id is not None:
+            query += " AND instituicao_id = %s"
+            params.append(institution_id)
+        query += " ORDER BY id"
+
+        cursor = connection.cursor()
+        cursor.execute(query, params)
+        total_rows = 0
+        while True:
+            rows = cursor.fetchmany(REFRESH_CHUNK_ROWS)
+            if not rows:
+                break
+            df = pd.DataFrame.from_records(rows, columns=cursor.column_names)
+            self.add_frame(df)
+            last_id = int(df['id'].max())
+            total_rows += len(df)
+        cursor.close()
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO checkpoints VALUES (?, ?) ON CONFLICT DO UPDATE SET ultimo_id = excluded.ultimo_id",
+                (GLOBAL_CHECKPOINT if institution_id is None else institution_id, last_id)
+            )
+        return total_rows
+
+    # --- Consultas ---
+
+    @staticmethod
+    def _scope(institution_id, category, course_id=None, start=None, end=None):
+        # Filtro comum às consultas; start/end são datas (ou datas e horas), comparadas pelo dia.
+        clauses, params = ["instituicao_id = ?", "categoria = ?"], [_id(institution_id), category]
+        if start:
+            clauses.append("dia >= ?")
+            params.append(_day(start))
+        if end:
+            clauses.append("dia <= ?")
+            params.append(_day(end))
+        if course_id is not None:
+            clauses.append("curso_id = ?")
+            params.append(_id(course_id))
+        return " AND ".join(clauses), params
+
+    def _top(self, kind, institution_id, category, n, course_id=None, start=None, end=None):
+        where, params = self._scope(institution_id, category, course_id, start, end)
+        rows = self._reader().execute(
+            f"SELECT term, SUM(comments) AS total, SUM(occurrences) FROM term_counts WHERE {where} AND kind = ? "
+            "GROUP BY term ORDER BY total DESC, term LIMIT ?", (*params, kind, n)
+        ).fetchall()
+        return [{"term": term, "comments": int(comments), "occurrences": int(occurrences)} for term, comments, occurrences in rows]
+
+    def _with_display(self, items):
+        terms = {part for item in items for part in item["term"].split()}
+        if not terms:
+            return items
+        display = dict(self._reader().execute(
+            f"SELECT term, display FROM term_display WHERE term IN ({', '.join('?' * len(terms))})", list(terms)
+        ).fetchall())
+        for item in items:
+            item["display"] = " ".join(display.get(part, part) for part in item["term"].split())
+        return items
+
+    def top_terms(self, institution_id, category, n=10, course_id=None, start=None, end=None):
+        """Termos mais frequentes (em número de comentários) de uma categoria no período."""
+        return self._with_display(self._top(TERM, institution_id, category, n, course_id, start, end))
+
+    def top_bigrams(self, institution_id, category, n=10, course_id=None, start=None, end=None):
+        return self._with_display(self._top(BIGRAM, institution_id, category, n, course_id, start, end))
+
+    def comment_count(self, institution_id, category, course_id=None, start=None, end=None):
+        where, params = self._scope(institution_id, category, course_id, start, end)
+        return self._reader().execute(f"SELECT COUNT(*) FROM comments WHERE {where}", params).fetchone()[0]
+
+    def representative_comments(self, institution_id, category, k=5, course_id=None, start=None, end=None, top_terms=None):
+        """Comentários que cobrem os termos principais do período, variando os termos e as notas."""
+        top_terms = top_terms if top_terms is not None else self._top(TERM, institution_id, category, REPRESENTATIVE_TERMS, course_id, start, end)
+        weights = {item["term"]: item["comments"] for item in top_terms}
+        if not weights:
+            return []
+        where, params = self._scope(institution_id, category, course_id, start, end)
+        terms_by_comment = {}
+        for term in weights:
+            for (evaluation_id,) in self._reader().execute(
+                f"SELECT avaliacao_id FROM postings WHERE {where} AND term = ? ORDER BY dia DESC LIMIT ?",
+                (*params, term, CANDIDATES_PER_TERM)
+            ):
+                terms_by_comment.setdefault(evaluation_id, set()).add(term)
+
+        rows = {}
+        ids = list(terms_by_comment)
+        for start_index in range(0, len(ids), 500):
+            chunk = ids[start_index:start_index + 500]
+            rows.update((row[0], row[1:]) for row in self._reader().execute(
+                f"SELECT avaliacao_id, texto, nota, sentimento FROM comments WHERE categoria = ? AND avaliacao_id IN ({', '.join('?' * len(chunk))})",
+                (category, *chunk)
+            ))
+        candidates = [
+            (evaluation_id, terms, rows[evaluation_id][1] if rows[evaluation_id][1] is not None else rows[evaluation_id][2])
+            for evaluation_id, terms in sorted(terms_by_comment.items()) if evaluation_id in rows
+        ]
+        return [rows[evaluation_id][0] for evaluation_id in diverse_selection(candidates, weights, k)]
+
+    def topics(self, institution_id, category, n=10, k=5, course_id=None, start=None, end=None):
+        """Termos, bigramas e comentários representativos de uma categoria no período."""
+        top = self._top(TERM, institution_id, category, max(n, REPRESENTATIVE_TERMS), course_id, start, end)
+        return {
+            "comments_total": self.comment_count(institution_id, category, course_id, start, end),
+            "terms": self._with_display(top[:n]),
+            "bigrams": self.top_bigrams(institution_id, category, n, course_id, start, end),
+            "representative_comments": self.representative_comments(institution_id, category, k, course_id, start, end, top[:REPRESENTATIVE_TERMS]),
+        }
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+def get_comment_index():
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = CommentIndex()
+        return _default_index
+
+# Uma única thread grava no índice (ver background_refresh.py).
+_refresher = BackgroundRefresher(
+    'comment-index', lambda connection, institution_id: get_comment_index().refresh(connection, institution_id), REFRESH_INTERVAL_ENV
+)
+
+def schedule_refresh(institution_id):
+    """Agenda a indexação das avaliações novas da instituição na thread de fundo.
+
+    Retorna False se já há uma atualização pendente ou se a última terminou há menos de
+    COMMENT_INDEX_REFRESH_SECONDS.
+    """
+    return _refresher.schedule(institution_id)
+
+def topics_for_period(institution_id, categories, course_id=None, start=None, end=None, n=10, k=5):
+    """Devolve {categoria: topics(...)} com o que já está indexado e agenda a atualização da instituição."""
+    index = get_comment_index()
+    schedule_refresh(institution_id)
+    return {category: index.topics(institution_id, category, n, k, course_id, start, end) for category in categories}
+
+def main():
+    parser = argparse.ArgumentParser(description="Atualiza ou consulta o índice de comentários das avaliações.")
+    parser.add_argument('--refresh', action='store_true', help="indexa as avaliações novas do MySQL")
+    parser.add_argument('--institution', type=int, default=None, help="ID da instituição (no --refresh, padrão: todas)")
+    parser.add_argument('--category', help="categoria consultada (ex.: didatica)")
+    parser.add_argument('--course', type=int, default=None)
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    index = CommentIndex()
+    if args.refresh:
+        from db_connection import get_connection
+        connection = get_connection()
+        try:
+            rows = index.refresh(connection, args.institution)
+        finally:
+            connection.close()
+        print(f"{rows} avaliações incorporadas ao índice de comentários.")
+    if args.category:
+        if args.institution is None:
+            parser.error("--category exige --institution")
+        result = index.topics(args.institution, args.category, args.top, 5, args.course, args.start, args.end)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+import os
+
+def get_connection():
+    """Abre uma conexão MySQL com as mesmas variáveis de ambiente usadas pelo backend (DB_HOST, DB_USER, ...)."""
+    import mysql.connector
+    return mysql.connector.connect(
+        host=os.getenv("DB_HOST"), user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"), database=os.getenv("DB_NAME")
+    )
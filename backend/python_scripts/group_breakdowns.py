@@ -0,0 +1,187 @@
+"""Recortes da análise por curso, instituição e/ou mês, calculados em uma passada sobre as linhas.
+
+Com options.group_by, run_analysis devolve "breakdowns": um recorte para cada item da lista, que é
+uma dimensão ("curso_id", "instituicao_id", "month") ou uma lista delas. Ex.: ["curso_id", "month"]
+gera um recorte por curso e outro por mês; [["curso_id", "month"]] gera um por curso e mês.
+
+Todos os recortes reutilizam a matriz de notas e a pontuação dos comentários já calculadas para a
+análise geral; cada um só soma esses valores por grupo com np.bincount. Os grupos saem ordenados
+do mais pesado (mais avaliações) para o mais leve, com "rank", e options.group_limit limita
+quantos são devolvidos em cada recorte.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+GROUP_DIMENSIONS = ("curso_id", "instituicao_id", "month")
+SCORE_LEVEL_COUNT = 5
+
+MONTH_PREFIX = r'\d{4}-\d{2}'
+
+def _format_months(dates):
+    # Formata só os meses distintos (strftime elemento a elemento é lento em colunas grandes).
+    months = (dates.dt.year * 100 + dates.dt.month).to_numpy(dtype=np.float64, na_value=np.nan)
+    codes, uniques = pd.factorize(months, use_na_sentinel=True)
+    labels = np.array([f"{int(value) // 100:04d}-{int(value) % 100:02d}" for value in uniques] + [None], dtype=object)
+    return labels[codes]
+
+def month_labels(values):
+    """Converte criado_em em "AAAA-MM"; datas inválidas viram None.
+
+    Textos ISO ("2026-03-01T10:00:00.000Z", "2026-03-01 10:00:00", como os enviados pelo backend)
+    usam o prefixo da data, sem conversão de fuso; os demais valores passam por pd.to_datetime.
+    """
+    values = pd.Series(values).reset_index(drop=True)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return pd.Series(_format_months(values), dtype=object)
+    # O cast para U7 trunca cada valor nos 7 primeiros caracteres; o formato é validado só nos
+    # prefixos distintos (poucos, um por mês), e não linha a linha.
+    codes, prefixes = pd.factorize(values.to_numpy(dtype=object).astype('U7'))
+    is_month = np.array([re.fullmatch(MONTH_PREFIX, prefix) is not None for prefix in prefixes], dtype=bool)
+    is_iso = is_month[codes]
+    labels = np.append(prefixes.astype(object), None)[np.where(is_iso, codes, len(prefixes))]
+    if not is_iso.all():
+        others = pd.to_datetime(values[~is_iso], errors='coerce', utc=True, format='mixed')
+        labels[~is_iso] = _format_months(others)
+    return pd.Series(labels, dtype=object)
+
+def dimension_values(df, dimension):
+    if dimension not in GROUP_DIMENSIONS:
+        raise ValueError(f"Dimensão de agrupamento inválida: {dimension}")
+    if dimension == "month":
+        if 'criado_em' not in df.columns:
+            raise ValueError("Agrupamento por mês exige a coluna criado_em")
+        return month_labels(df['criado_em'])
+    if dimension not in df.columns:
+        raise ValueError(f"Agrupamento por {dimension} exige a coluna {dimension}")
+    return df[dimension]
+
+def _plain(value):
+    if value is None or pd.isna(value):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+def group_codes(df, dimensions, factorized_cache=None):
+    """Retorna (código do grupo de cada linha, lista de chaves {dimensão: valor} por código).
+
+    Valores ausentes formam um grupo próprio, com None na chave. factorized_cache guarda a
+    fatoração de cada dimensão entre os recortes de uma mesma análise.
+    """
+    factorized_cache = {} if factorized_cache is None else factorized_cache
+    for dimension in dimensions:
+        if dimension not in factorized_cache:
+            factorized_cache[dimension] = pd.factorize(dimension_values(df, dimension), use_na_sentinel=False)
+    factorized = [factorized_cache[dimension] for dimension in dimensions]
+    combined = np.zeros(len(df), dtype=np.int64)
+    for codes, uniques in factorized:
+        combined = combined * len(uniques) + codes
+    codes, combined_uniques = pd.factorize(combined)
+
+    keys = []
+    for value in combined_uniques:
+        key = {}
+        for dimension, (_, uniques) in reversed(list(zip(dimensions, factorized))):
+            value, index = divmod(int(value), len(uniques))
+            key[dimension] = _plain(uniques[index])
+        keys.append({dimension: key[dimension] for dimension in dimensions})
+    return codes, keys
+
+class GroupSums:
+    """Somas por grupo de um recorte, preenchidas categoria a categoria por compute_breakdowns."""
+
+    def __init__(self, dimensions, codes, keys):
+        self.dimensions = dimensions
+        self.codes = codes
+        self.keys = keys
+        self.size = len(keys)
+        self.rows = np.bincount(codes, minlength=self.size)
+        self.categories = {}
+        self.media_final = None
+
+    def add(self, weights):
+        return np.bincount(self.codes, weights=weights, minlength=self.size)
+
+    def add_levels(self, levels):
+        # levels tem SCORE_LEVEL_COUNT para notas ausentes ou fora da faixa 1-5 (coluna descartada).
+        bins = self.codes * (SCORE_LEVEL_COUNT + 1) + levels
+        histograms = np.bincount(bins, minlength=self.size * (SCORE_LEVEL_COUNT + 1))
+        return histograms.reshape(self.size, SCORE_LEVEL_COUNT + 1)[:, :SCORE_LEVEL_COUNT]
+
+    def to_dict(self, limit=None):
+        # Do grupo mais pesado para o mais leve; empates pela ordem de aparição.
+        order = np.argsort(-self.rows, kind='stable')
+        selected = order if limit is None else order[:int(limit)]
+        overall_counts = sum(category["count"] for category in self.categories.values())
+        overall_sums = sum(category["sum"] for category in self.categories.values())
+
+        items = []
+        for rank, group in enumerate(selected, start=1):
+            item = {"key": self.keys[group], "rank": rank, "rows": int(self.rows[group])}
+            item["average_score"] = round(float(overall_sums[group] / overall_counts[group]), 2) if len(self.categories) and overall_counts[group] else None
+            if self.media_final is not None:
+                counts, sums = self.media_final
+                item["average_media_final"] = round(float(sums[group] / counts[group]), 2) if counts[group] else None
+            item["categories"] = {}
+            for key, category in self.categories.items():
+                count = category["count"][group]
+                if not count: continue
+                comments = category["comment_count"][group]
+                item["categories"][key] = {
+                    "average_score": round(float(category["sum"][group] / count), 2),
+                    "count": int(count),
+                    "score_distribution": {level + 1: int(value) for level, value in enumerate(category["histogram"][group]) if value},
+                    "sentiment_score": round(float(category["sentiment_sum"][group] / comments), 2) if comments else 0,
+                    "comments": int(comments),
+                }
+            items.append(item)
+        return {"group_by": list(self.dimensions), "groups_total": self.size, "groups": items}
+
+def normalize_group_by(group_by):
+    """Aceita "curso_id", ["curso_id", "month"] ou [["curso_id", "month"], "instituicao_id"]."""
+    if isinstance(group_by, str):
+        group_by = [group_by]
+    return [[item] if isinstance(item, str) else list(item) for item in group_by]
+
+def compute_breakdowns(df, group_by, keys, scores, comment_scores, limit=None):
+    """Calcula os recortes pedidos em group_by.
+
+    keys/scores vêm de build_score_matrix; comment_scores é {categoria: (código por linha, pontuação
+    de cada comentário distinto)}, como em comment_scores de analyze_evaluations.py. Os valores de
+    cada categoria são preparados uma vez e somados em todos os recortes com np.bincount.
+    """
+    if df is None or not group_by:
+        return []
+    factorized_cache = {}
+    breakdowns = []
+    for dimensions in normalize_group_by(group_by):
+        codes, group_keys = group_codes(df, dimensions, factorized_cache)
+        breakdowns.append(GroupSums(dimensions, codes, group_keys))
+
+    no_comments = (np.full(len(df), -1), np.zeros(0))
+    for index, key in enumerate(keys):
+        column = scores[:, index]
+        valid = ~np.isnan(column)
+        values = np.where(valid, column, 0)
+        in_range = valid & (column >= 1) & (column <= SCORE_LEVEL_COUNT)
+        levels = np.where(in_range, values - 1, SCORE_LEVEL_COUNT).astype(np.intp)
+        comment_codes, distinct_scores = comment_scores.get(key, no_comments)
+        has_comment = comment_codes >= 0
+        sentiments = np.where(has_comment, distinct_scores[np.maximum(comment_codes, 0)] if len(distinct_scores) else 0, 0)
+        for breakdown in breakdowns:
+            breakdown.categories[key] = {
+                "count": breakdown.add(valid),
+                "sum": breakdown.add(values),
+                "histogram": breakdown.add_levels(levels),
+                "comment_count": breakdown.add(has_comment),
+                "sentiment_sum": breakdown.add(sentiments),
+            }
+
+    if 'media_final' in df.columns:
+        media_final = df['media_final'].to_numpy(dtype=np.float64, na_value=np.nan)
+        has_media = ~np.isnan(media_final)
+        media_values = np.where(has_media, media_final, 0)
+        for breakdown in breakdowns:
+            breakdown.media_final = (breakdown.add(has_media), breakdown.add(media_values))
+
+    return [breakdown.to_dict(limit) for breakdown in breakdowns]
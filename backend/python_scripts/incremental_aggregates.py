@@ -0,0 +1,263 @@
+"""Agregados parciais por instituição/curso/dia guardados na tabela AnalyticsResults.
+
+Cada linha com tipo = 'daily_aggregate' guarda, em payload, um PeriodAggregate (contagem, soma,
+soma dos quadrados, histograma 1-5, sentimento e amostra de comentários por categoria) das
+avaliações de um dia, e em payload.ultimo_id o maior Avaliacoes.id já somado a ele. Uma linha
+tipo = 'aggregate_checkpoint' por instituição (instituicao_id NULL para as avaliações sem
+instituição) guarda o maior Avaliacoes.id já incorporado, então cada atualização lê apenas as
+avaliações novas; a atualização de todas as instituições avança o checkpoint de cada uma.
+
+A atualização de uma instituição roda sob um lock nomeado do MySQL (GET_LOCK), então duas
+atualizações simultâneas (o worker e a linha de comando) não leem o mesmo intervalo ao mesmo tempo,
+e cada parcial ignora as avaliações com id até o seu ultimo_id: incorporar de novo as mesmas
+linhas não altera as contagens. Parciais gravados antes do ultimo_id não têm essa proteção; se já
+foram somados em duplicidade (checkpoint global e por instituição), apague as linhas
+'daily_aggregate' e 'aggregate_checkpoint' e atualize de novo.
+
+Uma transação que demora a confirmar pode gravar uma avaliação com id menor que o de outras já
+incorporadas, e o checkpoint por id a pularia. Por isso cada atualização também refaz do zero os
+parciais dos dias cobertos pelos últimos AGGREGATES_LATE_WINDOW_SECONDS (padrão 900) segundos de
+criado_em: uma avaliação confirmada com atraso menor que essa janela entra na atualização seguinte.
+
+No worker, a análise com source = partials só lê os parciais; a atualização da instituição é
+agendada em segundo plano (background_refresh.py), no máximo uma vez a cada
+AGGREGATES_REFRESH_SECONDS (padrão 60). A carga inicial de uma instituição grande deve ser feita
+pela linha de comando (ou agendada, ex.: cron).
+
+Qualquer intervalo de datas é respondido combinando os parciais dos dias do intervalo. A
+granularidade é diária e, diferente da análise feita a partir das linhas, não há deduplicação
+da avaliação mais recente por usuário.
+
+Uso: python incremental_aggregates.py [--institution ID]   (atualiza os parciais)
+"""
+import argparse
+import json
+import os
+
+import pandas as pd
+
+from analyze_evaluations import CATEGORIES, aggregate_frame, create_dataframe
+from background_refresh import BackgroundRefresher
+from db_connection import get_connection
+from streaming_aggregates import PeriodAggregate
+
+TIPO_PARTIAL = 'daily_aggregate'
+TIPO_CHECKPOINT = 'aggregate_checkpoint'
+REFRESH_CHUNK_ROWS = 5000
+REFRESH_LOCK_TIMEOUT_SECONDS = 60
+LATE_WINDOW_ENV = "AGGREGATES_LATE_WINDOW_SECONDS"
+REFRESH_INTERVAL_ENV = "AGGREGATES_REFRESH_SECONDS"
+
+PARTIAL_COLUMNS = (
+    ['id', 'instituicao_id', 'curso_id', 'criado_em', 'media_final']
+    + [f'nota_{key}' for key in CATEGORIES.keys()]
+    + [f'comentario_{key}' for key in CATEGORIES.keys()]
+)
+
+def daily_groups(df):
+    """Agrupa as linhas por (instituicao_id, curso_id, dia) e devolve {chave: linhas do grupo}."""
+    if df is None or df.empty:
+        return {}
+    days = pd.to_datetime(df['criado_em']).dt.date
+    return {
+        (_nullable_int(institution_id), _nullable_int(course_id), day): group
+        for (institution_id, course_id, day), group in df.groupby([df['instituicao_id'], df['curso_id'], days], dropna=False)
+    }
+
+def build_daily_partials(df):
+    """Agrupa as linhas por (instituicao_id, curso_id, dia) e devolve {chave: PeriodAggregate}."""
+    return {key: build_partial(group) for key, group in daily_groups(df).items()}
+
+def build_partial(group):
+    return aggregate_frame(create_dataframe(group.to_dict(orient='records')), PeriodAggregate())
+
+def _nullable_int(value):
+    return None if pd.isna(value) else int(value)
+
+def _null_safe_equals(column):
+    # "<=>" compara NULL com NULL como igual no MySQL.
+    return f"{column} <=> %s"
+
+def read_checkpoint(cursor, institution_id):
+    cursor.execute(
+        f"SELECT id, payload FROM AnalyticsResults WHERE tipo = %s AND {_null_safe_equals('instituicao_id')} ORDER BY id DESC LIMIT 1",
+        (TIPO_CHECKPOINT, institution_id)
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None, 0
+    return row[0], json.loads(row[1]).get('ultimo_id', 0)
+
+def write_checkpoint(cursor, checkpoint_row_id, institution_id, last_id):
+    payload = json.dumps({'ultimo_id': last_id})
+    if checkpoint_row_id is None:
+        cursor.execute(
+            "INSERT INTO AnalyticsResults (instituicao_id, tipo, payload) VALUES (%s, %s, %s)",
+            (institution_id, TIPO_CHECKPOINT, payload)
+        )
+    else:
+        cursor.execute("UPDATE AnalyticsResults SET payload = %s WHERE id = %s", (payload, checkpoint_row_id))
+
+def upsert_partial(cursor, key, group, replace=False):
+    """Soma ao parcial da mesma instituição/curso/dia (ou a um novo) as linhas com id acima do seu ultimo_id.
+
+    Com replace=True, o parcial passa a conter só as linhas de group.
+    """
+    institution_id, course_id, day = key
+    cursor.execute(
+        f"SELECT id, payload FROM AnalyticsResults WHERE tipo = %s AND {_null_safe_equals('instituicao_id')} AND {_null_safe_equals('curso_id')} AND periodo_dia = %s LIMIT 1 FOR UPDATE",
+        (TIPO_PARTIAL, institution_id, course_id, day)
+    )
+    row = cursor.fetchone()
+    stored = json.loads(row[1]) if row and not replace else {}
+    group = group[group['id'] > stored.get('ultimo_id', 0)]
+    if group.empty:
+        return
+    partial = build_partial(group)
+    if stored:
+        partial = PeriodAggregate.from_dict(stored).merge(partial)
+    payload = json.dumps({**partial.to_dict(), 'ultimo_id': int(group['id'].max())}, ensure_ascii=False)
+    if row:
+        cursor.execute("UPDATE AnalyticsResults SET payload = %s WHERE id = %s", (payload, row[0]))
+    else:
+        cursor.execute(
+            "INSERT INTO AnalyticsResults (instituicao_id, curso_id, tipo, payload, periodo_dia) VALUES (%s, %s, %s, %s, %s)",
+            (institution_id, course_id, TIPO_PARTIAL, payload, day)
+        )
+
+def _refresh_lock_name(institution_id):
+    return f"{TIPO_PARTIAL}:{'null' if institution_id is None else institution_id}"
+
+def _read_pages(cursor, query, params, last_id):
+    # Páginas de até REFRESH_CHUNK_ROWS avaliações em ordem de id, a partir de last_id; cada página é
+    # lida por completo antes das gravações.
+    while True:
+        cursor.execute(query, (*params, last_id, REFRESH_CHUNK_ROWS))
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        df = pd.DataFrame.from_records(rows, columns=cursor.column_names)
+        last_id = int(df['id'].max())
+        yield df
+
+def refresh_institution(connection, institution_id):
+    """Incorpora aos parciais as avaliações da instituição com id maior que o checkpoint. Retorna o número de linhas lidas.
+
+    As avaliações são lidas em páginas de REFRESH_CHUNK_ROWS (WHERE id > último ORDER BY id LIMIT),
+    cada página confirmada junto com o checkpoint. Depois, os parciais dos dias da janela de
+    atraso (AGGREGATES_LATE_WINDOW_SECONDS) são refeitos a partir de todas as avaliações desses dias.
+    """
+    # Cursor com buffer: cada resultado é lido por inteiro, então as gravações na mesma conexão não
+    # encontram linhas pendentes de leitura.
+    cursor = connection.cursor(buffered=True)
+    lock_name = _refresh_lock_name(institution_id)
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (lock_name, REFRESH_LOCK_TIMEOUT_SECONDS))
+    if cursor.fetchone()[0] != 1:
+        raise TimeoutError(f"Outra atualização dos agregados da instituição {institution_id} não terminou em {REFRESH_LOCK_TIMEOUT_SECONDS}s")
+    try:
+        columns = ', '.join(PARTIAL_COLUMNS)
+        checkpoint_row_id, last_id = read_checkpoint(cursor, institution_id)
+        total_rows = 0
+        new_rows = (
+            f"SELECT {columns} FROM Avaliacoes "
+            f"WHERE {_null_safe_equals('instituicao_id')} AND id > %s ORDER BY id LIMIT %s"
+        )
+        for df in _read_pages(cursor, new_rows, (institution_id,), last_id):
+            for key, group in daily_groups(df).items():
+                upsert_partial(cursor, key, group)
+            last_id = int(df['id'].max())
+            total_rows += len(df)
+            write_checkpoint(cursor, checkpoint_row_id, institution_id, last_id)
+            if checkpoint_row_id is None:
+                checkpoint_row_id = cursor.lastrowid
+            connection.commit()
+
+        # Dias da janela de atraso, pela hora do banco (a mesma de criado_em): o primeiro parcial
+        # de cada dia encontrado substitui o gravado, e as páginas seguintes somam a ele.
+        cursor.execute("SELECT DATE(NOW() - INTERVAL %s SECOND)", (int(os.getenv(LATE_WINDOW_ENV, 900)),))
+        first_day = cursor.fetchone()[0]
+        recent_rows = (
+            f"SELECT {columns} FROM Avaliacoes "
+            f"WHERE {_null_safe_equals('instituicao_id')} AND criado_em >= %s AND id > %s ORDER BY id LIMIT %s"
+        )
+        rebuilt = set()
+        for df in _read_pages(cursor, recent_rows, (institution_id, first_day), 0):
+            for key, group in daily_groups(df).items():
+                upsert_partial(cursor, key, group, replace=key not in rebuilt)
+                rebuilt.add(key)
+            connection.commit()
+        return total_rows
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (lock_name,))
+        cursor.fetchall()
+        cursor.close()
+
+def refresh_partials(connection, institution_id=None):
+    """Incorpora aos parciais as avaliações novas. Retorna o número de linhas lidas.
+
+    Sem institution_id, atualiza cada instituição (e as avaliações sem instituição) com o seu
+    próprio checkpoint, o mesmo usado nas atualizações de uma só instituição.
+    """
+    if institution_id is not None:
+        return refresh_institution(connection, institution_id)
+    cursor = connection.cursor()
+    cursor.execute("SELECT DISTINCT instituicao_id FROM Avaliacoes")
+    institutions = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return sum(refresh_institution(connection, _nullable_int(institution)) for institution in institutions)
+
+def load_aggregate(connection, institution_id, course_id=None, start=None, end=None):
+    """Combina os parciais de uma instituição (e curso, opcional) entre as datas start e end (inclusive)."""
+    query = "SELECT payload FROM AnalyticsResults WHERE tipo = %s AND instituicao_id = %s"
+    params = [TIPO_PARTIAL, institution_id]
+    if course_id is not None:
+        query += " AND curso_id = %s"
+        params.append(course_id)
+    if start:
+        query += " AND periodo_dia >= DATE(%s)"
+        params.append(start)
+    if end:
+        query += " AND periodo_dia <= DATE(%s)"
+        params.append(end)
+
+    cursor = connection.cursor()
+    cursor.execute(query, params)
+    aggregate = PeriodAggregate()
+    for (payload,) in cursor.fetchall():
+        aggregate.merge(PeriodAggregate.from_dict(json.loads(payload)))
+    return aggregate
+
+def aggregates_for_periods(institution_id, course_id, periods, connection=None):
+    """Devolve {período: PeriodAggregate} para cada (início, fim) em periods, com os parciais já gravados."""
+    own_connection = connection is None
+    connection = connection or get_connection()
+    try:
+        return {name: load_aggregate(connection, institution_id, course_id, *bounds) for name, bounds in periods.items() if bounds}
+    finally:
+        if own_connection:
+            connection.close()
+
+# Uma única thread atualiza os parciais no worker (ver background_refresh.py).
+_refresher = BackgroundRefresher('aggregate-partials', refresh_partials, REFRESH_INTERVAL_ENV)
+
+def schedule_refresh(institution_id):
+    """Agenda a atualização dos parciais da instituição; retorna False se já há uma pendente ou recente."""
+    return _refresher.schedule(institution_id)
+
+def main():
+    parser = argparse.ArgumentParser(description="Atualiza os agregados parciais diários em AnalyticsResults.")
+    parser.add_argument('--institution', type=int, default=None, help="ID da instituição (padrão: todas)")
+    args = parser.parse_args()
+
+    connection = get_connection()
+    try:
+        rows = refresh_partials(connection, args.institution)
+    finally:
+        connection.close()
+    print(f"{rows} avaliações incorporadas aos agregados parciais.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Medição opcional, por etapa, do pipeline de analyze_evaluations.py.
+
+Cada execução (ou requisição do worker) usa um StageTimer que registra, para cada etapa, o tempo
+de parede, o tempo de CPU da thread, o RSS atual do processo antes e depois dela e o número de
+linhas. O pico de RSS (ru_maxrss) é o máximo desde o início do processo, e não de cada etapa: ele
+aparece uma vez só, como process_peak_rss_mb. No worker, onde as requisições rodam em paralelo, a
+diferença entre o RSS antes e depois de uma etapa inclui as alocações das outras. Registrar é
+barato; o resultado só é emitido quando pedido:
+
+    ANALYSIS_TIMINGS=result     bloco "timings" no JSON de saída (no worker, na resposta)
+    ANALYSIS_TIMINGS=stderr     uma linha JSON {"type": "timings", ...} no stderr
+    options.timings             o mesmo, por requisição ("result", "stderr" ou true = "result")
+    ANALYSIS_TRACEMALLOC=1      inclui o pico de alocações Python por etapa (tracemalloc; mais lento
+                                e aproximado no worker, onde as requisições rodam em paralelo)
+    ANALYSIS_PROFILE_DIR=<dir>  grava um arquivo .prof do cProfile por execução ou requisição (no
+                                worker, as requisições perfiladas rodam uma de cada vez)
+"""
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+TIMINGS_ENV = "ANALYSIS_TIMINGS"
+TRACEMALLOC_ENV = "ANALYSIS_TRACEMALLOC"
+PROFILE_DIR_ENV = "ANALYSIS_PROFILE_DIR"
+TIMINGS_MODES = ("result", "stderr")
+PAGE_SIZE = resource.getpagesize()
+
+def timings_mode(options=None):
+    mode = (options or {}).get("timings") or os.getenv(TIMINGS_ENV)
+    if mode is True:
+        return "result"
+    return mode if mode in TIMINGS_MODES else None
+
+def current_rss_mb():
+    # RSS atual, lido de /proc/self/statm (páginas residentes no 2º campo); None fora do Linux.
+    try:
+        with open('/proc/self/statm') as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(resident_pages * PAGE_SIZE / 2 ** 20, 1)
+
+def peak_rss_mb():
+    # ru_maxrss é em KB no Linux (e em bytes no macOS).
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+
+class StageTimer:
+    def __init__(self, record=True):
+        self.record = record
+        self.mode = timings_mode()
+        self.stages = []
+        self.trace_memory = record and os.getenv(TRACEMALLOC_ENV) == '1'
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._started = time.perf_counter()
+
+    def configure(self, options):
+        """Aplica options.timings, que tem precedência sobre ANALYSIS_TIMINGS."""
+        self.mode = timings_mode(options)
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Mede o bloco como uma etapa; o dict devolvido aceita "rows" definido dentro do bloco."""
+        entry = {"name": name, "rows": rows}
+        if not self.record:
+            yield entry
+            return
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        entry["rss_start_mb"] = current_rss_mb()
+        started_wall, started_cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield entry
+        finally:
+            entry["wall_ms"] = round((time.perf_counter() - started_wall) * 1000, 2)
+            entry["cpu_ms"] = round((time.thread_time() - started_cpu) * 1000, 2)
+            entry["rss_end_mb"] = current_rss_mb()
+            if self.trace_memory:
+                entry["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+            self.stages.append(entry)
+
+    def to_dict(self):
+        return {
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 2),
+            "process_peak_rss_mb": peak_rss_mb(),
+            "stages": self.stages,
+        }
+
+    def dumps(self, message):
+        """Serializa message medindo a etapa "serialize"; no modo "result", inclui o bloco "timings".
+
+        O bloco é anexado ao texto já serializado para que a própria serialização apareça nele.
+        """
+        with self.stage("serialize"):
+            text = json.dumps(message, ensure_ascii=False)
+        if self.mode != "result" or not text.endswith('}'):
+            return text
+        separator = ', ' if text != '{}' else ''
+        return f'{text[:-1]}{separator}"timings": {json.dumps(self.to_dict())}}}'
+
+    def log(self, **fields):
+        """No modo "stderr", escreve as medições como uma linha JSON."""
+        if self.mode == "stderr":
+            print(json.dumps({"type": "timings", **fields, **self.to_dict()}), file=sys.stderr, flush=True)
+
+def null_timer():
+    # Um timer novo a cada chamada: configure() altera o timer, então ele não pode ser compartilhado
+    # entre requisições.
+    return StageTimer(record=False)
+
+# Só um cProfile pode estar ativo por processo (a partir do Python 3.12, enable() falha se já houver
+# outro), então os blocos perfilados das requisições do worker rodam um de cada vez.
+_profile_lock = threading.Lock()
+
+@contextmanager
+def profiled(label):
+    """Com ANALYSIS_PROFILE_DIR, grava o cProfile do bloco em <dir>/analysis_<label>.prof."""
+    profile_dir = os.getenv(PROFILE_DIR_ENV)
+    if not profile_dir:
+        yield
+        return
+    with _profile_lock:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            os.makedirs(profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(profile_dir, f"analysis_{label}.prof"))
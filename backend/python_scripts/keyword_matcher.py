@@ -0,0 +1,182 @@
+import json
+import os
+import re
+import unicodedata
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+# Palavras-chave para análise de sentimento simples
+NEGATIVE_KEYWORDS = ['ruim', 'péssimo', 'lento', 'antigo', 'quebrado', 'difícil', 'desorganizado', 'insatisfeito', 'problema', 'falta', 'demora', 'ineficiente', 'inseguro', 'precisa melhorar']
+POSITIVE_KEYWORDS = ['bom', 'ótimo', 'excelente', 'rápido', 'novo', 'funciona', 'fácil', 'organizado', 'satisfeito', 'eficiente', 'seguro', 'acessível']
+STOPWORDS = set(['de', 'a', 'o', 'que', 'e', 'do', 'da', 'em', 'um', 'para', 'é', 'com', 'não', 'uma', 'os', 'no', 'se', 'na', 'por', 'mais', 'as', 'dos', 'como', 'mas', 'foi', 'ao', 'ele', 'ela', 'nós', 'isso', 'este', 'esta'])
+
+# Arquivo JSON opcional com as chaves "negative_keywords", "positive_keywords" e "stopwords"
+# (e "accent_insensitive"), que substituem as listas padrão acima.
+KEYWORDS_CONFIG_ENV = "SENTIMENT_KEYWORDS_FILE"
+
+TOKEN_PATTERN = re.compile(r"\w+")
+TEXT_SEPARATOR = "\x00"
+
+def _build_accent_table():
+    # Tabela de tradução que remove acentos dos caracteres latinos (á -> a, ç -> c, ...),
+    # usada com str.translate, que é bem mais rápido que normalizar cada texto com unicodedata.
+    # É uma lista indexada pelo código do caractere (cerca de 3x mais rápida que um dict no
+    # translate); caracteres além do fim da lista ficam como estão.
+    table = [chr(codepoint) for codepoint in range(0x250)]
+    for codepoint in range(0xC0, 0x250):
+        char = chr(codepoint)
+        base = ''.join(c for c in unicodedata.normalize('NFKD', char) if not unicodedata.combining(c))
+        if len(base) == 1 and base != char:
+            table[codepoint] = base
+    return table
+
+ACCENT_TABLE = _build_accent_table()
+# A mesma tabela para os bytes de um texto só com caracteres Latin-1 (até U+00FF), o caso comum em
+# português: bytes.translate consulta a tabela direto em C e é dezenas de vezes mais rápido que
+# str.translate, que sai do caminho rápido no primeiro caractere acentuado.
+LATIN1_ACCENT_TABLE = bytes(ord(ACCENT_TABLE[codepoint]) for codepoint in range(0x100))
+
+def _fold_latin1(text):
+    return text.encode('latin-1').translate(LATIN1_ACCENT_TABLE).decode('latin-1')
+
+def fold_accents(text):
+    try:
+        return _fold_latin1(text)
+    except UnicodeEncodeError:
+        return text.translate(ACCENT_TABLE)
+
+class KeywordMatcher:
+    """Casa palavras-chave de sentimento e conta termos usando uma única regex compilada.
+
+    O casamento respeita limites de palavra ("bom" não casa dentro de "bombeiro") e,
+    por padrão, ignora acentos ("pessimo" casa com "péssimo"). Como na contagem original, cada
+    palavra-chave conta uma vez por comentário ("ruim, muito ruim" vale -1).
+    """
+
+    def __init__(self, positive_keywords=POSITIVE_KEYWORDS, negative_keywords=NEGATIVE_KEYWORDS, stopwords=STOPWORDS, accent_insensitive=True, min_token_length=3):
+        self.accent_insensitive = accent_insensitive
+        self.min_token_length = min_token_length
+        self.stopwords = {self.normalize(word) for word in stopwords}
+
+        self.weights = {}
+        for word in positive_keywords:
+            self.weights[self._keyword(self.normalize(word))] = self.weights.get(self._keyword(self.normalize(word)), 0) + 1
+        for word in negative_keywords:
+            self.weights[self._keyword(self.normalize(word))] = self.weights.get(self._keyword(self.normalize(word)), 0) - 1
+
+        # Palavras mais longas primeiro, para que expressões ("precisa melhorar") tenham prioridade.
+        alternatives = [r'\s+'.join(re.escape(part) for part in keyword.split()) for keyword in sorted(self.weights, key=len, reverse=True) if keyword.strip()]
+        self.pattern = re.compile(r'(?<!\w)(?:' + '|'.join(alternatives) + r')(?!\w)') if alternatives else None
+
+    def normalize(self, text):
+        text = text.lower()
+        return fold_accents(text) if self.accent_insensitive else text
+
+    def _keyword(self, match):
+        return ' '.join(match.split())
+
+    def sentiment(self, comment):
+        if not isinstance(comment, str) or self.pattern is None: return 0
+        keywords = {self._keyword(match) for match in self.pattern.findall(self.normalize(comment))}
+        return sum(self.weights.get(keyword, 0) for keyword in keywords)
+
+    def _join_texts(self, comments):
+        # Junta os comentários em um único texto (separados por \x00, que não casa com \w nem \s)
+        # para que a regex percorra a coluna inteira de uma só vez. O texto junto é normalizado de uma
+        # vez; se as minúsculas mudarem o comprimento de algum comentário (ex.: "İ".lower() tem 2
+        # caracteres), os comprimentos, usados para achar o comentário de cada posição, saem dos
+        # textos já em minúsculas. A remoção de acentos não muda comprimentos.
+        comments = pd.Series(comments, dtype=object)
+        is_text = np.fromiter((type(value) is str for value in comments), dtype=bool, count=len(comments))
+        texts = comments.to_numpy()[is_text].tolist()
+        joined = TEXT_SEPARATOR.join(texts)
+        normalized = joined.lower()
+        if len(normalized) != len(joined):
+            texts = [text.lower() for text in texts]
+            normalized = TEXT_SEPARATOR.join(texts)
+        if self.accent_insensitive:
+            try:
+                normalized = _fold_latin1(normalized)
+            except UnicodeEncodeError:
+                # Algum comentário tem caracteres além do Latin-1 (aspas curvas, emoji...): só esses
+                # usam o str.translate.
+                normalized = TEXT_SEPARATOR.join(fold_accents(text) for text in normalized.split(TEXT_SEPARATOR))
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+        return comments.index, is_text, lengths, normalized
+
+    def sentiment_series(self, comments):
+        """Pontua uma coluna inteira de comentários; valores não textuais recebem 0."""
+        index, is_text, lengths, joined = self._join_texts(comments)
+        scores = np.zeros(len(index), dtype=np.int64)
+        if self.pattern is None or not len(lengths):
+            return pd.Series(scores, index=index)
+
+        matches = [(match.start(), match.group()) for match in self.pattern.finditer(joined)]
+        text_scores = np.zeros(len(lengths), dtype=np.int64)
+        if matches:
+            keyword_ids = {keyword: index for index, keyword in enumerate(self.weights)}
+            keyword_weights = np.array(list(self.weights.values()), dtype=np.int64)
+            # Cada grafia casada é convertida em palavra-chave uma vez só.
+            surfaces = {surface: keyword_ids[self._keyword(surface)] for surface in {surface for _, surface in matches}}
+            positions = np.fromiter((position for position, _ in matches), dtype=np.int64, count=len(matches))
+            keywords = np.fromiter((surfaces[surface] for _, surface in matches), dtype=np.int64, count=len(matches))
+            ends = np.cumsum(lengths + 1)
+            # Uma vez cada par (comentário, palavra-chave), mesmo que a palavra se repita no comentário.
+            pairs = np.unique(np.searchsorted(ends, positions, side='right') * len(keyword_ids) + keywords)
+            text_indices, keyword_indices = np.divmod(pairs, len(keyword_ids))
+            np.add.at(text_scores, text_indices, keyword_weights[keyword_indices])
+        scores[is_text] = text_scores
+        return pd.Series(scores, index=index)
+
+    def token_counts(self, comments):
+        """Conta os termos (sem stopwords) de uma coluna de comentários.
+
+        Retorna um Counter indexado pela forma normalizada do termo e um dicionário com a
+        grafia mais frequente de cada termo, usada na exibição.
+        """
+        comments = pd.Series(comments, dtype=object)
+        texts = [text.lower() for text in comments if isinstance(text, str)]
+        surface_counts = Counter(TOKEN_PATTERN.findall(TEXT_SEPARATOR.join(texts)))
+        counts = Counter()
+        display = {}
+        for surface, count in surface_counts.most_common():
+            if len(surface) < self.min_token_length: continue
+            key = fold_accents(surface) if self.accent_insensitive else surface
+            if key in self.stopwords: continue
+            counts[key] += count
+            display.setdefault(key, surface)
+        return counts, display
+
+    def terms(self, text):
+        """Termos de um texto, na ordem, na forma normalizada de token_counts (sem stopwords e palavras curtas)."""
+        if not isinstance(text, str): return []
+        tokens = (token for token in TOKEN_PATTERN.findall(text.lower()) if len(token) >= self.min_token_length)
+        keys = (fold_accents(token) if self.accent_insensitive else token for token in tokens)
+        return [key for key in keys if key not in self.stopwords]
+
+    def top_keywords(self, comments, n=3):
+        counts, display = self.token_counts(comments)
+        return [display[key] for key, _ in counts.most_common(n)]
+
+def load_matcher(config_path=None):
+    config_path = config_path or os.getenv(KEYWORDS_CONFIG_ENV)
+    if not config_path:
+        return KeywordMatcher()
+    with open(config_path, encoding='utf-8') as config_file:
+        config = json.load(config_file)
+    return KeywordMatcher(
+        positive_keywords=config.get('positive_keywords', POSITIVE_KEYWORDS),
+        negative_keywords=config.get('negative_keywords', NEGATIVE_KEYWORDS),
+        stopwords=config.get('stopwords', STOPWORDS),
+        accent_insensitive=config.get('accent_insensitive', True),
+    )
+
+_default_matcher = None
+
+def get_matcher():
+    global _default_matcher
+    if _default_matcher is None:
+        _default_matcher = load_matcher()
+    return _default_matcher
@@ -0,0 +1,243 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from summary_cache import get_summary_cache, fingerprint
+
+GEMINI_MODEL_NAME = 'gemini-pro-latest'
+
+# Com ANALYSIS_LLM=fake o Gemini é substituído por FakeModel (testes, benchmarks e desenvolvimento local).
+LLM_BACKEND_ENV = "ANALYSIS_LLM"
+
+# Comentários por categoria incluídos no prompt (escolhidos por comment_index.select_comment_sample).
+PROMPT_COMMENTS = 5
+
+MISSING_API_KEY_MESSAGE = "Chave da API do Gemini não configurada. Defina a variável de ambiente GEMINI_API_KEY."
+
+# Limites das chamadas ao LLM (via variáveis de ambiente):
+#   LLM_TIMEOUT_SECONDS: tempo máximo de cada tentativa, padrão 60;
+#   LLM_MAX_RETRIES: novas tentativas após falha ou timeout, padrão 2 (com backoff exponencial a partir de LLM_RETRY_BACKOFF_SECONDS);
+#   LLM_MAX_CONCURRENCY: chamadas simultâneas ao modelo, padrão 2.
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BACKOFF_SECONDS = float(os.getenv("LLM_RETRY_BACKOFF_SECONDS", "1"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
+
+# Com SUMMARY_JOBS_STORE=analytics_results os resumos gerados de forma assíncrona também são
+# gravados na tabela AnalyticsResults (tipo = 'detailed_analysis'), indexados pelo job_id.
+SUMMARY_JOBS_STORE_ENV = "SUMMARY_JOBS_STORE"
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeModel:
+    """Substituto local do GenerativeModel: devolve um texto fixo derivado do prompt, sem rede."""
+
+    model_name = 'fake'
+
+    def __init__(self, text=None):
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        if self.text is not None:
+            return FakeResponse(self.text)
+        return FakeResponse(f"### Análise Detalhada\n\nResumo gerado localmente (modelo falso) para o prompt {fingerprint(prompt)[:12]}.")
+
+_fake_model = None
+
+def get_model():
+    """Retorna o modelo configurado ou None se a chave do Gemini não estiver definida."""
+    global _fake_model
+    if os.getenv(LLM_BACKEND_ENV) == 'fake':
+        if _fake_model is None:
+            _fake_model = FakeModel()
+        return _fake_model
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        return None
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+def build_prompt(analysis_by_question, average_media_final, all_comments):
+    # Formatar os dados de entrada para o prompt
+    input_data_str = f"Média geral final: {average_media_final:.2f}\n\n"
+    input_data_str += "Médias por categoria:\n"
+    for key, item in analysis_by_question.items():
+        input_data_str += f"- {item['name']}: {item['average_score']['value']:.2f}\n"
+    
+    input_data_str += "\nComentários dos Alunos (amostra):\n"
+    for category, comments in all_comments.items():
+        if comments:
+            input_data_str += f"- {category}:\n"
+            for comment in comments[:PROMPT_COMMENTS]: # Limita os comentários por categoria para não exceder o limite do prompt
+                input_data_str += f"  - \"{comment}\"\n"
+
+    return f"""
+        Assuma a posição de um Analista de Dados Educacionais Sênior. Com base nos dados quantitativos (médias) e qualitativos (comentários) a seguir, sua tarefa é gerar um relatório de análise aprofundado e um plano de ação.
+
+        **Dados Brutos:**
+        {input_data_str}
+
+        **Sua resposta DEVE começar EXATAMENTE com a seguinte estrutura e seguir o formato definido:**
+
+        ### Análise Detalhada
+
+        **1. A Hipótese do "Platô de Desempenho":**
+        Analise se os dados sugerem que a instituição atingiu um "platô de bom desempenho", onde a maioria dos resultados são "bons", mas não "excelentes". Discuta as implicações positivas (processos maduros) e negativas (falta de inovação, estagnação).
+
+        **2. O Risco da Média Agregada:**
+        Discuta os diferentes cenários que podem levar à média de {average_media_final:.2f}. O cenário é de consistência mediana (maioria das notas em torno de 4.0) ou de polarização oculta (notas excelentes sendo anuladas por notas problemáticas)? Use os dados das categorias para suportar sua análise.
+
+        **3. Análise por Categoria (Integrando Comentários):**
+        Com base nas médias de cada categoria e nos comentários fornecidos, identifique os pontos fortes e os pontos de atenção. Use os comentários para dar cor e contexto aos números. Por exemplo, se a nota de 'Localização e Acesso' é baixa, os comentários podem explicar se o problema é transporte, segurança ou estacionamento. Responda às perguntas: Onde somos excelentes? Onde precisamos melhorar urgentemente?
+
+        ### Recomendações Estratégicas
+
+        Com base na sua análise, proponha um plano de ação concreto.
+
+        **Fase 1: Diagnóstico Aprofundado (Ações Imediatas)**
+        1.  **Segmentação dos Dados:** Recomende a desagregação da média geral por outros eixos (unidade acadêmica, curso, docente, etc.).
+        2.  **Análise da Distribuição de Frequência:** Recomende a construção de um histograma para visualizar a distribuição das notas e confirmar o cenário de consistência ou polarização.
+        3.  **Análise Qualitativa:** Enfatize a importância de continuar a análise de sentimentos e tópicos dos comentários para dar contexto aos números, como você acabou de fazer.
+
+        **Fase 2: Ações Táticas (Médio Prazo)**
+        4.  **Criar o Programa "Faróis de Excelência":** Sugira a criação de um programa para identificar e disseminar as boas práticas das áreas com melhor desempenho.
+        5.  **Plano de Desenvolvimento Focado:** Sugira um plano de ação individualizado para as áreas com pior desempenho, usando os insights dos comentários.
+        6.  **Revisão de Metas e KPIs:** Recomende a redefinição de metas de sucesso, usando métricas multidimensionais em vez de uma única média.
+
+        **Fase 3: Cultura de Dados (Longo Prazo)**
+        7.  **Implementação de Dashboards Interativos:** Sugira a substituição de relatórios estáticos por dashboards interativos.
+        8.  **Estabelecer Rituais de Análise de Dados:** Recomende a criação de um ciclo semestral de "Análise e Ação".
+
+        Conclua com um parágrafo final que reforce a importância de uma gestão proativa e orientada por dados.
+        """
+
+_llm_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix='llm')
+# Vagas de chamada ao modelo: cada tentativa pega uma antes de ser enviada ao executor e a devolve
+# quando a chamada termina, então nenhuma tentativa espera na fila do executor.
+_llm_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+def generate_with_retry(model, prompt, timeout=None, max_retries=None, backoff=None):
+    """Chama model.generate_content com timeout por tentativa e novas tentativas com backoff exponencial.
+
+    No máximo LLM_MAX_CONCURRENCY chamadas chegam ao modelo ao mesmo tempo. A espera por uma vaga
+    não conta no timeout, que mede só a chamada. Uma tentativa que estoura o timeout não pode ser
+    interrompida: continua ocupando sua vaga até terminar, e a nova tentativa espera outra vaga.
+    """
+    timeout = LLM_TIMEOUT_SECONDS if timeout is None else timeout
+    max_retries = LLM_MAX_RETRIES if max_retries is None else max_retries
+    backoff = LLM_RETRY_BACKOFF_SECONDS if backoff is None else backoff
+
+    for attempt in range(max_retries + 1):
+        try:
+            _llm_slots.acquire()
+            try:
+                future = _llm_executor.submit(model.generate_content, prompt)
+            except Exception:
+                _llm_slots.release()
+                raise
+            future.add_done_callback(lambda _: _llm_slots.release())
+            response = future.result(timeout=timeout)
+            return response.text.strip()
+        except FutureTimeoutError:
+            # Se a chamada ainda não começou, não chega a ser feita.
+            future.cancel()
+            error = TimeoutError(f"o modelo não respondeu em {timeout:g}s")
+        except Exception as e:
+            error = e
+        if attempt < max_retries:
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random() * 0.1))
+    raise error
+
+def lookup_cached_summary(prompt, model=None):
+    """Retorna o resumo em cache para o prompt, ou None (sem chamar o modelo)."""
+    model = model or get_model()
+    if model is None:
+        return MISSING_API_KEY_MESSAGE
+    return get_summary_cache().get(fingerprint(getattr(model, 'model_name', GEMINI_MODEL_NAME), prompt))
+
+def request_summary(prompt, force_regenerate=False, model=None):
+    """Como generate_summary, mas deixa subir a exceção quando a chamada ao modelo falha."""
+    model = model or get_model()
+    if model is None:
+        return MISSING_API_KEY_MESSAGE, False
+
+    model_name = getattr(model, 'model_name', GEMINI_MODEL_NAME)
+    cache = get_summary_cache()
+    key = fingerprint(model_name, prompt)
+    if not force_regenerate:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, True
+
+    text = generate_with_retry(model, prompt)
+    cache.set(key, text)
+    return text, False
+
+def generate_summary(prompt, force_regenerate=False, model=None):
+    """Gera o resumo executivo para o prompt, reaproveitando o cache quando a entrada não mudou.
+
+    Retorna uma tupla (texto, veio_do_cache). Se a API falhar, o texto é a mensagem de erro, que
+    não é guardada no cache.
+    """
+    try:
+        return request_summary(prompt, force_regenerate=force_regenerate, model=model)
+    except Exception as e:
+        return f"Erro ao contatar a API do Gemini: {e}", False
+
+# --- Geração assíncrona ---
+# submit_summary_job devolve um job_id imediatamente; quando o resumo fica pronto, on_done(job_id, texto)
+# é chamado a partir de uma thread do executor de jobs. Se a chamada ao modelo falhar, on_done recebe
+# texto None e a mensagem de erro em error; a falha não vai para o cache nem para AnalyticsResults.
+
+_jobs_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix='summary-job')
+
+def store_summary_result(job_id, text, metadata=None):
+    from db_connection import get_connection
+    metadata = metadata or {}
+    connection = get_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "INSERT INTO AnalyticsResults (instituicao_id, curso_id, tipo, payload) VALUES (%s, %s, %s, %s)",
+            (metadata.get("instituicao_id"), metadata.get("curso_id"), 'detailed_analysis',
+             json.dumps({"job_id": job_id, "detailed_analysis": text}, ensure_ascii=False))
+        )
+        connection.commit()
+    finally:
+        connection.close()
+
+def submit_summary_job(prompt, on_done, force_regenerate=False, metadata=None, cache_checked=False):
+    """Gera o resumo em segundo plano. Com cache_checked=True o chamador já consultou o cache
+    (lookup_cached_summary) sem achar o resumo, e o job não o consulta de novo."""
+    job_id = uuid.uuid4().hex
+
+    def run_job():
+        try:
+            text, _ = request_summary(prompt, force_regenerate=force_regenerate or cache_checked)
+        except Exception as e:
+            on_done(job_id, None, error=f"Erro ao contatar a API do Gemini: {e}")
+            return
+        if os.getenv(SUMMARY_JOBS_STORE_ENV) == 'analytics_results':
+            try:
+                store_summary_result(job_id, text, metadata)
+            except Exception as e:
+                print(f"[summary-job] falha ao gravar {job_id} em AnalyticsResults: {e}", file=sys.stderr)
+        on_done(job_id, text)
+
+    _jobs_executor.submit(run_job)
+    return job_id
+
+def wait_for_jobs():
+    """Aguarda a conclusão dos jobs pendentes (usado no modo de execução única antes de sair)."""
+    _jobs_executor.shutdown(wait=True)
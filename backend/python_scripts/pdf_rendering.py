@@ -0,0 +1,224 @@
+"""Rendering helpers for the analysis PDF, meant to be imported once and reused across documents.
+
+Styles are built on first use and shared by every document rendered in the same process, and the
+Gemini markdown is converted to flowables by a single-pass tokenizer (see tokenize_markdown).
+"""
+import re
+from itertools import chain
+from xml.sax.saxutils import escape
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib.enums import TA_CENTER
+
+# Number of flowables kept ahead of the one being laid out (enough for keepWithNext chains).
+STORY_LOOKAHEAD = 8
+# Rows per appendix table chunk; each chunk is a separate Table so no single table holds every row.
+APPENDIX_TABLE_ROWS = 40
+
+# Markdown subset produced by the LLM: headings (#, ##, ###), whole-line bold sub-titles (**...**),
+# bullets (* or -), numbered items (1.) and paragraphs; inline **bold** and *italic*.
+HEADING_PATTERN = re.compile(r'#{1,6}\s*(.*)')
+SUBHEADING_PATTERN = re.compile(r'\*\*((?:(?!\*\*).)+)\*\*:?')
+BULLET_PATTERN = re.compile(r'(?:[*\-]|\d+\.)\s+(.*)')
+INLINE_PATTERN = re.compile(r'\*\*(.+?)\*\*|(?<!\*)\*(?!\s)(.+?)(?<!\s)\*(?!\*)')
+
+_styles = None
+
+class LazyStory:
+    """List-like story that pulls flowables from a generator as the layout consumes them.
+
+    SimpleDocTemplate.build only touches the front of the story (reads, deletes and re-inserts
+    split parts), so keeping a small buffer is enough and drawn flowables can be garbage collected.
+    """
+
+    def __init__(self, flowables):
+        self._source = iter(flowables)
+        self._buffer = []
+
+    def _fill(self, size):
+        while len(self._buffer) < size:
+            try:
+                self._buffer.append(next(self._source))
+            except StopIteration:
+                break
+
+    def __len__(self):
+        self._fill(STORY_LOOKAHEAD)
+        return len(self._buffer)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            self._fill(index.stop if index.stop is not None else STORY_LOOKAHEAD)
+        else:
+            self._fill(index + 1)
+        return self._buffer[index]
+
+    def __setitem__(self, index, value):
+        self._buffer[index] = value
+
+    def __delitem__(self, index):
+        del self._buffer[index]
+
+    def insert(self, index, value):
+        self._buffer.insert(index, value)
+
+def get_styles():
+    """Returns the shared stylesheet, building it on first use."""
+    global _styles
+    if _styles is not None:
+        return _styles
+
+    styles = getSampleStyleSheet()
+
+    # Custom styles
+    styles.add(ParagraphStyle(name='ReportTitle', fontSize=24, leading=28, alignment=TA_CENTER, spaceAfter=20))
+    styles.add(ParagraphStyle(name='SectionTitle', fontSize=18, leading=22, spaceAfter=12, textColor='#2c3e50'))
+    styles.add(ParagraphStyle(name='SubSectionTitle', fontSize=14, leading=16, spaceAfter=8, textColor='#34495e'))
+
+    styles['BodyText'].fontSize = 10
+    styles['BodyText'].leading = 14
+    styles['BodyText'].spaceAfter = 10
+    _styles = styles
+    return styles
+
+def parse_and_style_text(text):
+    """Escapes text for ReportLab markup and converts inline **bold** and *italic* to <b>/<i> tags."""
+    def replace(match):
+        bold, italic = match.groups()
+        return f"<b>{bold}</b>" if bold is not None else f"<i>{italic}</i>"
+    return INLINE_PATTERN.sub(replace, escape(text))
+
+def tokenize_markdown(text):
+    """Yields (kind, text) for each non-empty line: kind is heading, subheading, bullet or paragraph."""
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        match = HEADING_PATTERN.fullmatch(line)
+        if match:
+            yield 'heading', match.group(1).strip()
+            continue
+        match = SUBHEADING_PATTERN.fullmatch(line)
+        if match:
+            yield 'subheading', match.group(1).strip()
+            continue
+        match = BULLET_PATTERN.fullmatch(line)
+        if match:
+            yield 'bullet', match.group(1)
+            continue
+        yield 'paragraph', line
+
+def markdown_flowables(text, styles=None):
+    styles = styles or get_styles()
+    for kind, content in tokenize_markdown(text):
+        if kind == 'heading':
+            yield Paragraph(parse_and_style_text(content), styles['SectionTitle'])
+            yield Spacer(1, 0.1 * inch)
+        elif kind == 'subheading':
+            yield Paragraph(f"<b>{parse_and_style_text(content)}</b>", styles['SubSectionTitle'])
+        elif kind == 'bullet':
+            yield Paragraph(f"• {parse_and_style_text(content)}", styles['BodyText'], bulletText='•')
+        else:
+            yield Paragraph(parse_and_style_text(content), styles['BodyText'])
+
+def summary_flowables(report_data, styles):
+    # Title
+    yield Paragraph("Relatório de Análise de Avaliações", styles['ReportTitle'])
+    yield Spacer(1, 0.2 * inch)
+
+    # General Summary (Still useful to have)
+    yield Paragraph("Resumo Geral dos Dados", styles['SectionTitle'])
+    total_evaluations = report_data.get("total_evaluations", {"value": 0, "delta": None})
+    average_media_final = report_data.get("average_media_final", {"value": 0, "delta": None})
+
+    yield Paragraph(f"Total de Avaliações: <b>{total_evaluations['value']}</b>", styles['BodyText'])
+    if total_evaluations['delta'] is not None:
+        delta_text = f" ({'+' if total_evaluations['delta'] > 0 else ''}{total_evaluations['delta']:.2f} vs. período anterior)"
+        yield Paragraph(f"<font color='#555'>{delta_text}</font>", styles['BodyText'])
+
+    yield Paragraph(f"Média Final Geral: <b>{average_media_final['value']:.2f}</b>", styles['BodyText'])
+    if average_media_final['delta'] is not None:
+        delta_text = f" ({'+' if average_media_final['delta'] > 0 else ''}{average_media_final['delta']:.2f} vs. período anterior)"
+        yield Paragraph(f"<font color='#555'>{delta_text}</font>", styles['BodyText'])
+    yield Spacer(1, 0.3 * inch)
+
+def detailed_analysis_flowables(report_data, styles):
+    # Detailed AI Analysis
+    detailed_analysis = report_data.get("detailed_analysis")
+    if not detailed_analysis:
+        yield Paragraph("Nenhuma análise detalhada disponível.", styles['BodyText'])
+        return
+    yield from markdown_flowables(detailed_analysis, styles)
+
+def format_delta(metric):
+    delta = (metric or {}).get('delta')
+    return '-' if delta is None else f"{'+' if delta > 0 else ''}{delta:.2f}"
+
+SCORE_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+    ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+])
+SCORE_TABLE_HEADER = ['Categoria', 'Média', 'Delta', '1', '2', '3', '4', '5', 'Sentimento']
+SCORE_TABLE_WIDTHS = [2.2 * inch] + [0.55 * inch] * 8
+
+def score_table_flowables(analysis_by_question, styles):
+    rows = []
+    for analysis in analysis_by_question.values():
+        distribution = {str(level): count for level, count in (analysis.get('score_distribution') or {}).items()}
+        rows.append([
+            Paragraph(escape(analysis.get('name', '')), styles['BodyText']),
+            f"{analysis['average_score']['value']:.2f}",
+            format_delta(analysis.get('average_score')),
+            *[str(distribution.get(str(level), 0)) for level in range(1, 6)],
+            f"{analysis['sentiment_score']['value']:.2f}",
+        ])
+        if len(rows) == APPENDIX_TABLE_ROWS:
+            yield Table([SCORE_TABLE_HEADER] + rows, colWidths=SCORE_TABLE_WIDTHS, style=SCORE_TABLE_STYLE)
+            rows = []
+    if rows:
+        yield Table([SCORE_TABLE_HEADER] + rows, colWidths=SCORE_TABLE_WIDTHS, style=SCORE_TABLE_STYLE)
+
+def comment_flowables(analysis_by_question, styles):
+    for analysis in analysis_by_question.values():
+        comments = analysis.get('comments') or []
+        if not comments:
+            continue
+        total = analysis.get('comments_total', len(comments))
+        yield Paragraph(f"{escape(analysis.get('name', ''))} ({total} comentários)", styles['SubSectionTitle'])
+        if total > len(comments):
+            yield Paragraph(f"<font color='#555'>Exibindo {len(comments)} de {total} comentários.</font>", styles['BodyText'])
+        for comment in comments:
+            yield Paragraph(f"• {escape(str(comment))}", styles['BodyText'])
+
+def appendix_flowables(report_data, styles):
+    analysis_by_question = report_data.get("analysis_by_question") or {}
+    if not analysis_by_question:
+        return
+    yield PageBreak()
+    yield Paragraph("Apêndice A - Notas por Categoria", styles['SectionTitle'])
+    yield from score_table_flowables(analysis_by_question, styles)
+    yield PageBreak()
+    yield Paragraph("Apêndice B - Comentários por Categoria", styles['SectionTitle'])
+    yield from comment_flowables(analysis_by_question, styles)
+
+def build_story(report_data, styles=None):
+    """Yields the report flowables in order; appendices only with pdf_options.include_appendices."""
+    styles = styles or get_styles()
+    pdf_options = report_data.get("pdf_options") or {}
+    parts = [summary_flowables(report_data, styles), detailed_analysis_flowables(report_data, styles)]
+    if pdf_options.get("include_appendices"):
+        parts.append(appendix_flowables(report_data, styles))
+    return chain.from_iterable(parts)
+
+def render_report(report_data, output):
+    """Renders one report to output (a path or a binary file object)."""
+    # Page streams are compressed as each page is finished, so the document kept by the canvas
+    # until the final write is much smaller than the flowables that produced it.
+    doc = SimpleDocTemplate(output, pagesize=letter, pageCompression=1)
+    doc.build(LazyStory(build_story(report_data)))
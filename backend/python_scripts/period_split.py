@@ -0,0 +1,78 @@
+"""Separação dos períodos e filtro da avaliação mais recente de cada aluno.
+
+O backend busca as avaliações dos dois períodos em uma única consulta, ordenada por criado_em, e
+envia as linhas em "rows" junto com os limites de cada período:
+
+    {"rows": [...], "periods": {"current": ["2026-01-01", "2026-06-30"], "previous": [...]}, "options": {...}}
+
+Cada período recebe as linhas com criado_em entre o início e o fim (inclusive, como o BETWEEN do
+MySQL); um período sem início ou sem fim recebe todas as linhas. Em cada período fica só a
+avaliação mais recente de cada usuario_id; em empates no criado_em fica a que veio primeiro (na
+consulta do backend, a de menor id), como no filtro que o backend fazia antes. Linhas sem
+usuario_id não são filtradas.
+"""
+import numpy as np
+import pandas as pd
+
+PERIOD_NAMES = ("current", "previous")
+
+def parse_bound(value):
+    """Converte um limite ("2026-01-01", "2026-01-01T03:00:00.000Z") em Timestamp UTC; sem fuso, vale UTC."""
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize('UTC') if timestamp.tzinfo is None else timestamp.tz_convert('UTC')
+
+def created_at(df):
+    # int64 em ns desde a época; datas ausentes ou inválidas viram o menor valor (NaT), como a mais antiga.
+    if 'criado_em' not in df.columns:
+        raise ValueError("A separação por período exige a coluna criado_em")
+    dates = pd.to_datetime(df['criado_em'], utc=True, format='ISO8601', errors='coerce')
+    return dates.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+def period_mask(created, bounds):
+    """Máscara das linhas dentro de (início, fim), ou None se o período não tem os dois limites."""
+    start, end = (list(bounds or []) + [None, None])[:2]
+    if not start or not end:
+        return None
+    start, end = parse_bound(start).as_unit('ns').value, parse_bound(end).as_unit('ns').value
+    return (created >= start) & (created <= end)
+
+def latest_per_user(df, created):
+    """Mantém a avaliação mais recente de cada usuario_id, na ordem de criado_em (empates: a primeira)."""
+    if not np.all(created[1:] >= created[:-1]):
+        order = np.argsort(created, kind='stable')
+        df, created = df.iloc[order], created[order]
+    if 'usuario_id' not in df.columns:
+        return df
+    users = df['usuario_id'].to_numpy()
+    present = pd.notna(users)
+    # Com a ordenação estável, as linhas de um usuário com o mesmo criado_em ficam na ordem de
+    # chegada: descarta as que empatam com uma anterior e, das restantes, fica a última.
+    tied = pd.DataFrame({'usuario_id': users, 'criado_em': created}).duplicated(keep='first').to_numpy()
+    later = np.zeros(len(users), dtype=bool)
+    later[~tied] = pd.Series(users[~tied]).duplicated(keep='last').to_numpy()
+    duplicated = (tied | later) & present
+    return df[~duplicated] if duplicated.any() else df
+
+def split_periods(df, periods, names=PERIOD_NAMES):
+    """Retorna {período: DataFrame das linhas do período, já sem avaliações repetidas (ou None se vazio)}.
+
+    names limita os períodos separados (ex.: só "current" para as páginas de comentários). Um período
+    ausente em periods fica None, como quando o payload não traz a lista "previous".
+    """
+    periods = periods or {}
+    frames = {name: None for name in names}
+    if df is None or df.empty:
+        return frames
+    created = created_at(df)
+    for name in names:
+        if name not in periods:
+            continue
+        mask = period_mask(created, periods[name])
+        if mask is None:
+            frame, frame_created = df, created
+        elif mask.any():
+            frame, frame_created = df[mask], created[mask]
+        else:
+            continue
+        frames[name] = latest_per_user(frame, frame_created).reset_index(drop=True)
+    return frames
@@ -0,0 +1,173 @@
+"""Estatísticas das notas além da média, a partir de estimadores combináveis.
+
+Cada categoria (nota_*) e a media_final são resumidas por:
+
+    Moments      contagem, média e M2 (soma dos quadrados dos desvios). Cada bloco de linhas é
+                 resumido de forma vetorizada e os blocos (ou agregados parciais) são combinados
+                 pela fórmula de Chan, a versão em paralelo do algoritmo de Welford; a variância
+                 não sofre o cancelamento de sum(x²) - sum(x)²/n.
+    histograma   as contagens das notas 1 a 5 (ou da media_final, DECIMAL(3,2), em faixas de 0,01
+                 entre 1 e 5, uma por valor possível), somadas entre blocos; dão a mediana e os
+                 quartis (exatos, por posto), o índice de polarização e o coeficiente de
+                 bimodalidade.
+
+Assim as mesmas estatísticas saem de um DataFrame (run_analysis) e dos agregados em streaming ou
+parciais (streaming_aggregates.py), sem novas passadas sobre as linhas.
+
+polarization é 1 menos o consenso de Tastle e Wierman para escalas ordinais: 0 quando todas as
+notas são iguais e 1 quando metade é 1 e metade é 5. bimodality_coefficient é o coeficiente de
+Sarle; acima de 5/9 (~0,555) a distribuição sugere dois picos.
+"""
+import numpy as np
+
+SCORE_POINTS = np.arange(1, 6, dtype=np.float64)
+SCORE_EDGES = np.arange(0.5, 6.0, 1.0)
+SCALE_WIDTH = 4.0
+
+# Uma faixa por valor de DECIMAL(3,2) entre 1 e 5, centrada nele.
+MEDIA_FINAL_BIN_WIDTH = 0.01
+MEDIA_FINAL_POINTS = np.round(np.linspace(1.0, 5.0, 401), 2)
+MEDIA_FINAL_EDGES = np.append(MEDIA_FINAL_POINTS - MEDIA_FINAL_BIN_WIDTH / 2, MEDIA_FINAL_POINTS[-1] + MEDIA_FINAL_BIN_WIDTH / 2)
+
+Z_95 = 1.959963984540054
+# Valor crítico bicaudal de 95% da t de Student por graus de liberdade; entre as entradas vale a
+# menor chave (valor mais conservador) e acima de 120, a normal.
+T_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228,
+    11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093, 20: 2.086,
+    21: 2.080, 22: 2.074, 23: 2.069, 24: 2.064, 25: 2.060, 26: 2.056, 27: 2.052, 28: 2.048, 29: 2.045, 30: 2.042,
+    40: 2.021, 60: 2.000, 120: 1.980,
+}
+T_95_KEYS = np.array(sorted(T_95))
+
+class Moments:
+    """Contagem, média e M2 de um conjunto de valores; combina-se com outro sem rever os valores."""
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = int(count)
+        self.mean = float(mean) if count else 0.0
+        self.m2 = float(m2) if count else 0.0
+
+    @classmethod
+    def from_totals(cls, count, total, m2):
+        return cls(count, total / count if count else 0.0, m2)
+
+    @classmethod
+    def from_values(cls, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return cls()
+        mean = values.mean()
+        return cls(len(values), mean, np.square(values - mean).sum())
+
+    def merge(self, other):
+        count = self.count + other.count
+        if not other.count or not self.count:
+            return Moments(count, self.mean if self.count else other.mean, self.m2 + other.m2)
+        delta = other.mean - self.mean
+        mean = self.mean + delta * other.count / count
+        return Moments(count, mean, self.m2 + other.m2 + delta * delta * self.count * other.count / count)
+
+    @property
+    def variance(self):
+        # Variância amostral (n - 1).
+        return self.m2 / (self.count - 1) if self.count > 1 else None
+
+    @property
+    def std(self):
+        variance = self.variance
+        return float(np.sqrt(variance)) if variance is not None else None
+
+def column_moments(scores, counts, sums):
+    """M2 de cada coluna de uma matriz com NaN, dadas as contagens e somas já calculadas (uma passada)."""
+    means = np.divide(sums, counts, out=np.zeros(len(counts)), where=counts > 0)
+    centered = scores - means.astype(scores.dtype)
+    return np.nansum(np.square(centered, dtype=np.float64), axis=0)
+
+def media_final_histogram(values):
+    """Contagens da media_final em faixas de 0,01 entre 1 e 5 (valores fora da faixa vão para as pontas)."""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    # Arredonda para o centésimo mais próximo: truncar (v - 1) / 0,01 poria valores como 4,1
+    # (4,1 - 1 = 3,0999...) na faixa de baixo.
+    bins = np.clip(np.round((values - MEDIA_FINAL_POINTS[0]) / MEDIA_FINAL_BIN_WIDTH), 0, len(MEDIA_FINAL_POINTS) - 1).astype(np.int64)
+    return np.bincount(bins, minlength=len(MEDIA_FINAL_POINTS))
+
+def t_critical(degrees_of_freedom):
+    if degrees_of_freedom > T_95_KEYS[-1]:
+        return Z_95
+    return T_95[int(T_95_KEYS[np.searchsorted(T_95_KEYS, degrees_of_freedom, side='right') - 1])]
+
+def histogram_quantiles(histogram, edges, probabilities, discrete=False):
+    """Quantis a partir da faixa em que a contagem acumulada atinge cada proporção.
+
+    Com discrete=True (notas inteiras), o quantil é o ponto central da faixa; senão, é interpolado
+    linearmente dentro dela (como na mediana de dados agrupados).
+    """
+    counts = np.asarray(histogram, dtype=np.float64)
+    total = counts.sum()
+    if not total:
+        return [None] * len(probabilities)
+    cumulative = np.cumsum(counts)
+    quantiles = []
+    for probability in probabilities:
+        target = probability * total
+        index = min(int(np.searchsorted(cumulative, target, side='left')), len(counts) - 1)
+        if discrete:
+            quantiles.append(float((edges[index] + edges[index + 1]) / 2))
+            continue
+        before = cumulative[index] - counts[index]
+        fraction = (target - before) / counts[index] if counts[index] else 0.0
+        quantiles.append(float(edges[index] + fraction * (edges[index + 1] - edges[index])))
+    return quantiles
+
+def polarization_index(histograms, points=SCORE_POINTS, width=SCALE_WIDTH):
+    """1 - consenso de Tastle e Wierman de cada linha de histogramas (NaN para histogramas vazios)."""
+    counts = np.atleast_2d(np.asarray(histograms, dtype=np.float64))
+    totals = counts.sum(axis=1, keepdims=True)
+    shares = np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
+    means = (shares * points).sum(axis=1, keepdims=True)
+    distance = np.minimum(np.abs(points - means) / width, 1.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(shares > 0, shares * np.log2(1 - distance), 0.0)
+    return np.where(totals[:, 0] > 0, np.maximum(-terms.sum(axis=1), 0.0), np.nan)
+
+def bimodality_coefficient(histograms, points=SCORE_POINTS):
+    """Coeficiente de bimodalidade de Sarle de cada linha (NaN com menos de 4 notas ou sem variação)."""
+    counts = np.atleast_2d(np.asarray(histograms, dtype=np.float64))
+    n = counts.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = (counts * points).sum(axis=1) / n
+        deviations = points - means[:, None]
+        m2, m3, m4 = ((counts * deviations ** power).sum(axis=1) / n for power in (2, 3, 4))
+        skewness = m3 / m2 ** 1.5 * np.sqrt(n * (n - 1)) / (n - 2)
+        kurtosis = ((n + 1) * (m4 / m2 ** 2 - 3) + 6) * (n - 1) / ((n - 2) * (n - 3))
+        coefficient = (skewness ** 2 + 1) / (kurtosis + 3 * (n - 1) ** 2 / ((n - 2) * (n - 3)))
+    return np.where((n > 3) & (m2 > 0), coefficient, np.nan)
+
+def _rounded(value, digits=3):
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+def describe(moments, histogram=None, edges=SCORE_EDGES, points=SCORE_POINTS, discrete=True):
+    """Resumo de uma categoria (ou da media_final, com edges/points de MEDIA_FINAL_*)."""
+    std = moments.std
+    statistics = {
+        "count": moments.count,
+        "mean": _rounded(moments.mean) if moments.count else None,
+        "variance": _rounded(moments.variance),
+        "std": _rounded(std),
+        "ci95": None,
+    }
+    if std is not None:
+        margin = t_critical(moments.count - 1) * std / np.sqrt(moments.count)
+        statistics["ci95"] = {"low": _rounded(moments.mean - margin), "high": _rounded(moments.mean + margin)}
+    if histogram is not None:
+        p25, median, p75 = histogram_quantiles(histogram, edges, (0.25, 0.5, 0.75), discrete)
+        statistics["median"] = _rounded(median)
+        statistics["quantiles"] = {"p25": _rounded(p25), "p75": _rounded(p75)}
+        statistics["polarization"] = _rounded(polarization_index(histogram, points)[0])
+        statistics["bimodality_coefficient"] = _rounded(bimodality_coefficient(histogram, points)[0])
+    return statistics
@@ -0,0 +1,185 @@
+import random
+
+from score_statistics import MEDIA_FINAL_POINTS, Moments
+
+# Quantidade máxima de comentários guardados por categoria. Os demais entram apenas nos
+# contadores (quantidade e sentimento), mantendo a memória limitada.
+DEFAULT_MAX_COMMENTS = 200
+
+def _m2_from_total_sq(count, total, total_sq):
+    # Para agregados gravados antes do campo m2: M2 = soma dos quadrados - soma² / n.
+    return max(float(total_sq) - float(total) ** 2 / count, 0.0) if count else 0.0
+
+def merge_samples(rng, first, first_total, second, second_total, size):
+    """Combina duas amostras uniformes (de first_total e second_total comentários) em uma de até size.
+
+    Cada vaga sai do lado A com probabilidade proporcional aos comentários de A ainda não sorteados,
+    como em uma amostra sem reposição da união; assim um parcial com 10 comentários não pesa o
+    mesmo que um com 100 mil.
+    """
+    if len(first) + len(second) <= size:
+        return first + second
+    first, second = rng.sample(first, len(first)), rng.sample(second, len(second))
+    remaining_first, remaining_second = max(first_total, len(first)), max(second_total, len(second))
+    merged, i, j = [], 0, 0
+    while len(merged) < size:
+        if j >= len(second) or (i < len(first) and rng.random() * (remaining_first + remaining_second) < remaining_first):
+            merged.append(first[i])
+            i += 1
+            remaining_first -= 1
+        else:
+            merged.append(second[j])
+            j += 1
+            remaining_second -= 1
+    return merged
+
+class CategoryAggregate:
+    """Agregado parcial e combinável das notas e comentários de uma categoria."""
+
+    def __init__(self, max_comments=DEFAULT_MAX_COMMENTS):
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        # Soma dos quadrados dos desvios em relação à média (ver score_statistics.Moments).
+        self.m2 = 0.0
+        self.histogram = [0, 0, 0, 0, 0]
+        self.sentiment_total = 0.0
+        self.comment_count = 0
+        self.comments = []
+        self.max_comments = max_comments
+        self._random = random.Random(0)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def sentiment_mean(self):
+        return self.sentiment_total / self.comment_count if self.comment_count else 0
+
+    @property
+    def moments(self):
+        return Moments.from_totals(self.count, self.total, self.m2)
+
+    def add_scores(self, count, total, total_sq, histogram, m2=None):
+        if m2 is None:
+            m2 = _m2_from_total_sq(count, total, total_sq)
+        self.m2 = self.moments.merge(Moments.from_totals(int(count), float(total), float(m2))).m2
+        self.count += int(count)
+        self.total += float(total)
+        self.total_sq += float(total_sq)
+        self.histogram = [a + int(b) for a, b in zip(self.histogram, histogram)]
+
+    def add_comments(self, comments, sentiment_total):
+        self.sentiment_total += float(sentiment_total)
+        # Amostragem por reservatório: cada comentário tem a mesma chance de ficar na amostra.
+        for comment in comments:
+            self.comment_count += 1
+            if len(self.comments) < self.max_comments:
+                self.comments.append(comment)
+            else:
+                slot = self._random.randrange(self.comment_count)
+                if slot < self.max_comments:
+                    self.comments[slot] = comment
+
+    def merge(self, other):
+        self.add_scores(other.count, other.total, other.total_sq, other.histogram, other.m2)
+        self.sentiment_total += other.sentiment_total
+        self.comments = merge_samples(self._random, self.comments, self.comment_count, other.comments, other.comment_count, self.max_comments)
+        self.comment_count += other.comment_count
+        return self
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "total_sq": self.total_sq,
+            "m2": self.m2,
+            "histogram": list(self.histogram),
+            "sentiment_total": self.sentiment_total,
+            "comment_count": self.comment_count,
+            "comments": list(self.comments),
+        }
+
+    @classmethod
+    def from_dict(cls, data, max_comments=DEFAULT_MAX_COMMENTS):
+        aggregate = cls(max_comments=max_comments)
+        aggregate.count = data.get("count", 0)
+        aggregate.total = data.get("total", 0.0)
+        aggregate.total_sq = data.get("total_sq", 0.0)
+        aggregate.m2 = data["m2"] if "m2" in data else _m2_from_total_sq(aggregate.count, aggregate.total, aggregate.total_sq)
+        aggregate.histogram = list(data.get("histogram", [0, 0, 0, 0, 0]))
+        aggregate.sentiment_total = data.get("sentiment_total", 0.0)
+        aggregate.comment_count = data.get("comment_count", 0)
+        # Parciais gravados antes podem trazer keyword_counts/keyword_display, que são ignorados.
+        aggregate.comments = list(data.get("comments", []))[:max_comments]
+        return aggregate
+
+class PeriodAggregate:
+    """Agregado de um período (ou de um grupo de linhas): total de avaliações, media_final e categorias."""
+
+    def __init__(self, max_comments=DEFAULT_MAX_COMMENTS):
+        self.rows = 0
+        self.media_final_count = 0
+        self.media_final_total = 0.0
+        # M2 e histograma (faixas de 0,01) da media_final; None em agregados gravados antes desses campos
+        # (ou com as antigas faixas de 0,1), e nos que forem combinados com eles.
+        self.media_final_m2 = 0.0
+        self.media_final_histogram = [0] * len(MEDIA_FINAL_POINTS)
+        self.categories = {}
+        self.max_comments = max_comments
+
+    def category(self, key):
+        if key not in self.categories:
+            self.categories[key] = CategoryAggregate(max_comments=self.max_comments)
+        return self.categories[key]
+
+    @property
+    def media_final_mean(self):
+        return self.media_final_total / self.media_final_count if self.media_final_count else 0
+
+    @property
+    def media_final_moments(self):
+        if self.media_final_m2 is None:
+            return None
+        return Moments.from_totals(self.media_final_count, self.media_final_total, self.media_final_m2)
+
+    def add_media_final(self, count, total, m2, histogram):
+        moments = self.media_final_moments
+        self.media_final_m2 = moments.merge(Moments.from_totals(count, total, m2)).m2 if moments is not None and m2 is not None else None
+        if self.media_final_histogram is not None and histogram is not None:
+            self.media_final_histogram = [a + int(b) for a, b in zip(self.media_final_histogram, histogram)]
+        else:
+            self.media_final_histogram = None
+        self.media_final_count += int(count)
+        self.media_final_total += float(total)
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.add_media_final(other.media_final_count, other.media_final_total, other.media_final_m2, other.media_final_histogram)
+        for key, category in other.categories.items():
+            self.category(key).merge(category)
+        return self
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "media_final_count": self.media_final_count,
+            "media_final_total": self.media_final_total,
+            "media_final_m2": self.media_final_m2,
+            "media_final_histogram": list(self.media_final_histogram) if self.media_final_histogram is not None else None,
+            "categories": {key: category.to_dict() for key, category in self.categories.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data, max_comments=DEFAULT_MAX_COMMENTS):
+        aggregate = cls(max_comments=max_comments)
+        aggregate.rows = data.get("rows", 0)
+        aggregate.media_final_count = data.get("media_final_count", 0)
+        aggregate.media_final_total = data.get("media_final_total", 0.0)
+        if "media_final_m2" in data or aggregate.media_final_count:
+            aggregate.media_final_m2 = data.get("media_final_m2")
+            histogram = data.get("media_final_histogram")
+            aggregate.media_final_histogram = list(histogram) if histogram is not None and len(histogram) == len(MEDIA_FINAL_POINTS) else None
+        aggregate.categories = {key: CategoryAggregate.from_dict(category, max_comments) for key, category in data.get("categories", {}).items()}
+        return aggregate
@@ -0,0 +1,87 @@
+"""Motor de regras das sugestões, compartilhado por analyze_evaluations.py e src/scripts/generate_report.py.
+
+As regras ficam em suggestion_rules.json (ou no arquivo indicado em SUGGESTION_RULES_FILE), um
+conjunto por script ("analysis" e "report"). Cada regra tem condições "when" do tipo
+{"coluna": ["<", 2.5]}, todas obrigatórias, e um "output" cujos textos podem usar as colunas das
+métricas ({name}, {average_score:.1f}, ...). As regras são avaliadas em ordem e vale a primeira
+que casar, como uma cadeia if/elif. Entradas "derived" criam colunas de texto a partir de
+condições (ex.: o aviso de polarização) antes da avaliação das regras.
+
+As condições são avaliadas de forma vetorizada sobre uma tabela de métricas com uma linha por
+grupo/categoria; comparações com NaN são falsas.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+RULES_CONFIG_ENV = "SUGGESTION_RULES_FILE"
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'suggestion_rules.json')
+
+OPERATORS = {
+    '<': np.less,
+    '<=': np.less_equal,
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+
+def condition_mask(metrics, conditions):
+    mask = np.ones(len(metrics), dtype=bool)
+    for column, (operator, value) in conditions.items():
+        with np.errstate(invalid='ignore'):
+            mask &= OPERATORS[operator](metrics[column].to_numpy(dtype=float), value)
+    return mask
+
+class RuleSet:
+    def __init__(self, rules, derived=None):
+        for rule in rules:
+            for operator, _ in rule['when'].values():
+                if operator not in OPERATORS:
+                    raise ValueError(f"Operador inválido na regra de sugestão: {operator}")
+        self.rules = rules
+        self.derived = derived or {}
+
+    def derive(self, metrics):
+        metrics = metrics.copy()
+        for column, spec in self.derived.items():
+            metrics[column] = np.where(condition_mask(metrics, spec['when']), spec['then'], spec.get('else', ''))
+        return metrics
+
+    def evaluate(self, metrics):
+        """Índice da primeira regra que casa em cada linha (-1 quando nenhuma casa)."""
+        if not self.rules or metrics.empty:
+            return pd.Series(-1, index=metrics.index, dtype=np.int64)
+        masks = [condition_mask(metrics, rule['when']) for rule in self.rules]
+        return pd.Series(np.select(masks, np.arange(len(masks)), default=-1), index=metrics.index)
+
+    def apply(self, metrics):
+        """Retorna {índice da linha: output da regra formatado com as métricas da linha, ou None}."""
+        metrics = self.derive(metrics)
+        matched = self.evaluate(metrics)
+        records = metrics.to_dict(orient='index')
+        outputs = {}
+        for index, rule_index in matched.items():
+            if rule_index < 0:
+                outputs[index] = None
+                continue
+            values = records[index]
+            outputs[index] = {field: template.format(**values) if isinstance(template, str) else template
+                              for field, template in self.rules[rule_index]['output'].items()}
+        return outputs
+
+def load_rule_sets(config_path=None):
+    config_path = config_path or os.getenv(RULES_CONFIG_ENV) or DEFAULT_RULES_PATH
+    with open(config_path, encoding='utf-8') as config_file:
+        config = json.load(config_file)
+    return {name: RuleSet(spec.get('rules', []), spec.get('derived')) for name, spec in config.items()}
+
+_rule_sets = None
+
+def get_rule_set(name):
+    global _rule_sets
+    if _rule_sets is None:
+        _rule_sets = load_rule_sets()
+    return _rule_sets[name]
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Configuração do cache de resumos executivos (via variáveis de ambiente):
+#   SUMMARY_CACHE_SIZE: número máximo de resumos em memória (LRU), padrão 128;
+#   SUMMARY_CACHE_TTL: validade de um resumo em segundos, padrão 86400 (1 dia);
+#   SUMMARY_CACHE_BACKEND: "disk" (usa SUMMARY_CACHE_DIR) ou "analytics_results" (tabela AnalyticsResults).
+
+def fingerprint(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+class DiskBackend:
+    """Guarda cada resumo em um arquivo JSON nomeado pela impressão digital do prompt."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+        return entry['text'], entry['created_at']
+
+    def set(self, key, text, created_at):
+        temp_path = f'{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as entry_file:
+            json.dump({'text': text, 'created_at': created_at}, entry_file, ensure_ascii=False)
+        os.replace(temp_path, self._path(key))
+
+class AnalyticsResultsBackend:
+    """Guarda os resumos na tabela AnalyticsResults (tipo = 'gemini_summary'), uma linha por impressão digital.
+
+    A impressão digital fica na coluna indexada fingerprint (UNIQUE com tipo), e cada gravação
+    substitui a linha existente. Linhas mais antigas que ttl_seconds são apagadas nas gravações,
+    que só acontecem quando o resumo não estava no cache (depois de uma chamada ao LLM).
+    """
+
+    TIPO = 'gemini_summary'
+
+    def __init__(self, connect=None, ttl_seconds=None):
+        if connect is None:
+            from db_connection import get_connection
+            connect = get_connection
+        self.connect = connect
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key):
+        connection = self.connect()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                "SELECT payload FROM AnalyticsResults WHERE tipo = %s AND fingerprint = %s LIMIT 1",
+                (self.TIPO, key)
+            )
+            row = cursor.fetchone()
+        finally:
+            connection.close()
+        if not row:
+            return None
+        entry = json.loads(row[0])
+        return entry['text'], entry['created_at']
+
+    def set(self, key, text, created_at):
+        connection = self.connect()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                "INSERT INTO AnalyticsResults (tipo, fingerprint, payload) VALUES (%s, %s, %s) "
+                "ON DUPLICATE KEY UPDATE payload = VALUES(payload), criado_em = CURRENT_TIMESTAMP",
+                (self.TIPO, key, json.dumps({'text': text, 'created_at': created_at}, ensure_ascii=False))
+            )
+            if self.ttl_seconds is not None:
+                cursor.execute(
+                    "DELETE FROM AnalyticsResults WHERE tipo = %s AND criado_em < NOW() - INTERVAL %s SECOND",
+                    (self.TIPO, int(self.ttl_seconds))
+                )
+            connection.commit()
+        finally:
+            connection.close()
+
+class SummaryCache:
+    """Cache LRU com validade (TTL) para os resumos do LLM, com um backend persistente opcional."""
+
+    def __init__(self, max_entries=128, ttl_seconds=86400, backend=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.backend_hits = 0
+        self.lock = threading.Lock()
+
+    def _expired(self, created_at):
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def _remember(self, key, text, created_at):
+        self.entries[key] = (text, created_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and not self._expired(entry[1]):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.entries.pop(key, None)
+
+        entry = None
+        if self.backend is not None:
+            try:
+                entry = self.backend.get(key)
+            except Exception as e:
+                print(f"[summary-cache] falha ao ler o backend: {e}", file=sys.stderr)
+
+        with self.lock:
+            if entry is not None and not self._expired(entry[1]):
+                self._remember(key, *entry)
+                self.hits += 1
+                self.backend_hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def set(self, key, text):
+        created_at = time.time()
+        with self.lock:
+            self._remember(key, text, created_at)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, text, created_at)
+            except Exception as e:
+                print(f"[summary-cache] falha ao gravar no backend: {e}", file=sys.stderr)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "backend_hits": self.backend_hits, "entries": len(self.entries)}
+
+def build_cache_from_env():
+    backend = None
+    backend_name = os.getenv("SUMMARY_CACHE_BACKEND", "")
+    ttl_seconds = float(os.getenv("SUMMARY_CACHE_TTL", "86400"))
+    if backend_name == "disk":
+        backend = DiskBackend(os.getenv("SUMMARY_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), '.summary_cache')))
+    elif backend_name == "analytics_results":
+        backend = AnalyticsResultsBackend(ttl_seconds=ttl_seconds)
+    return SummaryCache(
+        max_entries=int(os.getenv("SUMMARY_CACHE_SIZE", "128")),
+        ttl_seconds=ttl_seconds,
+        backend=backend,
+    )
+
+_summary_cache = None
+_summary_cache_lock = threading.Lock()
+
+def get_summary_cache():
+    global _summary_cache
+    with _summary_cache_lock:
+        if _summary_cache is None:
+            _summary_cache = build_cache_from_env()
+        return _summary_cache
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from period_split import created_at, latest_per_user
+
+def latest_ids(rows):
+    df = pd.DataFrame(rows, columns=['id', 'usuario_id', 'criado_em'])
+    return sorted(latest_per_user(df, created_at(df))['id'])
+
+def test_keeps_the_most_recent_evaluation():
+    assert latest_ids([(1, 7, '2026-01-02'), (2, 7, '2026-01-01'), (3, 8, '2026-01-01')]) == [1, 3]
+
+def test_tie_keeps_the_first_row():
+    # Como o filtro antigo do backend: uma avaliação com o mesmo criado_em não substitui a anterior.
+    assert latest_ids([(1, 7, '2026-01-01'), (2, 7, '2026-01-03'), (3, 7, '2026-01-03'), (4, 7, '2026-01-02')]) == [2]
+
+def test_rows_without_user_are_kept():
+    assert latest_ids([(1, None, '2026-01-01'), (2, None, '2026-01-01'), (3, 7, '2026-01-01')]) == [1, 2, 3]
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from score_statistics import MEDIA_FINAL_EDGES, MEDIA_FINAL_POINTS, Moments, describe, media_final_histogram
+
+# Valores de DECIMAL(3,2) que, com o índice truncado, caíam na faixa de baixo.
+EDGE_VALUES = [1.2, 1.4, 1.7, 1.9, 2.3, 2.4, 2.8, 2.9, 3.3, 3.4, 3.8, 3.9, 4.1, 4.3, 4.6, 4.8]
+
+def media_final_statistics(values):
+    values = np.asarray(values, dtype=np.float64)
+    return describe(Moments.from_values(values), media_final_histogram(values), MEDIA_FINAL_EDGES, MEDIA_FINAL_POINTS)
+
+@pytest.mark.parametrize("value", EDGE_VALUES)
+def test_edge_value_falls_in_its_own_bin(value):
+    histogram = media_final_histogram([value])
+    assert MEDIA_FINAL_POINTS[np.flatnonzero(histogram)[0]] == pytest.approx(value)
+
+def test_every_decimal_value_has_its_own_bin():
+    values = np.round(np.arange(100, 501) / 100, 2)
+    assert (media_final_histogram(values) == 1).all()
+
+@pytest.mark.parametrize("value", EDGE_VALUES + [1.0, 5.0])
+def test_constant_series_quantiles_equal_the_value(value):
+    statistics = media_final_statistics([value] * 50)
+    assert statistics["median"] == pytest.approx(value)
+    assert statistics["quantiles"] == {"p25": pytest.approx(value), "p75": pytest.approx(value)}
+    assert statistics["polarization"] == 0
+
+def test_quantiles_match_the_data():
+    rng = np.random.default_rng(0)
+    values = np.round(rng.uniform(1, 5, 2001), 2)
+    statistics = media_final_statistics(values)
+    assert statistics["median"] == pytest.approx(np.quantile(values, 0.5, method='inverted_cdf'))
+    assert statistics["quantiles"]["p25"] == pytest.approx(np.quantile(values, 0.25, method='inverted_cdf'))
+    assert statistics["quantiles"]["p75"] == pytest.approx(np.quantile(values, 0.75, method='inverted_cdf'))
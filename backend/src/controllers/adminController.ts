@@ -6,6 +6,8 @@ import { spawn } from 'child_process';
 import path from 'path';
 // Importa o módulo fs para interagir com o sistema de arquivos.
 import fs from 'fs';
+// Importa o módulo crypto para gerar nomes únicos para os relatórios.
+import crypto from 'crypto';
 // Importa o serviço de administrador para interagir com a lógica de negócio.
 import * as adminService from '../services/adminService';
 
@@ -33,8 +35,20 @@ export const downloadReport = (req: Request, res: Response): Response | void =>
     });
   }
 
+  // Cada requisição recebe o próprio arquivo de saída, evitando conflito entre relatórios gerados ao mesmo tempo.
+  // O script reaproveita o PDF do cache (reports/cache) quando os dados não mudaram.
+  const reportPath = path.join(__dirname, '../../reports', `relatorio_${crypto.randomUUID()}.pdf`);
+
+  // Filtros opcionais do relatório (instituição, curso e período), repassados como argumentos ao script.
+  const { institutionId, courseId, startDate, endDate } = req.query;
+  const scriptArgs: string[] = [scriptPath, '--output', reportPath];
+  if (institutionId) scriptArgs.push('--institution', String(Number(institutionId)));
+  if (courseId) scriptArgs.push('--course', String(Number(courseId)));
+  if (startDate) scriptArgs.push('--start', String(startDate));
+  if (endDate) scriptArgs.push('--end', String(endDate));
+
   // 2. Tenta executar o script Python.
-  const pythonProcess = spawn('py', [scriptPath], {
+  const pythonProcess = spawn('py', scriptArgs, {
     cwd: path.join(__dirname, '../../'),
   });
 
@@ -55,9 +69,6 @@ export const downloadReport = (req: Request, res: Response): Response | void =>
       });
     }
 
-    // Constrói o caminho para o relatório em PDF gerado.
-    const reportPath = path.join(__dirname, '../../reports/relatorio_avaliacoes.pdf');
-
     // 4. Verifica se o arquivo PDF foi realmente criado pelo script.
     if (!fs.existsSync(reportPath)) {
       console.error('O script Python executou, mas o arquivo PDF não foi encontrado.');
@@ -69,6 +80,8 @@ export const downloadReport = (req: Request, res: Response): Response | void =>
       if (err) {
         console.error('Erro ao enviar o arquivo PDF para o cliente:', err);
       }
+      // Remove a cópia da requisição; o PDF continua no cache.
+      fs.unlink(reportPath, () => {});
     });
   });
 
@@ -21,6 +21,15 @@ export const getInstitutionAnalysis = async (req: Request, res: Response): Promi
       previousStart,
       previousEnd,
       courseId,
+      includeRawData,
+      commentsLimit,
+      commentsSample,
+      asyncSummary,
+      usePartials,
+      groupBy,
+      groupLimit,
+      commentTopics,
+      commentTopicsLimit,
     } = req.query;
 
     // Valida se o ID da instituição foi fornecido.
@@ -35,6 +44,16 @@ export const getInstitutionAnalysis = async (req: Request, res: Response): Promi
       previousStart: previousStart as string | undefined,
       previousEnd: previousEnd as string | undefined,
       courseId: courseId as string | undefined,
+      includeRawData: includeRawData === undefined ? undefined : includeRawData !== 'false',
+      commentsLimit: commentsLimit !== undefined ? Number(commentsLimit) : undefined,
+      commentsSample: commentsSample === 'random' ? 'random' as const : undefined,
+      asyncSummary: asyncSummary === 'true',
+      usePartials: usePartials === 'true',
+      // groupBy=curso_id,month gera um recorte por curso e outro por mês; groupBy=curso_id:month, um por curso e mês.
+      groupBy: groupBy ? String(groupBy).split(',').map((item) => (item.includes(':') ? item.split(':') : item)) : undefined,
+      groupLimit: groupLimit !== undefined ? Number(groupLimit) : undefined,
+      commentTopics: commentTopics === 'true',
+      commentTopicsLimit: commentTopicsLimit !== undefined ? Number(commentTopicsLimit) : undefined,
     };
     // Chama o serviço para gerar a análise da instituição.
     const analysisResult = await analysisService.generateAnalysisForInstitution(Number(id), options);
@@ -48,6 +67,88 @@ export const getInstitutionAnalysis = async (req: Request, res: Response): Promi
   }
 };
 
+/**
+ * @function getInstitutionAnalysisPage
+ * @description Retorna uma página de comentários de uma categoria ou de linhas brutas da análise de uma instituição.
+ * @param {Request} req - O objeto de requisição do Express.
+ * @param {Response} res - O objeto de resposta do Express.
+ * @returns {Promise<Response>}
+ */
+export const getInstitutionAnalysisPage = async (req: Request, res: Response): Promise<Response> => {
+  try {
+    // Extrai o ID da instituição dos parâmetros da rota.
+    const { id } = req.params;
+    // Extrai os filtros e os parâmetros de paginação da query string.
+    const {
+      currentStart,
+      currentEnd,
+      previousStart,
+      previousEnd,
+      courseId,
+      type,
+      category,
+      offset,
+      limit,
+    } = req.query;
+
+    // Valida o ID da instituição e o tipo de página.
+    if (!id) {
+      return res.status(400).json({ message: 'O ID da instituição é obrigatório.' });
+    }
+    if (type !== 'comments' && type !== 'raw_data') {
+      return res.status(400).json({ message: 'O tipo de página deve ser "comments" ou "raw_data".' });
+    }
+    if (type === 'comments' && !category) {
+      return res.status(400).json({ message: 'A categoria é obrigatória para paginar comentários.' });
+    }
+
+    const options = {
+      currentStart: currentStart as string | undefined,
+      currentEnd: currentEnd as string | undefined,
+      previousStart: previousStart as string | undefined,
+      previousEnd: previousEnd as string | undefined,
+      courseId: courseId as string | undefined,
+    };
+    const page = {
+      type: type as 'comments' | 'raw_data',
+      category: category as string | undefined,
+      offset: offset !== undefined ? Number(offset) : 0,
+      limit: limit !== undefined ? Number(limit) : 50,
+    };
+
+    // Chama o serviço para buscar a página solicitada.
+    const pageResult = await analysisService.getAnalysisPage(Number(id), options, page);
+    return res.status(200).json(pageResult);
+
+  } catch (error: any) {
+    // Em caso de erro, loga a falha e retorna uma resposta de erro 500.
+    console.error('Erro ao paginar a análise:', error);
+    return res.status(500).json({ message: 'Erro ao buscar a página da análise.', error: error.message });
+  }
+};
+
+/**
+ * @function getAnalysisSummary
+ * @description Consulta o resumo do LLM de uma análise gerada com asyncSummary=true.
+ * @param {Request} req - O objeto de requisição do Express.
+ * @param {Response} res - O objeto de resposta do Express.
+ * @returns {Promise<Response>}
+ */
+export const getAnalysisSummary = async (req: Request, res: Response): Promise<Response> => {
+  // Extrai o ID do job dos parâmetros da rota.
+  const { jobId } = req.params;
+
+  const summary = analysisService.getAnalysisSummary(jobId);
+  if (!summary) {
+    return res.status(404).json({ message: 'Resumo não encontrado.' });
+  }
+  // 202 enquanto o resumo ainda está sendo gerado, 200 quando está pronto e 500 se o worker encerrou antes de entregá-lo.
+  if (summary.status === 'failed') {
+    return res.status(500).json(summary);
+  }
+  return res.status(summary.status === 'ready' ? 200 : 202).json(summary);
+};
+
 /**
  * @function downloadReportPdf
  * @description Gera e baixa um relatório de análise em PDF para uma instituição.
@@ -64,7 +165,8 @@ export const downloadReportPdf = async (req: Request, res: Response): Promise<Re
       currentStart, 
       currentEnd, 
       previousStart, 
-      previousEnd 
+      previousEnd,
+      appendices
     } = req.query;
 
     // Valida se o ID da instituição foi fornecido.
@@ -78,20 +180,23 @@ export const downloadReportPdf = async (req: Request, res: Response): Promise<Re
       currentEnd: currentEnd as string | undefined,
       previousStart: previousStart as string | undefined,
       previousEnd: previousEnd as string | undefined,
+      includeAppendices: appendices === 'true',
     };
 
-    // Chama o serviço para gerar o relatório em PDF.
-    const pdfBuffer = await analysisService.generatePdfReport(Number(id), options);
-
-    // Define os cabeçalhos da resposta para indicar que é um arquivo PDF para download.
-    res.setHeader('Content-Type', 'application/pdf');
-    res.setHeader('Content-Disposition', 'attachment; filename="relatorio_avaliacao.pdf"');
-    // Envia o buffer do PDF como resposta.
-    res.send(pdfBuffer);
+    // Gera o PDF e o repassa à resposta sem acumulá-lo em memória; os cabeçalhos são definidos quando o primeiro chunk
+    // fica pronto (ao fim da renderização).
+    await analysisService.writePdfReport(Number(id), options, res, () => {
+      res.setHeader('Content-Type', 'application/pdf');
+      res.setHeader('Content-Disposition', 'attachment; filename="relatorio_avaliacao.pdf"');
+    });
 
   } catch (error: any) {
-    // Em caso de erro, loga a falha e retorna uma resposta de erro 500.
+    // Em caso de erro, loga a falha e retorna uma resposta de erro 500 (ou encerra a resposta já iniciada).
     console.error('Erro ao gerar PDF no controller:', error);
+    if (res.headersSent) {
+      res.destroy(error);
+      return;
+    }
     res.status(500).json({ message: 'Erro ao gerar o PDF do relatório.', error: error.message });
   }
 };
@@ -1,7 +1,7 @@
 // Importa a função Router do Express para criar um novo objeto de roteador.
 import { Router } from 'express';
 // Importa os controladores de análise para lidar com as requisições.
-import { getInstitutionAnalysis, downloadReportPdf } from '../controllers/analysisController';
+import { getInstitutionAnalysis, getInstitutionAnalysisPage, getAnalysisSummary, downloadReportPdf } from '../controllers/analysisController';
 // Importa os middlewares de autenticação e verificação de administrador.
 import { authenticate, adminOnly } from '../middlewares/authMiddleware';
 
@@ -17,6 +17,24 @@ router.get(
   getInstitutionAnalysis
 );
 
+// Rota para obter, sob demanda, uma página de comentários ou de linhas brutas da análise.
+// A rota é protegida e só pode ser acessada por administradores autenticados.
+router.get(
+  '/analysis/institution/:id/page',
+  authenticate,
+  adminOnly,
+  getInstitutionAnalysisPage
+);
+
+// Rota para consultar o resumo do LLM de uma análise pedida com asyncSummary=true.
+// A rota é protegida e só pode ser acessada por administradores autenticados.
+router.get(
+  '/analysis/summary/:jobId',
+  authenticate,
+  adminOnly,
+  getAnalysisSummary
+);
+
 // Rota para baixar o relatório de análise de uma instituição em formato PDF.
 // A rota é protegida e só pode ser acessada por administradores autenticados.
 router.get(
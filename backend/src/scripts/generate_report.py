@@ -1,8 +1,15 @@
+import io
 import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import argparse
+from collections import Counter
 import pandas as pd
 import mysql.connector
 from dotenv import load_dotenv
-import matplotlib.pyplot as plt
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
@@ -11,6 +18,10 @@ from reportlab.platypus import Paragraph
 from reportlab.lib.colors import red, green, black
 from datetime import datetime
 
+# O motor de regras das sugestões é compartilhado com python_scripts/analyze_evaluations.py.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'python_scripts'))
+from suggestion_rules import get_rule_set
+
 # Carrega as variáveis de ambiente
 load_dotenv(dotenv_path='../../.env')
 
@@ -45,116 +56,314 @@ def analyze_sentiment(comment):
     neg_count = sum(1 for word in NEGATIVE_KEYWORDS if word in comment_lower)
     return -neg_count
 
-def generate_suggestions(df):
-    suggestions = []
-    for cat_key, cat_info in CATEGORIES.items():
-        cat_name = cat_info['name']
-        nota_cols = [f'nota_{key}' for key in cat_info['keys'] if f'nota_{key}' in df.columns]
-        comentario_cols = [f'comentario_{key}' for key in cat_info['keys'] if f'comentario_{key}' in df.columns]
+def sentiment_total(comments):
+    """Soma de analyze_sentiment sobre uma coluna de comentários, contando cada palavra-chave com operações vetorizadas."""
+    comments = comments[comments.map(lambda value: isinstance(value, str))].str.lower()
+    if comments.empty:
+        return 0
+    return -sum(int(comments.str.contains(word, regex=False).sum()) for word in NEGATIVE_KEYWORDS)
+
+# --- Agregados em streaming ---
+# As avaliações são lidas em blocos e resumidas em contadores; nenhum bloco fica em memória
+# depois de incorporado, então o consumo não cresce com o tamanho da tabela.
+
+def category_columns(prefix):
+    return [f'{prefix}_{key}' for cat_info in CATEGORIES.values() for key in cat_info['keys']]
+
+class ReportAggregate:
+    def __init__(self):
+        self.rows = 0
+        # media_final é DECIMAL(3,2): guardar a contagem de cada valor exato permite refazer
+        # média e histograma sem manter as linhas.
+        self.media_final_counts = Counter()
+        self.score_sums = Counter()
+        self.score_counts = Counter()
+        self.sentiment_totals = Counter()
+
+    def add_chunk(self, df):
+        self.rows += len(df)
+        if 'media_final' in df.columns:
+            media_final = pd.to_numeric(df['media_final'], errors='coerce').dropna().round(2)
+            self.media_final_counts.update(media_final.value_counts().to_dict())
+
+        for col in category_columns('nota'):
+            if col in df.columns:
+                scores = pd.to_numeric(df[col], errors='coerce')
+                self.score_sums[col] += float(scores.sum())
+                self.score_counts[col] += int(scores.count())
+
+        for cat_key, cat_info in CATEGORIES.items():
+            comment_cols = [f'comentario_{key}' for key in cat_info['keys'] if f'comentario_{key}' in df.columns]
+            if comment_cols:
+                self.sentiment_totals[cat_key] += sentiment_total(df[comment_cols].stack())
+
+    @property
+    def media_final_total(self):
+        return sum(self.media_final_counts.values())
+
+    def media_final_mean(self):
+        total = self.media_final_total
+        return sum(value * count for value, count in self.media_final_counts.items()) / total if total else float('nan')
 
+    def column_mean(self, col):
+        return self.score_sums[col] / self.score_counts[col] if self.score_counts[col] else float('nan')
+
+# Cores do ReportLab usadas pelas regras do conjunto "report" (suggestion_rules.json).
+SUGGESTION_COLORS = {"red": red, "green": green}
+
+def suggestion_metrics(aggregate):
+    """Tabela de métricas por categoria: média das médias de cada pergunta e sentimento médio por avaliação."""
+    rows = {}
+    for cat_key, cat_info in CATEGORIES.items():
+        nota_cols = [f'nota_{key}' for key in cat_info['keys'] if aggregate.score_counts[f'nota_{key}']]
         if not nota_cols:
             continue
+        rows[cat_key] = {
+            "name": cat_info['name'],
+            "average_score": pd.Series([aggregate.column_mean(col) for col in nota_cols]).mean(),
+            "sentiment_score": aggregate.sentiment_totals[cat_key] / aggregate.rows if aggregate.rows else 0,
+        }
+    return pd.DataFrame.from_dict(rows, orient='index', columns=["name", "average_score", "sentiment_score"])
 
-        # Calcula a média para a categoria inteira
-        average_score = df[nota_cols].mean().mean()
-        
-        sentiment_score = 0
-        if comentario_cols:
-            # Soma o sentimento de todos os comentários da categoria
-            sentiment_score = df[comentario_cols].apply(lambda row: row.apply(analyze_sentiment).sum(), axis=1).mean()
-
-        # Regra 1: Nota baixa
-        if average_score < 3.0:
-            suggestion = f"""**Ponto Crítico em {cat_name} (Nota Média: {average_score:.1f}):** 
-            A nota geral para este tópico está muito baixa. É urgente investigar as causas. 
-            Analise os comentários específicos desta área para identificar os problemas e criar um plano de ação corretivo."""
-            suggestions.append({"text": suggestion, "color": red})
-
-        # Regra 2: Nota média com sentimento negativo
-        elif average_score < 4.0 and sentiment_score < -0.1:
-            suggestion = f"""**Ponto de Atenção em {cat_name} (Nota Média: {average_score:.1f}):** 
-            As notas não são altas e os comentários indicam insatisfação. Recomenda-se focar em melhorias neste tópico. 
-            Priorize os pontos mencionados nos comentários."""
-            suggestions.append({"text": suggestion, "color": "orange"})
-
-        # Regra 3: Nota alta
-        elif average_score >= 4.5:
-            suggestion = f"""**Ponto Forte em {cat_name} (Nota Média: {average_score:.1f}):** 
-            Este tópico é um destaque positivo. Continue o bom trabalho e utilize as práticas desta área como exemplo para as demais. 
-            Considere reconhecer os responsáveis."""
-            suggestions.append({"text": suggestion, "color": green})
-            
+def generate_suggestions(aggregate):
+    suggestions = []
+    for output in get_rule_set('report').apply(suggestion_metrics(aggregate)).values():
+        if output is not None:
+            suggestions.append({"text": output['text'], "color": SUGGESTION_COLORS.get(output['color'], output['color'])})
     return suggestions
 
+# --- Cache de renderização ---
+# Gráficos e PDFs ficam em REPORT_CACHE_DIR com o nome igual ao hash dos dados que os geraram,
+# então um relatório sem mudanças é só uma cópia de arquivo. Os arquivos menos usados são
+# removidos quando o diretório passa de REPORT_CACHE_MAX_BYTES, inclusive por outra requisição
+# entre a gravação e a cópia: quem lê do cache trata o arquivo ausente como falta no cache.
+# A data de geração impressa no PDF faz parte do hash, então um PDF em cache vale só no dia em que
+# foi gerado.
+
+# Altere ao mudar o layout do gráfico ou do PDF, para invalidar o que já está em cache.
+RENDER_VERSION = 2
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'reports', 'cache'))
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+def content_hash(kind, data):
+    payload = json.dumps({"kind": kind, "version": RENDER_VERSION, "data": data}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class RenderCache:
+    def __init__(self, directory=REPORT_CACHE_DIR, max_bytes=REPORT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def read(self, key, suffix):
+        """Conteúdo do arquivo em cache, ou None."""
+        try:
+            with open(self.path(key, suffix), 'rb') as cached_file:
+                content = cached_file.read()
+            os.utime(self.path(key, suffix))  # marca como usado recentemente
+        except FileNotFoundError:
+            return None
+        return content
+
+    def export(self, key, suffix, destination):
+        """Copia o arquivo em cache para destination; retorna False se ele não está (mais) no cache.
+
+        Cada requisição recebe o próprio arquivo de saída; o link evita copiar o PDF quando possível
+        e, uma vez feito, não é afetado se o arquivo for removido do cache.
+        """
+        source = self.path(key, suffix)
+        os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+        if os.path.exists(destination):
+            os.remove(destination)
+        try:
+            os.utime(source)  # marca como usado recentemente
+            os.link(source, destination)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            # Sem suporte a links (ex.: destino em outro sistema de arquivos): cópia.
+            try:
+                shutil.copyfile(source, destination)
+            except FileNotFoundError:
+                return False
+        return True
+
+    def put(self, key, suffix, render):
+        """Chama render(caminho_temporário) e publica o arquivo no cache de forma atômica."""
+        fd, temp_path = tempfile.mkstemp(suffix=suffix, dir=self.directory)
+        os.close(fd)
+        try:
+            render(temp_path)
+            os.replace(temp_path, self.path(key, suffix))
+        except Exception:
+            os.remove(temp_path)
+            raise
+        self.evict(keep=self.path(key, suffix))
+        return self.path(key, suffix)
+
+    def evict(self, keep=None):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith('tmp'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
 # --- Geração do Relatório em PDF ---
 
-def generate_report():
+def render_chart(aggregate, output):
+    # O matplotlib só é importado quando o gráfico não está em cache.
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(8, 4))
+    values = list(aggregate.media_final_counts.keys())
+    weights = list(aggregate.media_final_counts.values())
+    plt.hist(values, weights=weights, bins=10, color='skyblue', edgecolor='black')
+    plt.title('Distribuição das Médias Finais')
+    plt.xlabel('Média Final'); plt.ylabel('Nº de Avaliações')
+    plt.savefig(output, format='png')
+    plt.close()
+
+def chart_png(cache, chart_key, aggregate):
+    """PNG do gráfico (do cache ou renderizado e gravado nele), em memória para não depender do arquivo em cache."""
+    png = cache.read(chart_key, '.png')
+    if png is None:
+        buffer = io.BytesIO()
+        render_chart(aggregate, buffer)
+        png = buffer.getvalue()
+
+        def write_png(path):
+            with open(path, 'wb') as png_file:
+                png_file.write(png)
+        cache.put(chart_key, '.png', write_png)
+    return png
+
+def render_pdf(report_path, total_evaluations, average_score, suggestions_list, chart_png, generated_on):
+    c = canvas.Canvas(report_path, pagesize=letter)
+    width, height = letter
+    styles = getSampleStyleSheet()
+
+    # Título
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(100, height - 50, "Relatório de Análise de Avaliações")
+    c.setFont("Helvetica", 10)
+    c.drawString(100, height - 70, f"Gerado em: {generated_on}")
+
+    # Sumário
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(100, height - 120, "Resumo Geral")
+    c.setFont("Helvetica", 11)
+    c.drawString(100, height - 140, f"Total de Avaliações: {total_evaluations}")
+    c.drawString(100, height - 160, f"Média Final Geral: {average_score:.2f}")
+
+    # Gráfico
+    c.drawImage(ImageReader(io.BytesIO(chart_png)), 100, height - 340, width=400, height=180)
+
+    # Sugestões e Plano de Ação
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(100, height - 380, "Sugestões e Plano de Ação")
+
+    y_position = height - 400
+    for sug in suggestions_list:
+        p = Paragraph(sug['text'], style=styles['Normal'])
+        p.wrapOn(c, width - 200, height)
+        p_height = p.height
+        if y_position - p_height < 80:
+            c.showPage()
+            y_position = height - 80
+
+        p.drawOn(c, 100, y_position)
+        y_position -= (p_height + 15)
+
+    c.save()
+
+# Tamanho dos blocos lidos do banco.
+CHUNK_SIZE = 5000
+
+def build_query(filters):
+    # Apenas as colunas usadas pelo relatório: media_final (resumo e gráfico), notas e comentários (sugestões).
+    columns = ['media_final'] + category_columns('nota') + category_columns('comentario')
+    query = f"SELECT {', '.join(columns)} FROM Avaliacoes"
+    conditions, params = [], []
+    if filters.get('institution_id') is not None:
+        conditions.append("instituicao_id = %s")
+        params.append(filters['institution_id'])
+    if filters.get('course_id') is not None:
+        conditions.append("curso_id = %s")
+        params.append(filters['course_id'])
+    if filters.get('start'):
+        conditions.append("criado_em >= %s")
+        params.append(filters['start'])
+    if filters.get('end'):
+        conditions.append("criado_em <= %s")
+        params.append(filters['end'])
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query, params
+
+def load_report_aggregate(db_connection, filters):
+    # Com chunksize o cursor (não bufferizado) busca as linhas do servidor aos poucos.
+    query, params = build_query(filters)
+    aggregate = ReportAggregate()
+    for chunk in pd.read_sql(query, db_connection, params=params, chunksize=CHUNK_SIZE):
+        aggregate.add_chunk(chunk)
+    return aggregate
+
+def generate_report(filters=None, output_path=None):
     try:
         db_connection = mysql.connector.connect(
             host=os.getenv("DB_HOST"), user=os.getenv("DB_USER"),
             password=os.getenv("DB_PASSWORD"), database=os.getenv("DB_NAME")
         )
-        query = "SELECT * FROM Avaliacoes"
-        df = pd.read_sql(query, db_connection)
+        aggregate = load_report_aggregate(db_connection, filters or {})
         db_connection.close()
 
-        if df.empty:
+        if aggregate.rows == 0:
             print("Nenhuma avaliação encontrada.")
             return None
 
         # --- Análise ---
-        average_score = df['media_final'].mean()
-        total_evaluations = len(df)
-        suggestions_list = generate_suggestions(df)
-
-        # --- Gráfico ---
-        plt.figure(figsize=(8, 4))
-        plt.hist(df['media_final'], bins=10, color='skyblue', edgecolor='black')
-        plt.title('Distribuição das Médias Finais')
-        plt.xlabel('Média Final'); plt.ylabel('Nº de Avaliações')
-        chart_path = os.path.join('..', '..', 'reports', 'media_distribuicao.png')
-        plt.savefig(chart_path)
-        plt.close()
-
-        # --- PDF ---
-        report_path = os.path.join('..', '..', 'reports', 'relatorio_avaliacoes.pdf')
-        c = canvas.Canvas(report_path, pagesize=letter)
-        width, height = letter
-        styles = getSampleStyleSheet()
-
-        # Título
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(100, height - 50, "Relatório de Análise de Avaliações")
-        c.setFont("Helvetica", 10)
-        c.drawString(100, height - 70, f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
-
-        # Sumário
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(100, height - 120, "Resumo Geral")
-        c.setFont("Helvetica", 11)
-        c.drawString(100, height - 140, f"Total de Avaliações: {total_evaluations}")
-        c.drawString(100, height - 160, f"Média Final Geral: {average_score:.2f}")
-
-        # Gráfico
-        c.drawImage(ImageReader(chart_path), 100, height - 340, width=400, height=180)
-
-        # Sugestões e Plano de Ação
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(100, height - 380, "Sugestões e Plano de Ação")
-        
-        y_position = height - 400
-        for sug in suggestions_list:
-            p = Paragraph(sug['text'], style=styles['Normal'])
-            p.wrapOn(c, width - 200, height)
-            p_height = p.height
-            if y_position - p_height < 80:
-                c.showPage()
-                y_position = height - 80
-            
-            p.drawOn(c, 100, y_position)
-            y_position -= (p_height + 15)
-
-        c.save()
+        average_score = aggregate.media_final_mean()
+        total_evaluations = aggregate.rows
+        suggestions_list = generate_suggestions(aggregate)
+
+        report_path = output_path or os.path.join('..', '..', 'reports', 'relatorio_avaliacoes.pdf')
+        cache = RenderCache()
+        chart_key = content_hash('chart', sorted(aggregate.media_final_counts.items()))
+        generated_on = datetime.now().strftime('%d/%m/%Y')
+        report_key = content_hash('pdf', {
+            "chart": chart_key,
+            "generated_on": generated_on,
+            "total_evaluations": total_evaluations,
+            "average_score": round(average_score, 2),
+            "suggestions": [(sug['text'], str(sug['color'])) for sug in suggestions_list],
+        })
+
+        # --- PDF (reaproveitado do cache se os dados não mudaram no mesmo dia) ---
+        if not cache.export(report_key, '.pdf', report_path):
+            png = chart_png(cache, chart_key, aggregate)
+            render = lambda path: render_pdf(path, total_evaluations, average_score, suggestions_list, png, generated_on)
+            cache.put(report_key, '.pdf', render)
+            # Outra requisição pode ter removido o PDF do cache antes da cópia; nesse caso ele é
+            # renderizado direto no destino.
+            if not cache.export(report_key, '.pdf', report_path):
+                render(report_path)
+
         print(f"Relatório gerado com sucesso em: {report_path}")
         return report_path
 
@@ -162,5 +371,17 @@ def generate_report():
         print(f"Erro ao gerar relatório: {e}")
         return None
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Gera o relatório em PDF das avaliações.")
+    parser.add_argument('--institution', type=int, help="ID da instituição")
+    parser.add_argument('--course', type=int, help="ID do curso")
+    parser.add_argument('--start', help="data inicial (criado_em >= start)")
+    parser.add_argument('--end', help="data final (criado_em <= end)")
+    parser.add_argument('--output', help="caminho do PDF gerado (padrão: reports/relatorio_avaliacoes.pdf)")
+    args = parser.parse_args()
+    filters = {"institution_id": args.institution, "course_id": args.course, "start": args.start, "end": args.end}
+    return filters, args.output
+
 if __name__ == '__main__':
-    generate_report()
\ No newline at end of file
+    filters, output_path = parse_args()
+    generate_report(filters, output_path)
\ No newline at end of file
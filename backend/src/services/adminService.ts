@@ -2,8 +2,8 @@
 import pool from '../config/database';
 // Importa o tipo RowDataPacket do mysql2 para tipar os resultados das queries.
 import { RowDataPacket } from 'mysql2';
-// Importa a função spawn do módulo child_process para executar comandos externos.
-import { spawn } from 'child_process';
+// Importa o cliente do worker Python de análise.
+import { requestAnalysis } from './analysisWorker';
 
 // Interface para os filtros de relatório.
 interface ReportFilters {
@@ -83,35 +83,8 @@ export const getAdminReportData = async (filters: ReportFilters): Promise<any> =
     created_at: ev.created_at,
   }));
 
-  // Executa um script Python para análise avançada dos dados.
-  const pythonAnalysis: PythonAnalysisResult = await new Promise((resolve, reject) => {
-    const pythonProcess = spawn('python', ['./python_scripts/analyze_evaluations.py'], {
-      cwd: __dirname + '/../../',
-    });
-
-    let pythonOutput = '';
-    let pythonError = '';
-
-    pythonProcess.stdout.on('data', (data) => { pythonOutput += data.toString(); });
-    pythonProcess.stderr.on('data', (data) => { pythonError += data.toString(); });
-
-    pythonProcess.on('close', (code) => {
-      if (code !== 0) {
-        console.error(`Python script exited with code ${code}: ${pythonError}`);
-        return reject(new Error(`Erro na análise Python: ${pythonError}`));
-      }
-      try {
-        const result = JSON.parse(pythonOutput);
-        resolve(result);
-      } catch (parseError) {
-        console.error('Erro ao parsear saída do Python:', parseError);
-        reject(new Error('Erro ao processar resultados da análise.'));
-      }
-    });
-
-    pythonProcess.stdin.write(JSON.stringify(evaluations));
-    pythonProcess.stdin.end();
-  });
+  // Executa a análise avançada dos dados no worker Python persistente.
+  const pythonAnalysis: PythonAnalysisResult = await requestAnalysis(evaluations);
 
   return {
     average_media_final,
@@ -168,34 +141,7 @@ export const generateReports = async (): Promise<any> => {
     };
   }
 
-  return new Promise((resolve, reject) => {
-    const pythonProcess = spawn('python', ['./python_scripts/analyze_evaluations.py'], {
-      cwd: __dirname + '/../../',
-    });
-
-    let pythonOutput = '';
-    let pythonError = '';
-
-    pythonProcess.stdout.on('data', (data) => { pythonOutput += data.toString(); });
-    pythonProcess.stderr.on('data', (data) => { pythonError += data.toString(); });
-
-    pythonProcess.on('close', (code) => {
-      if (code !== 0) {
-        console.error(`Python script exited with code ${code}: ${pythonError}`);
-        return reject(new Error(`Erro na análise Python: ${pythonError}`));
-      }
-      try {
-        const result = JSON.parse(pythonOutput);
-        resolve(result);
-      } catch (parseError) {
-        console.error('Erro ao parsear saída do Python:', parseError);
-        reject(new Error('Erro ao processar resultados da análise.'));
-      }
-    });
-
-    pythonProcess.stdin.write(JSON.stringify(evaluations));
-    pythonProcess.stdin.end();
-  });
+  return requestAnalysis(evaluations);
 };
 
 // Interface para os dados de perfil do administrador.
@@ -2,10 +2,19 @@
 import { spawn } from 'child_process';
 // Importa o módulo path para lidar com caminhos de arquivos.
 import path from 'path';
+// Importa o tipo Writable para escrever o PDF diretamente na resposta.
+import { Writable } from 'stream';
 // Importa a pool de conexões do banco de dados.
 import pool from '../config/database';
 // Importa o tipo RowDataPacket do mysql2 para tipar os resultados das queries.
 import { RowDataPacket } from 'mysql2';
+// Importa o cliente do worker Python de análise.
+import { requestAnalysis, requestColumnarAnalysis, getSummaryJob, SummaryJob } from './analysisWorker';
+// Importa o codificador do payload binário colunar.
+import { encodeColumnarPayload } from './columnarPayload';
+
+// Com ANALYSIS_PAYLOAD_FORMAT=columnar, as avaliações vão ao worker no formato binário colunar em vez de JSON.
+const USE_COLUMNAR_PAYLOAD = process.env.ANALYSIS_PAYLOAD_FORMAT === 'columnar';
 
 // Interface para os valores de tendência (valor atual e delta em relação ao período anterior).
 interface TrendValue {
@@ -23,47 +32,104 @@ interface AnalysisResult {
   score_distribution: any;
   executive_summary: string;
   raw_data: any[];
+  // Recortes por curso, instituição e/ou mês, presentes quando a análise é pedida com groupBy.
+  breakdowns?: any[];
+  // Desvio padrão, intervalo de confiança, quartis e polarização da media_final (cada categoria traz os seus em
+  // analysis_by_question[categoria].statistics).
+  media_final_statistics?: any;
+  // Termos, bigramas e comentários representativos de cada categoria no período atual, presentes quando a análise é
+  // pedida com commentTopics.
+  comment_topics?: any;
 }
 
-// Interface para as opções de análise (períodos e curso).
+// Interface para as opções de análise (períodos, curso e tamanho da resposta).
 interface AnalysisOptions {
   currentStart?: string;
   currentEnd?: string;
   previousStart?: string;
   previousEnd?: string;
   courseId?: string;
+  // Se false, não inclui as linhas brutas (raw_data) na resposta.
+  includeRawData?: boolean;
+  // Número máximo de comentários devolvidos por categoria.
+  commentsLimit?: number;
+  // Como escolher os comentários quando há limite: os primeiros ("head") ou uma amostra ("random").
+  commentsSample?: 'head' | 'random';
+  // Se true, a análise volta sem esperar o resumo do LLM, que é consultado depois por summary_job_id.
+  asyncSummary?: boolean;
+  // Se true, a análise combina os agregados diários de AnalyticsResults em vez de ler as linhas de Avaliacoes
+  // (sem o filtro da avaliação mais recente por usuário).
+  usePartials?: boolean;
+  // Se true, o PDF inclui apêndices com a tabela de notas e os comentários de cada categoria.
+  includeAppendices?: boolean;
+  // Recortes da análise: cada item é uma dimensão ('curso_id', 'instituicao_id', 'month') ou uma lista delas
+  // (chave composta). Ex.: ['curso_id', ['curso_id', 'month']].
+  groupBy?: (string | string[])[];
+  // Número máximo de grupos devolvidos em cada recorte (os com mais avaliações).
+  groupLimit?: number;
+  // Se true, inclui em comment_topics os temas dos comentários do período atual, lidos do índice de comentários.
+  commentTopics?: boolean;
+  // Número de termos e bigramas devolvidos por categoria em comment_topics.
+  commentTopicsLimit?: number;
+}
+
+// Interface para a requisição de uma página de comentários ou de linhas brutas.
+interface AnalysisPageRequest {
+  type: 'comments' | 'raw_data';
+  category?: string;
+  offset?: number;
+  limit?: number;
+}
+
+// Interface para uma página de comentários ou de linhas brutas.
+interface AnalysisPage {
+  type: string;
+  category?: string;
+  offset: number;
+  limit: number;
+  total: number;
+  items: any[];
 }
 
 /**
- * @function generatePdfReport
- * @description Gera um relatório em PDF a partir dos dados de análise de uma instituição.
+ * @function writePdfReport
+ * @description Gera o relatório em PDF de uma instituição e o escreve em `output` com memória limitada: o script Python
+ * monta o documento sob demanda e o Node repassa o stdout ao destino sem acumular o arquivo. O ReportLab só escreve o PDF
+ * ao fim da renderização, então o primeiro byte chega quando o documento está pronto (não há entrega incremental).
  * @param {number} institutionId - O ID da instituição.
- * @param {AnalysisOptions} [options={}] - As opções para a geração da análise.
- * @returns {Promise<Buffer>} - Uma promessa que resolve para o buffer do PDF gerado.
+ * @param {AnalysisOptions} options - As opções para a geração da análise.
+ * @param {Writable} output - O destino do PDF (ex.: a resposta HTTP).
+ * @param {() => void} [onStart] - Chamada antes do primeiro byte do PDF (ex.: para definir os cabeçalhos).
+ * @returns {Promise<void>} - Uma promessa que resolve quando o PDF foi escrito por completo.
  */
-export const generatePdfReport = async (
+export const writePdfReport = async (
   institutionId: number,
-  options: AnalysisOptions = {}
-): Promise<Buffer> => {
-  // Gera os dados da análise primeiro.
-  const reportData = await generateAnalysisForInstitution(institutionId, options);
+  options: AnalysisOptions,
+  output: Writable,
+  onStart?: () => void
+): Promise<void> => {
+  // Gera os dados da análise primeiro (o PDF não usa as linhas brutas).
+  const reportData = await generateAnalysisForInstitution(institutionId, { ...options, includeRawData: false });
+  const dataForPython = { ...reportData, pdf_options: { include_appendices: options.includeAppendices ?? false } };
 
   // Executa o script Python para gerar o PDF.
   return new Promise((resolve, reject) => {
     const scriptPath = path.join(__dirname, '..', '..', 'python_scripts', 'generate_pdf.py');
     const pythonProcess = spawn('python', [scriptPath]);
 
-    let pdfBuffer = Buffer.alloc(0);
+    let started = false;
     let errorOutput = '';
 
     // Envia os dados da análise para o script Python via stdin.
-    pythonProcess.stdin.write(JSON.stringify(reportData));
+    pythonProcess.stdin.write(JSON.stringify(dataForPython));
     pythonProcess.stdin.end();
 
-    // Concatena os chunks de dados recebidos do stdout para formar o buffer do PDF.
-    pythonProcess.stdout.on('data', (data) => {
-      pdfBuffer = Buffer.concat([pdfBuffer, data]);
+    // Repassa o stdout diretamente ao destino (com controle de fluxo), avisando antes do primeiro chunk.
+    pythonProcess.stdout.once('data', () => {
+      started = true;
+      if (onStart) onStart();
     });
+    pythonProcess.stdout.pipe(output, { end: false });
 
     // Captura a saída de erro do script.
     pythonProcess.stderr.on('data', (data) => {
@@ -77,10 +143,11 @@ export const generatePdfReport = async (
         console.error(errorOutput);
         return reject(new Error(`Erro ao gerar PDF: ${errorOutput}`));
       }
-      if (pdfBuffer.length === 0) {
+      if (!started) {
         return reject(new Error('Script Python não retornou dados de PDF.'));
       }
-      resolve(pdfBuffer);
+      output.end();
+      resolve();
     });
 
     // Trata erros ao iniciar o processo.
@@ -91,6 +158,86 @@ export const generatePdfReport = async (
   });
 };
 
+/**
+ * @function periodBound
+ * @description Converte um limite de período ('AAAA-MM-DD' ou data e hora) no instante ISO correspondente, lido no fuso
+ * local como o mysql2 lê os DATETIME de criado_em, para que o Python compare os dois no mesmo referencial.
+ * @param {string} [value] - O limite recebido na requisição.
+ * @returns {string | null} - O instante em ISO (UTC), ou null se o limite não foi informado.
+ */
+const periodBound = (value?: string): string | null => {
+  if (!value) return null;
+  // Sem hora, o Date interpretaria a data como UTC; com 'T00:00:00' ela vale como meia-noite local.
+  const date = new Date(/^\d{4}-\d{2}-\d{2}$/.test(value) ? `${value}T00:00:00` : value.replace(' ', 'T'));
+  return Number.isNaN(date.getTime()) ? value : date.toISOString();
+};
+
+// Interface para o payload de análise: as avaliações dos dois períodos em uma única lista ordenada por criado_em
+// e os limites (início, fim) de cada período, separados no Python (python_scripts/period_split.py).
+interface AnalysisRowsPayload {
+  rows: RowDataPacket[];
+  periods: Partial<Record<'current' | 'previous', [string | null, string | null]>>;
+}
+
+/**
+ * @function buildAnalysisPayload
+ * @description Busca, em uma única consulta, as avaliações dos períodos atual e anterior e monta o payload enviado ao
+ * script Python, que separa os períodos e mantém só a avaliação mais recente de cada usuário.
+ * @param {number} institutionId - O ID da instituição.
+ * @param {AnalysisOptions} options - As opções para a geração da análise.
+ * @param {boolean} [includePrevious=true] - Se false, busca só o período atual (ex.: páginas de comentários).
+ * @returns {Promise<AnalysisRowsPayload | null>} - O payload, ou null se não houver avaliações nos períodos.
+ */
+const buildAnalysisPayload = async (
+  institutionId: number,
+  options: AnalysisOptions,
+  includePrevious = true
+): Promise<AnalysisRowsPayload | null> => {
+  let query = 'SELECT * FROM Avaliacoes WHERE instituicao_id = ?';
+  const params: (string | number)[] = [institutionId];
+
+  // Um período sem início ou sem fim abrange todas as avaliações; nesse caso a consulta não filtra por data.
+  const windows = [[options.currentStart, options.currentEnd]];
+  if (includePrevious) windows.push([options.previousStart, options.previousEnd]);
+  if (windows.every(([start, end]) => start && end)) {
+    query += ` AND (${windows.map(() => 'criado_em BETWEEN ? AND ?').join(' OR ')})`;
+    windows.forEach(([start, end]) => params.push(start!, end!));
+  }
+
+  if (options.courseId) {
+    query += ' AND curso_id = ?';
+    params.push(options.courseId);
+  }
+
+  // A ordem por criado_em permite ao Python ficar com a última avaliação de cada usuário sem reordenar as linhas.
+  query += ' ORDER BY criado_em, id';
+
+  const [rows] = await pool.query<RowDataPacket[]>(query, params);
+  if (rows.length === 0) {
+    return null;
+  }
+
+  const periods: AnalysisRowsPayload['periods'] = {
+    current: [periodBound(options.currentStart), periodBound(options.currentEnd)],
+  };
+  if (includePrevious) periods.previous = [periodBound(options.previousStart), periodBound(options.previousEnd)];
+  return { rows, periods };
+};
+
+/**
+ * @function sendAnalysisPayload
+ * @description Envia as avaliações, os limites dos períodos e as opções ao worker, em JSON ou no formato colunar.
+ * @param {AnalysisRowsPayload} payload - As avaliações e os limites dos períodos.
+ * @param {any} options - As opções da análise.
+ * @returns {Promise<any>} - Uma promessa que resolve para o resultado do worker.
+ */
+const sendAnalysisPayload = (payload: AnalysisRowsPayload, options: any): Promise<any> => {
+  if (USE_COLUMNAR_PAYLOAD) {
+    return requestColumnarAnalysis(encodeColumnarPayload({ rows: payload.rows }, options, payload.periods));
+  }
+  return requestAnalysis({ ...payload, options });
+};
+
 /**
  * @function generateAnalysisForInstitution
  * @description Gera uma análise detalhada para uma instituição, comparando períodos e utilizando um script Python.
@@ -102,30 +249,40 @@ export const generateAnalysisForInstitution = async (
   institutionId: number,
   options: AnalysisOptions = {}
 ): Promise<AnalysisResult> => {
-  
-  // Função auxiliar para buscar avaliações no banco de dados com base nos filtros.
-  const fetchEvaluations = async (startDate?: string, endDate?: string, courseId?: string): Promise<RowDataPacket[]> => {
-    let query = 'SELECT * FROM Avaliacoes WHERE instituicao_id = ?';
-    const params: (string | number)[] = [institutionId];
-
-    if (startDate && endDate) {
-      query += ' AND criado_em BETWEEN ? AND ?';
-      params.push(startDate, endDate);
-    }
-
-    if (courseId) {
-      query += ' AND curso_id = ?';
-      params.push(courseId);
-    }
-    
-    const [evaluations] = await pool.query<RowDataPacket[]>(query, params);
-    return evaluations;
+  const pythonOptions = {
+    include_raw_data: options.includeRawData ?? true,
+    comments_limit: options.commentsLimit,
+    comments_sample: options.commentsSample,
+    async_summary: options.asyncSummary ?? false,
+    instituicao_id: institutionId,
+    curso_id: options.courseId ? Number(options.courseId) : undefined,
+    group_by: options.groupBy,
+    group_limit: options.groupLimit,
+    comment_topics: options.commentTopics
+      ? { start: options.currentStart ?? null, end: options.currentEnd ?? null, limit: options.commentTopicsLimit }
+      : undefined,
   };
 
-  const currentEvaluations = await fetchEvaluations(options.currentStart, options.currentEnd, options.courseId);
-  
-  // Se não houver avaliações no período atual, retorna um resultado vazio.
-  if (currentEvaluations.length === 0) {
+  // Com usePartials, o worker combina os agregados diários já guardados em AnalyticsResults e agenda a atualização
+  // deles em segundo plano.
+  if (options.usePartials) {
+    return requestAnalysis({
+      source: 'partials',
+      instituicao_id: institutionId,
+      curso_id: pythonOptions.curso_id,
+      periods: {
+        current: [options.currentStart ?? null, options.currentEnd ?? null],
+        previous: options.previousStart || options.previousEnd ? [options.previousStart ?? null, options.previousEnd ?? null] : null,
+      },
+      options: pythonOptions,
+    });
+  }
+
+  const payload = await buildAnalysisPayload(institutionId, options);
+
+  // Se não houver avaliações nos períodos, retorna um resultado vazio (o Python devolve o mesmo resultado quando só o
+  // período atual está vazio).
+  if (!payload) {
     return {
       suggestions: [],
       averages_by_question: {},
@@ -138,74 +295,35 @@ export const generateAnalysisForInstitution = async (
     };
   }
 
-  const previousEvaluations = await fetchEvaluations(options.previousStart, options.previousEnd, options.courseId);
-
-  // Filtra para manter apenas a avaliação mais recente de cada usuário.
-  const filterLatestEvaluationPerUser = (evaluations: RowDataPacket[]): RowDataPacket[] => {
-    const latestEvaluationsMap = new Map<number, RowDataPacket>();
-
-    for (const evalItem of evaluations) {
-      const userId = evalItem.usuario_id;
-      const createdAt = new Date(evalItem.criado_em);
-
-      if (!latestEvaluationsMap.has(userId) || createdAt > new Date(latestEvaluationsMap.get(userId)!.criado_em)) {
-        latestEvaluationsMap.set(userId, evalItem);
-      }
-    }
-    return Array.from(latestEvaluationsMap.values());
-  };
-
-  const filteredCurrentEvaluations = filterLatestEvaluationPerUser(currentEvaluations);
-  const filteredPreviousEvaluations = filterLatestEvaluationPerUser(previousEvaluations);
-
-  const dataForPython = {
-    current: filteredCurrentEvaluations,
-    previous: filteredPreviousEvaluations,
-  };
-
-  // Executa o script Python para análise dos dados.
-  return new Promise((resolve, reject) => {
-    const scriptPath = path.join(__dirname, '..', '..', 'python_scripts', 'analyze_evaluations.py');
-    const pythonProcess = spawn('python', [scriptPath]);
-
-    let resultJson = '';
-    let errorOutput = '';
-
-    // Envia os dados para o script Python via stdin.
-    pythonProcess.stdin.write(JSON.stringify(dataForPython));
-    pythonProcess.stdin.end();
-
-    // Captura a saída do script.
-    pythonProcess.stdout.setEncoding('utf8');
-    pythonProcess.stdout.on('data', (data) => {
-      resultJson += data;
-    });
-
-    // Captura a saída de erro do script.
-    pythonProcess.stderr.setEncoding('utf8');
-    pythonProcess.stderr.on('data', (data) => {
-      errorOutput += data;
-    });
+  // Envia os dados ao worker Python persistente (evita o custo de iniciar um processo por requisição).
+  return sendAnalysisPayload(payload, pythonOptions);
+};
 
-    // Trata o fechamento do processo do script.
-    pythonProcess.on('close', (code) => {
-      if (code !== 0) {
-        console.error(`Python script exited with code ${code}`);
-        console.error(errorOutput);
-        return reject(new Error(`Erro ao executar o script de análise: ${errorOutput}`));
-      }
-      try {
-        if (!resultJson) {
-          console.error("Python script returned empty stdout.");
-          return reject(new Error("Python script returned empty stdout."));
-        }
-        const result = JSON.parse(resultJson);
-        resolve(result);
-      } catch (e) {
-        console.error('Falha ao parsear o resultado do script Python:', e);
-        console.error('Raw output que causou o erro:', resultJson);
-        reject(new Error('Falha ao parsear o resultado do script Python.'));
-      }
-    });
-  });
+/**
+ * @function getAnalysisPage
+ * @description Retorna uma página de comentários de uma categoria ou de linhas brutas do período atual,
+ * permitindo que o dashboard carregue esses dados sob demanda em vez de recebê-los na análise completa.
+ * @param {number} institutionId - O ID da instituição.
+ * @param {AnalysisOptions} options - Os filtros de período e curso.
+ * @param {AnalysisPageRequest} page - A página desejada.
+ * @returns {Promise<AnalysisPage>} - Uma promessa que resolve para a página solicitada.
+ */
+export const getAnalysisPage = async (
+  institutionId: number,
+  options: AnalysisOptions,
+  page: AnalysisPageRequest
+): Promise<AnalysisPage> => {
+  const payload = await buildAnalysisPayload(institutionId, options, false);
+  if (!payload) {
+    return { type: page.type, category: page.category, offset: page.offset ?? 0, limit: page.limit ?? 50, total: 0, items: [] };
+  }
+  return sendAnalysisPayload(payload, { page });
 };
+
+/**
+ * @function getAnalysisSummary
+ * @description Retorna o resumo do LLM de uma análise pedida com asyncSummary.
+ * @param {string} jobId - O identificador do resumo (summary_job_id).
+ * @returns {SummaryJob | undefined} - O estado do resumo, ou undefined se o job for desconhecido.
+ */
+export const getAnalysisSummary = (jobId: string): SummaryJob | undefined => getSummaryJob(jobId);
@@ -0,0 +1,261 @@
+// Importa a função spawn e o tipo ChildProcessWithoutNullStreams do módulo child_process.
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
+// Importa o módulo path para lidar com caminhos de arquivos.
+import path from 'path';
+
+// Tempo máximo (ms) de espera por uma resposta do worker antes de rejeitar a requisição.
+const REQUEST_TIMEOUT_MS = Number(process.env.ANALYSIS_WORKER_TIMEOUT_MS) || 120000;
+
+// Interface para uma requisição pendente aguardando resposta do worker.
+interface PendingRequest {
+  resolve: (value: any) => void;
+  reject: (reason: Error) => void;
+  timer: NodeJS.Timeout;
+}
+
+// Acima deste tempo total (ms), as medições por etapa da análise são registradas como alerta.
+const SLOW_ANALYSIS_MS = Number(process.env.ANALYSIS_SLOW_MS) || 10000;
+
+// Número máximo de resumos assíncronos mantidos em memória aguardando consulta.
+const MAX_SUMMARY_JOBS = 500;
+
+// Interface para a medição de uma etapa da análise (python_scripts/instrumentation.py).
+interface StageTiming {
+  name: string;
+  rows: number | null;
+  wall_ms: number;
+  cpu_ms: number;
+  // RSS atual do processo no início e no fim da etapa (null fora do Linux).
+  rss_start_mb: number | null;
+  rss_end_mb: number | null;
+  tracemalloc_peak_mb?: number;
+}
+
+// Interface para as medições por etapa, enviadas com ANALYSIS_TIMINGS=result ou options.timings.
+interface AnalysisTimings {
+  total_ms: number;
+  // Pico de RSS desde o início do processo worker, não da requisição.
+  process_peak_rss_mb: number;
+  stages: StageTiming[];
+}
+
+// Interface para a resposta enviada pelo worker Python (uma linha JSON por requisição).
+// Mensagens com type 'detailed_analysis' trazem o resumo do LLM gerado de forma assíncrona
+// (status 'failed' e error quando a chamada ao LLM falhou).
+interface WorkerResponse {
+  id: number | null;
+  ok?: boolean;
+  type?: string;
+  status?: 'ready' | 'failed';
+  result?: any;
+  error?: string;
+  job_id?: string;
+  detailed_analysis?: string;
+  latency_ms?: number;
+  timings?: AnalysisTimings;
+}
+
+// Interface para o estado de um resumo assíncrono.
+// Um job fica 'failed' quando a chamada ao LLM falha ou o worker encerra antes de entregar o resumo.
+export interface SummaryJob {
+  status: 'pending' | 'ready' | 'failed';
+  detailed_analysis: string | null;
+  error?: string;
+}
+
+let workerProcess: ChildProcessWithoutNullStreams | null = null;
+let nextRequestId = 1;
+let stdoutBuffer = '';
+const pendingRequests = new Map<number, PendingRequest>();
+const summaryJobs = new Map<string, SummaryJob>();
+
+/**
+ * @function setSummaryJob
+ * @description Registra o estado de um resumo assíncrono, descartando os mais antigos acima do limite.
+ * @param {string} jobId - O identificador do job.
+ * @param {SummaryJob} job - O estado do job.
+ */
+const setSummaryJob = (jobId: string, job: SummaryJob): void => {
+  summaryJobs.delete(jobId);
+  summaryJobs.set(jobId, job);
+  while (summaryJobs.size > MAX_SUMMARY_JOBS) {
+    const oldestJobId = summaryJobs.keys().next().value as string;
+    summaryJobs.delete(oldestJobId);
+  }
+};
+
+/**
+ * @function logTimings
+ * @description Registra as medições por etapa de uma requisição, como alerta quando o tempo total passa de SLOW_ANALYSIS_MS.
+ * @param {number} id - O id da requisição.
+ * @param {AnalysisTimings} timings - As medições enviadas pelo worker.
+ */
+const logTimings = (id: number, timings: AnalysisTimings): void => {
+  const stages = timings.stages
+    .map((stage) => `${stage.name}=${stage.wall_ms}ms${stage.rows !== null ? `/${stage.rows}` : ''}`)
+    .join(' ');
+  const message = `[analysis-worker] requisição ${id} etapas: ${stages} (total ${timings.total_ms} ms, pico RSS do processo ${timings.process_peak_rss_mb} MB)`;
+  if (timings.total_ms > SLOW_ANALYSIS_MS) {
+    console.warn(`${message} - acima de ${SLOW_ANALYSIS_MS} ms`);
+  } else {
+    console.log(message);
+  }
+};
+
+/**
+ * @function handleWorkerLine
+ * @description Processa uma linha de resposta do worker e resolve a requisição correspondente.
+ * @param {string} line - A linha JSON recebida do stdout do worker.
+ * @param {Set<string>} workerJobs - Os resumos assíncronos ainda pendentes deste processo worker.
+ */
+const handleWorkerLine = (line: string, workerJobs: Set<string>): void => {
+  let response: WorkerResponse;
+  try {
+    response = JSON.parse(line);
+  } catch (e) {
+    console.error('Falha ao parsear a resposta do worker de análise:', line);
+    return;
+  }
+
+  // Resumo assíncrono do LLM: chega depois da resposta principal da mesma requisição.
+  if (response.type === 'detailed_analysis' && response.job_id) {
+    workerJobs.delete(response.job_id);
+    if (response.status === 'failed') {
+      setSummaryJob(response.job_id, { status: 'failed', detailed_analysis: null, error: response.error });
+    } else {
+      setSummaryJob(response.job_id, { status: 'ready', detailed_analysis: response.detailed_analysis ?? null });
+    }
+    return;
+  }
+
+  // Sem id (linha que o worker não conseguiu ler), a resposta não tem a quem ser entregue.
+  if (response.id === null || response.id === undefined) {
+    console.error(`[analysis-worker] resposta sem id do worker de análise: ${response.error ?? line}`);
+    return;
+  }
+
+  const pending = pendingRequests.get(response.id);
+  if (!pending) return;
+  pendingRequests.delete(response.id);
+  clearTimeout(pending.timer);
+
+  if (response.latency_ms !== undefined) {
+    console.log(`[analysis-worker] requisição ${response.id} concluída em ${response.latency_ms} ms`);
+  }
+  if (response.timings) {
+    logTimings(response.id, response.timings);
+  }
+
+  if (response.ok) {
+    if (response.result?.summary_job_id && !summaryJobs.has(response.result.summary_job_id)) {
+      setSummaryJob(response.result.summary_job_id, { status: 'pending', detailed_analysis: null });
+      workerJobs.add(response.result.summary_job_id);
+    }
+    pending.resolve(response.result);
+  } else {
+    pending.reject(new Error(`Erro na análise Python: ${response.error}`));
+  }
+};
+
+/**
+ * @function getWorker
+ * @description Retorna o processo worker de análise, iniciando-o caso ainda não exista.
+ * O processo é mantido vivo entre requisições para evitar o custo de importação do pandas/Gemini.
+ * @returns {ChildProcessWithoutNullStreams} - O processo worker.
+ */
+const getWorker = (): ChildProcessWithoutNullStreams => {
+  if (workerProcess) return workerProcess;
+
+  const scriptPath = path.join(__dirname, '..', '..', 'python_scripts', 'analyze_evaluations.py');
+  const child = spawn('python', [scriptPath, '--worker']);
+  workerProcess = child;
+  stdoutBuffer = '';
+  const workerJobs = new Set<string>();
+
+  child.stdout.setEncoding('utf8');
+  child.stdout.on('data', (data: string) => {
+    stdoutBuffer += data;
+    let newlineIndex = stdoutBuffer.indexOf('\n');
+    while (newlineIndex !== -1) {
+      const line = stdoutBuffer.slice(0, newlineIndex).trim();
+      stdoutBuffer = stdoutBuffer.slice(newlineIndex + 1);
+      if (line) handleWorkerLine(line, workerJobs);
+      newlineIndex = stdoutBuffer.indexOf('\n');
+    }
+  });
+
+  child.stderr.setEncoding('utf8');
+  child.stderr.on('data', (data: string) => {
+    console.error(data.trimEnd());
+  });
+
+  // Se o worker encerrar, rejeita as requisições pendentes e marca como falhos os resumos que ele ainda devia;
+  // a próxima chamada inicia um novo processo.
+  const handleExit = (reason: string) => {
+    if (workerProcess === child) workerProcess = null;
+    for (const [id, pending] of pendingRequests) {
+      clearTimeout(pending.timer);
+      pending.reject(new Error(`Worker de análise encerrado: ${reason}`));
+      pendingRequests.delete(id);
+    }
+    for (const jobId of workerJobs) {
+      if (summaryJobs.get(jobId)?.status === 'pending') {
+        setSummaryJob(jobId, { status: 'failed', detailed_analysis: null, error: `Worker de análise encerrado: ${reason}` });
+      }
+    }
+    workerJobs.clear();
+  };
+  child.on('close', (code) => handleExit(`código ${code}`));
+  child.on('error', (err) => {
+    console.error('Erro ao iniciar o worker de análise Python:', err);
+    handleExit(err.message);
+  });
+
+  return child;
+};
+
+/**
+ * @function sendRequest
+ * @description Envia uma requisição ao worker Python persistente e aguarda a resposta com o mesmo id.
+ * @param {Record<string, any>} body - O corpo da requisição (payload JSON ou payload colunar em base64).
+ * @returns {Promise<any>} - Uma promessa que resolve para o resultado da análise.
+ */
+const sendRequest = (body: Record<string, any>): Promise<any> => {
+  const worker = getWorker();
+  const id = nextRequestId++;
+
+  return new Promise((resolve, reject) => {
+    const timer = setTimeout(() => {
+      pendingRequests.delete(id);
+      reject(new Error(`Tempo limite excedido aguardando o worker de análise (requisição ${id}).`));
+    }, REQUEST_TIMEOUT_MS);
+
+    pendingRequests.set(id, { resolve, reject, timer });
+    worker.stdin.write(JSON.stringify({ id, ...body }) + '\n');
+  });
+};
+
+/**
+ * @function requestAnalysis
+ * @description Envia um payload de avaliações ao worker Python persistente e aguarda o resultado.
+ * @param {any} payload - Os dados enviados ao script (ex.: { current, previous }).
+ * @returns {Promise<any>} - Uma promessa que resolve para o resultado da análise.
+ */
+export const requestAnalysis = (payload: any): Promise<any> => sendRequest({ payload });
+
+/**
+ * @function requestColumnarAnalysis
+ * @description Envia ao worker um payload no formato binário colunar (ver columnarPayload.ts) e aguarda o resultado.
+ * @param {Buffer} buffer - O payload gerado por encodeColumnarPayload.
+ * @returns {Promise<any>} - Uma promessa que resolve para o resultado da análise.
+ */
+export const requestColumnarAnalysis = (buffer: Buffer): Promise<any> =>
+  sendRequest({ columnar: buffer.toString('base64') });
+
+/**
+ * @function getSummaryJob
+ * @description Retorna o estado de um resumo do LLM gerado de forma assíncrona.
+ * @param {string} jobId - O identificador do job (summary_job_id da análise).
+ * @returns {SummaryJob | undefined} - O estado do job, ou undefined se for desconhecido.
+ */
+export const getSummaryJob = (jobId: string): SummaryJob | undefined => summaryJobs.get(jobId);
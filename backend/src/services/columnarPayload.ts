@@ -0,0 +1,135 @@
+// Formato binário colunar do payload de análise, lido por python_scripts/columnar_payload.py.
+// Layout (little-endian): magic "AVC1", uint32 com o tamanho do header, header JSON (completado com
+// espaços até um múltiplo de 8 bytes) e os blocos de dados, cada um alinhado a 8 bytes.
+// Tipos de coluna: int8 (notas, -1 = nulo), int32 (ids, INT32_MIN = nulo), float64 (media_final, NaN = nulo)
+// e string (int32 com o índice na tabela de strings compartilhada, -1 = nulo).
+
+const MAGIC = Buffer.from('AVC1', 'ascii');
+const ALIGNMENT = 8;
+const INT8_NULL = -1;
+const INT32_NULL = -2147483648;
+const STRING_NULL = -1;
+
+// Tipos de coluna suportados pelo formato.
+type ColumnType = 'int8' | 'int32' | 'float64' | 'string';
+
+// Interface para a posição de um bloco dentro da área de dados.
+interface BlockSpec {
+  offset: number;
+  length: number;
+}
+
+// Interface para a descrição de uma coluna no header.
+interface ColumnSpec extends BlockSpec {
+  name: string;
+  type: ColumnType;
+}
+
+/**
+ * @function columnType
+ * @description Define o tipo binário de uma coluna a partir do nome e dos valores.
+ * @param {string} name - O nome da coluna.
+ * @param {any[]} values - Os valores da coluna.
+ * @returns {ColumnType} - O tipo da coluna.
+ */
+const columnType = (name: string, values: any[]): ColumnType => {
+  if (name.startsWith('nota_')) return 'int8';
+  if (name === 'media_final') return 'float64';
+  const isInt32 = (value: any) =>
+    value === null || value === undefined || (Number.isInteger(value) && value > INT32_NULL && value <= 2147483647);
+  return values.every(isInt32) ? 'int32' : 'string';
+};
+
+/**
+ * @function toNumber
+ * @description Converte um valor em número, retornando null quando ele não é numérico (como o pd.to_numeric do Python).
+ * @param {any} value - O valor a converter.
+ * @returns {number | null} - O número ou null.
+ */
+const toNumber = (value: any): number | null => {
+  if (value === null || value === undefined || value === '') return null;
+  const number = Number(value);
+  return Number.isFinite(number) ? number : null;
+};
+
+/**
+ * @function encodeColumnarPayload
+ * @description Codifica as avaliações dos períodos e as opções no formato colunar, evitando que o worker
+ * Python tenha de parsear um JSON com uma chave por célula.
+ * @param {Record<string, any[]>} periods - As avaliações de cada período (ex.: { current, previous }).
+ * @param {any} [options={}] - As opções da análise, enviadas no header.
+ * @param {any} [periodBounds] - Os limites de cada período quando as avaliações vão juntas em `periods.rows`.
+ * @returns {Buffer} - O payload binário.
+ */
+export const encodeColumnarPayload = (periods: Record<string, any[]>, options: any = {}, periodBounds?: any): Buffer => {
+  const blocks: Buffer[] = [];
+  let size = 0;
+  const strings: string[] = [];
+  const stringIndex = new Map<string, number>();
+
+  const addBlock = (data: Buffer): BlockSpec => {
+    const padding = (ALIGNMENT - (size % ALIGNMENT)) % ALIGNMENT;
+    if (padding) {
+      blocks.push(Buffer.alloc(padding));
+      size += padding;
+    }
+    const offset = size;
+    blocks.push(data);
+    size += data.length;
+    return { offset, length: data.length };
+  };
+
+  const intern = (value: any): number => {
+    if (value === null || value === undefined) return STRING_NULL;
+    const text = value instanceof Date ? value.toISOString() : String(value);
+    let index = stringIndex.get(text);
+    if (index === undefined) {
+      index = strings.length;
+      stringIndex.set(text, index);
+      strings.push(text);
+    }
+    return index;
+  };
+
+  const header: any = { periods: {}, options };
+  if (periodBounds !== undefined) header.period_bounds = periodBounds;
+  for (const [period, rows] of Object.entries(periods)) {
+    const names = [...new Set(rows.flatMap((row) => Object.keys(row)))];
+    const columns: ColumnSpec[] = names.map((name) => {
+      const values = rows.map((row) => row[name]);
+      const type = columnType(name, values);
+      let data: Buffer;
+      if (type === 'int8') {
+        data = Buffer.alloc(values.length);
+        values.forEach((value, i) => data.writeInt8(toNumber(value) ?? INT8_NULL, i));
+      } else if (type === 'float64') {
+        data = Buffer.alloc(values.length * 8);
+        values.forEach((value, i) => data.writeDoubleLE(toNumber(value) ?? NaN, i * 8));
+      } else {
+        data = Buffer.alloc(values.length * 4);
+        const encodeValue = type === 'int32' ? (value: any) => value ?? INT32_NULL : intern;
+        values.forEach((value, i) => data.writeInt32LE(encodeValue(value), i * 4));
+      }
+      return { name, type, ...addBlock(data) };
+    });
+    header.periods[period] = { rows: rows.length, columns };
+  }
+
+  // Tabela de strings: offsets uint32 (n + 1 posições) seguidos dos bytes UTF-8 concatenados.
+  const encoded = strings.map((text) => Buffer.from(text, 'utf8'));
+  const offsets = Buffer.alloc((encoded.length + 1) * 4);
+  let position = 0;
+  encoded.forEach((data, i) => {
+    position += data.length;
+    offsets.writeUInt32LE(position, (i + 1) * 4);
+  });
+  header.strings = { offsets: addBlock(offsets), data: addBlock(Buffer.concat(encoded)) };
+
+  let headerBytes = Buffer.from(JSON.stringify(header), 'utf8');
+  const headerPadding = (ALIGNMENT - ((MAGIC.length + 4 + headerBytes.length) % ALIGNMENT)) % ALIGNMENT;
+  headerBytes = Buffer.concat([headerBytes, Buffer.alloc(headerPadding, ' ')]);
+  const headerLength = Buffer.alloc(4);
+  headerLength.writeUInt32LE(headerBytes.length, 0);
+
+  return Buffer.concat([MAGIC, headerLength, headerBytes, ...blocks]);
+};
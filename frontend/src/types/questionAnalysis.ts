@@ -18,6 +18,9 @@ export interface QuestionAnalysisItem {
   // Uma lista dos comentários textuais deixados pelos usuários para esta questão.
   comments: string[];
 
+  // O total de comentários da questão (a lista acima pode ser apenas uma amostra ou uma página).
+  comments_total?: number;
+
   // A pontuação de sentimento média dos comentários e sua variação.
   sentiment_score: { 
     value: number; // A média de sentimento atual.